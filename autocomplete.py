@@ -0,0 +1,151 @@
+""" CSC111 Project 2: Restaurant Recommendation System
+
+Module Description
+==================
+This module contains the AutocompleteIndex class, which finds the cuisines (or any other
+words) containing what the user has typed so far, without scanning every word.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of students
+taking CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC111 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2024 UofT DCS Teaching Team """
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Optional
+
+# length of the longest n-grams in the index
+GRAM_LENGTH = 3
+
+
+class AutocompleteIndex:
+    """An index of words, for finding the words that contain a given (case-insensitive) text.
+
+    Matches are ranked as follows:
+        1. words starting with the text, in alphabetical order
+        2. words with another word (after a space) starting with the text, in alphabetical order
+        3. every other word containing the text, in alphabetical order
+
+    Words starting with the text are found by binary search over the lowercased words. The other
+    words are found with an inverted index from every n-gram (substring of 1 to GRAM_LENGTH
+    characters) to the words containing it: a longer text is looked up by intersecting the words
+    containing each of its n-grams, starting with the rarest, and then checking that the words
+    really contain the text.
+
+    Representation Invariants:
+        - self.words == sorted(set(self.words), key=lambda word: (word.lower(), word))
+
+    Instance Attributes:
+        - words: the words in the index, in alphabetical order (ignoring case)
+
+    >>> index = AutocompleteIndex(['North Indian', 'Chinese', 'South Indian', 'Indonesian', 'Mughlai'])
+    >>> index.search('ind')
+    ['Indonesian', 'North Indian', 'South Indian']
+    >>> index.search('INDIAN ')
+    ['North Indian', 'South Indian']
+    >>> index.search('n', limit=2)
+    ['North Indian', 'Chinese']
+    >>> index.search('dian')
+    ['North Indian', 'South Indian']
+    >>> index.search('xyz')
+    []
+    """
+    words: list[str]
+    # Private Instance Attributes:
+    #   - _keys: the lowercased words, in the same order as words
+    #   - _grams: maps every n-gram of a key (of length 1 to GRAM_LENGTH) to the positions in
+    #             words of the words containing it, in ascending order
+    _keys: list[str]
+    _grams: dict[str, list[int]]
+
+    def __init__(self, words: list[str]) -> None:
+        """Initialize a new AutocompleteIndex of the given words (duplicates are ignored).
+        """
+        self.words = sorted(set(words), key=lambda word: (word.lower(), word))
+        self._keys = [word.lower() for word in self.words]
+        self._grams = {}
+        for position, key in enumerate(self._keys):
+            grams = {key[start:start + length] for length in range(1, GRAM_LENGTH + 1)
+                     for start in range(len(key) - length + 1)}
+            for gram in grams:
+                self._grams.setdefault(gram, []).append(position)
+
+    def __len__(self) -> int:
+        """Return the number of words in the index.
+        """
+        return len(self.words)
+
+    def search(self, text: str, limit: Optional[int] = None) -> list[str]:
+        """Return the words containing text (ignoring case and surrounding spaces), best match first,
+        or every word if text is empty. At most limit words are returned, if limit is given.
+        """
+        query = text.strip().lower()
+        if limit is None:
+            limit = len(self.words)
+        if not query:
+            return self.words[:limit]
+
+        # words starting with the query are next to each other in alphabetical order
+        start = bisect_left(self._keys, query)
+        end = start
+        while end < len(self._keys) and end - start < limit and self._keys[end].startswith(query):
+            end += 1
+        matches = self.words[start:end]
+
+        # then the other words, best ranked first (each list of candidates is in alphabetical order)
+        chosen = set(range(start, end))
+        for needle in (' ' + query, query):
+            for position in self._candidates(needle):
+                if len(matches) == limit:
+                    return matches
+                if position not in chosen and needle in self._keys[position]:
+                    chosen.add(position)
+                    matches.append(self.words[position])
+
+        return matches
+
+    def _candidates(self, query: str) -> list[int]:
+        """Return the positions of the words that contain every n-gram of query (including every
+        word containing query), in ascending order.
+
+        Preconditions:
+            - query != '' and query == query.lower()
+        """
+        if len(query) <= GRAM_LENGTH:
+            return self._grams.get(query, [])
+
+        postings = []
+        for start in range(len(query) - GRAM_LENGTH + 1):
+            gram = query[start:start + GRAM_LENGTH]
+            if gram not in self._grams:
+                return []
+            postings.append(self._grams[gram])
+
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+
+        return sorted(candidates)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    # python_ta.check_all('autocomplete.py', config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['__future__', 'typing', 'bisect'],
+    #     'allowed-io': []
+    # })
@@ -0,0 +1,380 @@
+""" CSC111 Project 2: Restaurant Recommendation System
+
+Module Description
+==================
+This module contains benchmarks for building, storing and querying the restaurant tree.
+
+Synthetic datasets in the schema of data.csv are generated by generate_csv, by sampling each
+column from data.csv (cuisines are sampled one at a time, so new combinations appear). Each
+dataset is benchmarked in its own process, so its peak memory is measured on its own.
+
+With --geo, the datasets also have the latitude and longitude of each restaurant (spread around
+a city for every 100 thousand rows), and queries by distance are benchmarked too, e.g.
+    python benchmark.py --geo --rows 1000000 5000000
+
+Run this file to benchmark datasets of 10 thousand, 100 thousand and 1 million restaurants (and,
+with --large, 10 million, whose tree needs about 7 GB of memory) and save the results as JSON, e.g.
+    python benchmark.py --rows 10000 1000000 --output results.json
+and compare them with the results of another commit using
+    python benchmark.py --rows 10000 1000000 --compare old_results.json
+
+Peak memory is measured with the resource module, which is only available on Unix (elsewhere, it is
+recorded as null).
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of students
+taking CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC111 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2024 UofT DCS Teaching Team """
+
+import csv
+import gc
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Optional
+
+from functions import LOCATION_COLUMNS, Tree, TreeBuilder
+from geo import KM_PER_DEGREE
+
+# the dataset synthetic datasets are sampled from, next to this module (whatever the working directory)
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data.csv')
+
+# number of rows in each benchmarked dataset, by default
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+
+# number of rows of the dataset added by --large (its tree takes about 7 GB of memory)
+LARGE_ROWS = 10_000_000
+
+# number of rows of a dataset with locations for each city the restaurants are spread around
+ROWS_PER_CITY = 100_000
+
+# standard deviation of the distance of each restaurant from the centre of its city, in each direction
+CITY_SPREAD_KM = 5.0
+
+# fraction of the restaurants of a dataset with locations whose location is left empty
+NO_LOCATION_FRACTION = 0.01
+
+# radius (in km) of each query by distance, chosen at random
+RADII_KM = [0.5, 1.0, 2.0, 5.0]
+
+
+def measure_memory(data: str) -> dict[str, float]:
+    """Returns the memory (in bytes) used by the tree and the table of records built from data,
+    along with the number of restaurants and of tree nodes (counting each path to a restaurant).
+
+    >>> result = measure_memory('test_data.csv')
+    >>> result['restaurants']
+    7
+    >>> result['bytes_per_restaurant'] > 0
+    True
+    """
+    gc.collect()
+    tracemalloc.start()
+    t = TreeBuilder(data)
+    tree = t.build_tree()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    restaurants = len(t.get_indices())
+    return {
+        'restaurants': restaurants,
+        'tree_nodes': len(tree),
+        'bytes': current,
+        'peak_bytes': peak,
+        'bytes_per_restaurant': current / restaurants
+    }
+
+
+def generate_csv(path: str, rows: int, seed: int = 0, source: str = DATA_PATH, locations: bool = False) -> None:
+    """Writes a synthetic dataset of the given number of rows to path, in the same schema as source.
+
+    The price, rating, name, online order, table booking and types of each row are copied from
+    random rows of source (names get a branch number, so some are repeated). The number of cuisines
+    is sampled like source, and each cuisine is sampled by how often it appears in source. The same
+    seed always gives the same file.
+
+    If locations is True, each row also has a latitude and longitude: there is a city (placed at random)
+    for every ROWS_PER_CITY rows, and each restaurant is placed around a random city, at a normally
+    distributed distance from its centre. The location of a few restaurants is left empty.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     generate_csv(os.path.join(directory, 'small.csv'), 50)
+    ...     t = TreeBuilder(os.path.join(directory, 'small.csv'))
+    ...     _ = t.build_tree()
+    ...     len(t.get_indices()) + sum(t.dropped.values())
+    50
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     generate_csv(os.path.join(directory, 'geo.csv'), 50, locations=True)
+    ...     t = TreeBuilder(os.path.join(directory, 'geo.csv'))
+    ...     len(t.build_tree().get_geo_index()) > 40, t.has_locations()
+    (True, True)
+    """
+    with open(source, 'r') as file:
+        templates = [row for row in csv.reader(file) if row[:3] != ['', 'price', 'rating']]
+
+    cuisine_counts = {}
+    for row in templates:
+        for cuisine in row[7].split(','):
+            cuisine_counts[cuisine.strip()] = cuisine_counts.get(cuisine.strip(), 0) + 1
+    cuisines = list(cuisine_counts)
+    weights = [cuisine_counts[cuisine] for cuisine in cuisines]
+    num_cuisines = [len(row[7].split(',')) for row in templates]
+
+    rng = random.Random(seed)
+    # the (latitude, longitude) of the centre of each city, away from the poles (only drawn for locations,
+    # so that datasets without locations are the same as before)
+    cities = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(1 + rows // ROWS_PER_CITY)] \
+        if locations else []
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['', 'price', 'rating', 'name', 'online_order', 'table_booking', 'type', 'cuisines']
+                        + (list(LOCATION_COLUMNS) if locations else []))
+        for i in range(rows):
+            price, rating, name, online_order, table_booking, types = rng.choice(templates)[1:7]
+            chosen = []
+            for cuisine in rng.choices(cuisines, weights, k=rng.choice(num_cuisines)):
+                if cuisine not in chosen:
+                    chosen.append(cuisine)
+            row = [i, price, rating, f'{name} {rng.randint(1, 1 + rows // 1000)}', online_order, table_booking,
+                   types, ', '.join(chosen)]
+            if locations:
+                row.extend(_random_location(rng, cities))
+            writer.writerow(row)
+
+
+def _random_location(rng: random.Random, cities: list[tuple[float, float]]) -> list[str]:
+    """Returns the [latitude, longitude] (as text) of a restaurant placed around a random city in cities,
+    or ['', ''] for a fraction NO_LOCATION_FRACTION of restaurants.
+    """
+    if rng.random() < NO_LOCATION_FRACTION:
+        return ['', '']
+
+    latitude, longitude = rng.choice(cities)
+    latitude += rng.gauss(0, CITY_SPREAD_KM / KM_PER_DEGREE)
+    longitude += rng.gauss(0, CITY_SPREAD_KM / KM_PER_DEGREE / math.cos(math.radians(latitude)))
+    return [f'{latitude:.6f}', f'{(longitude + 180) % 360 - 180:.6f}']
+
+
+def run_benchmarks(data: str, num_queries: int = 1000, seed: int = 0) -> dict[str, Any]:
+    """Returns the time taken by the main operations on the tree built from data, and the
+    peak memory (resident set size, in bytes) of this process afterwards.
+
+    Times are in seconds: for building the tree, the total, and for the other operations, the
+    average of num_queries random calls (the same calls for the same seed and data). If data has
+    locations, queries by distance (around the locations of random restaurants) are timed too.
+
+    >>> result = run_benchmarks('test_data.csv', num_queries=10)
+    >>> result['restaurants']
+    7
+    >>> sorted(key for key in result if key.endswith('_seconds'))
+    ['build_tree_seconds', 'filter_restaurants_seconds', 'find_restaurants_seconds', \
+'get_info_seconds', 'get_restaurant_info_seconds']
+    """
+    t = TreeBuilder(data)
+    start = time.perf_counter()
+    tree = t.build_tree()
+    build_seconds = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    all_cuisines = tree.get_all_cuisines()
+    all_types = sorted(tree.get_all_types())
+    indices = t.get_indices()
+    paths = [[rng.choice(all_cuisines), rng.choice(all_types), rng.choice(['Yes', 'No']), rng.choice(['Yes', 'No'])]
+             for _ in range(num_queries)]
+    queries = []
+    for _ in range(num_queries):
+        num_places = rng.randint(3, 10)
+        cuisines = set(rng.sample(all_cuisines, rng.randint(1, 3)))
+        queries.append((num_places, rng.randint(10, 100) * num_places,
+                        [cuisines, rng.choice(all_types), rng.choice(['Yes', 'No']), rng.choice(['Yes', 'No'])]))
+    info_indices = [rng.choice(indices) for _ in range(num_queries)]
+
+    start = time.perf_counter()
+    for path in paths:
+        tree.find_restaurants(path)
+    find_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = [tree.filter_restaurants(*query) for query in queries]
+    filter_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in info_indices:
+        t.get_info(i)
+    info_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for result in results:
+        tree.get_restaurant_info(result or [], t)
+    hydrate_seconds = time.perf_counter() - start
+
+    geo_seconds = {}
+    if t.has_locations():
+        geo_seconds = _run_geo_benchmarks(tree, t, queries, rng)
+
+    return {
+        'data': data,
+        'restaurants': len(indices),
+        'dropped': sum(t.dropped.values()),
+        'queries': num_queries,
+        'build_tree_seconds': build_seconds,
+        'find_restaurants_seconds': find_seconds / num_queries,
+        'filter_restaurants_seconds': filter_seconds / num_queries,
+        'get_info_seconds': info_seconds / num_queries,
+        'get_restaurant_info_seconds': hydrate_seconds / num_queries,
+        **geo_seconds,
+        'peak_rss_bytes': _peak_rss()
+    }
+
+
+def _run_geo_benchmarks(tree: Tree, t: TreeBuilder, queries: list[tuple], rng: random.Random) -> dict[str, float]:
+    """Returns the average time (in seconds) of Tree.filter_restaurants_near and Tree.nearest_restaurants,
+    for each of queries, around the location of a random restaurant (and within a random radius in RADII_KM).
+    """
+    indices = t.get_indices()
+    points = []
+    while len(points) < len(queries):
+        info = t.get_info(rng.choice(indices))
+        if len(info) > 7:
+            points.append((float(info[7]), float(info[8]), rng.choice(RADII_KM)))
+
+    start = time.perf_counter()
+    for query, (latitude, longitude, radius) in zip(queries, points):
+        tree.filter_restaurants_near(*query, latitude, longitude, radius)
+    near_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for query, (latitude, longitude, _) in zip(queries, points):
+        tree.nearest_restaurants(*query, latitude, longitude)
+    nearest_seconds = time.perf_counter() - start
+
+    return {'filter_restaurants_near_seconds': near_seconds / len(queries),
+            'nearest_restaurants_seconds': nearest_seconds / len(queries)}
+
+
+def run_suite(rows: list[int], data_dir: str = 'benchmark_data', num_queries: int = 1000,
+              seed: int = 0, locations: bool = False) -> dict[str, Any]:
+    """Generates (unless it was already generated) a synthetic dataset of each number of rows in data_dir,
+    with locations if locations is True, benchmarks each one in a new process, and returns the results,
+    along with the current git commit.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for num_rows in rows:
+        path = os.path.join(data_dir, f"synthetic_{'geo_' if locations else ''}{num_rows}_{seed}.csv")
+        if not os.path.exists(path):
+            generate_csv(path + '.tmp', num_rows, seed, locations=locations)
+            os.replace(path + '.tmp', path)
+
+        with context.Pool(1) as pool:
+            result = pool.apply(run_benchmarks, (path, num_queries, seed))
+        result['rows'] = num_rows
+        results.append(result)
+
+    return {'commit': _git_commit(), 'python': platform.python_version(), 'seed': seed, 'locations': locations,
+            'results': results}
+
+
+def compare(old: dict[str, Any], new: dict[str, Any]) -> list[str]:
+    """Returns a line for each measurement in both old and new (results of run_suite, for the same
+    number of rows), with its change in percent. Positive changes are slower or larger.
+
+    >>> old = {'results': [{'rows': 10, 'build_tree_seconds': 2.0, 'peak_rss_bytes': 100}]}
+    >>> new = {'results': [{'rows': 10, 'build_tree_seconds': 1.5, 'peak_rss_bytes': 100}]}
+    >>> compare(old, new)
+    ['10 rows build_tree_seconds: 2 -> 1.5 (-25.0%)', '10 rows peak_rss_bytes: 100 -> 100 (+0.0%)']
+    """
+    old_results = {result['rows']: result for result in old['results']}
+    lines = []
+    for result in new['results']:
+        previous = old_results.get(result['rows'])
+        if previous is None:
+            continue
+        for key in result:
+            if (key.endswith('_seconds') or key.endswith('_bytes')) and previous.get(key) \
+                    and result[key] is not None:
+                change = (result[key] - previous[key]) / previous[key] * 100
+                lines.append(f"{result['rows']} rows {key}: {previous[key]:.6g} -> {result[key]:.6g} ({change:+.1f}%)")
+
+    return lines
+
+
+def _peak_rss() -> Optional[int]:
+    """Returns the peak resident set size of this process, in bytes, or None if it cannot be measured
+    (without the resource module, e.g. on Windows).
+    """
+    try:
+        import resource  # imported here, since it is only available on Unix
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, and macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _git_commit() -> Optional[str]:
+    """Returns the hash of the current git commit, or None if it cannot be found.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(DATA_PATH)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    import argparse
+    import doctest
+    doctest.testmod(verbose=True)
+
+    parser = argparse.ArgumentParser(description='Benchmark the restaurant tree on synthetic datasets.')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='number of rows of each dataset')
+    parser.add_argument('--large', action='store_true',
+                        help=f'also benchmark a dataset of {LARGE_ROWS} rows (needs about 7 GB of memory)')
+    parser.add_argument('--queries', type=int, default=1000, help='number of calls timed for each operation')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default='benchmark_data', help='directory for the generated csv files')
+    parser.add_argument('--output', help='JSON file to save the results to')
+    parser.add_argument('--compare', help='JSON file of earlier results to compare with')
+    parser.add_argument('--memory', action='store_true', help='only print the memory used for data.csv')
+    parser.add_argument('--geo', action='store_true', help='benchmark datasets with locations')
+    args = parser.parse_args()
+
+    if args.memory:
+        for key, value in measure_memory(DATA_PATH).items():
+            print(f'{key}: {value:.1f}' if isinstance(value, float) else f'{key}: {value}')
+    else:
+        rows = args.rows + [LARGE_ROWS] if args.large else args.rows
+        suite = run_suite(rows, args.data_dir, args.queries, args.seed, args.geo)
+        print(json.dumps(suite, indent=2))
+        if args.output:
+            with open(args.output, 'w') as output:
+                json.dump(suite, output, indent=2)
+        if args.compare:
+            with open(args.compare) as previous_file:
+                print('\n'.join(compare(json.load(previous_file), suite)))
+
+    # import python_ta
+    # python_ta.check_all('benchmark.py', config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['csv', 'gc', 'json', 'math', 'multiprocessing', 'os', 'platform', 'random', 'resource',
+    #                       'subprocess', 'sys', 'time', 'tracemalloc', 'typing', 'argparse', 'functions', 'geo'],
+    #     'allowed-io': ['generate_csv']
+    # })
@@ -0,0 +1,184 @@
+""" CSC111 Project 2: Restaurant Recommendation System
+
+Module Description
+==================
+This module contains the QueryCache class, which remembers the results of recent
+queries so that popular queries do not need to search the tree again.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of students
+taking CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC111 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2024 UofT DCS Teaching Team """
+
+from __future__ import annotations
+
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from functions import Tree, TreeBuilder
+from metrics import METRICS
+
+
+class QueryCache:
+    """A least recently used (LRU) cache of query results, in front of Tree.filter_restaurants
+    and Tree.get_restaurant_info.
+
+    Queries are stored under a canonical key, so queries that must have the same result share
+    an entry: the cuisines (and any other level given several values) are a frozenset, and the budget
+    per place is replaced by the highest price of a restaurant within it (every budget between two
+    restaurant prices has the same result).
+
+    The cache is cleared whenever the tree builder's version changes (the tree was rebuilt, or a
+    restaurant was added, updated or deleted).
+
+    Representation Invariants:
+        - self.maxsize >= 1
+        - self.ttl is None or self.ttl > 0
+        - len(self._entries) <= self.maxsize
+
+    Instance Attributes:
+        - tree: tree representing dataset of restaurants
+        - t: tree builder the tree was built by
+        - maxsize: maximum number of queries to remember
+        - ttl: number of seconds a result is remembered for, or None to remember it until it is evicted
+        - hits: number of queries answered from the cache
+        - misses: number of queries that had to search the tree
+
+    >>> t = TreeBuilder('test_data.csv')
+    >>> cache = QueryCache(t.build_tree(), t)
+    >>> cache.recommend(2, 20, [{'North Indian'}, 'Takeaway', 'No', 'No'])
+    [('Xpress Kitchen', 'North Indian, Chinese', 'Takeaway, Delivery', '3.3', '8.0')]
+    >>> cache.hits, cache.misses
+    (0, 1)
+    >>> _ = cache.recommend(2, 17, [{'North Indian'}, 'Takeaway', 'No', 'No'])  # same price cap (8.0)
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+    tree: Tree
+    t: TreeBuilder
+    maxsize: int
+    ttl: Optional[float]
+    hits: int
+    misses: int
+    # Private Instance Attributes:
+    #   - _entries: maps the key of each remembered query to the time it was computed and its
+    #               result, from least to most recently used
+    #   - _prices: every distinct restaurant price, in ascending order
+    #   - _version: the version of the tree builder when the cache was last cleared
+    _entries: OrderedDict[tuple, tuple[float, Optional[list]]]
+    _prices: list[float]
+    _version: int
+
+    def __init__(self, tree: Tree, t: TreeBuilder, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        """Initialize a new, empty QueryCache for the given tree and tree builder.
+        """
+        self.tree = tree
+        self.t = t
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._prices = []
+        self._version = -1
+
+    def filter_restaurants(self, num_places: int, max_budget: int, user_input: list) -> Optional[list[int]]:
+        """Returns the same result as self.tree.filter_restaurants, using the cache when possible.
+
+        Preconditions:
+            - the preconditions of Tree.filter_restaurants hold
+        """
+        result = self._lookup(('filter', num_places) + self._key(num_places, max_budget, user_input),
+                              lambda: self.tree.filter_restaurants(num_places, max_budget, user_input))
+        return None if result is None else list(result)
+
+    def recommend(self, num_places: int, max_budget: int, user_input: list) -> Optional[list[tuple]]:
+        """Returns the information of the restaurants chosen by self.tree.filter_restaurants (in the same
+        format as Tree.get_restaurant_info), or None if there are no matches, using the cache when possible.
+
+        Preconditions:
+            - the preconditions of Tree.filter_restaurants hold
+        """
+        def compute() -> Optional[list[tuple]]:
+            indices = self.tree.filter_restaurants(num_places, max_budget, user_input)
+            return None if indices is None else self.tree.get_restaurant_info(indices, self.t)
+
+        result = self._lookup(('recommend', num_places) + self._key(num_places, max_budget, user_input), compute)
+        return None if result is None else list(result)
+
+    def clear(self) -> None:
+        """Forget every remembered query (but not the hit and miss counts).
+        """
+        self._entries.clear()
+        self._prices = sorted(set(self.t.get_prices()))
+        self._version = self.t.version
+
+    def _key(self, num_places: int, max_budget: int, user_input: list) -> tuple:
+        """Returns the canonical form of the given query (not including num_places).
+        """
+        if self._version != self.t.version:
+            self.clear()
+
+        budget = max_budget / num_places
+        i = bisect_right(self._prices, budget)
+        price_cap = self._prices[i - 1] if i > 0 else None
+        return tuple(_level_key(item) for item in user_input) + (price_cap,)
+
+    def _lookup(self, key: tuple, compute: Callable[[], Optional[list]]) -> Optional[list]:
+        """Returns the remembered result for key if there is one (and it has not expired),
+        otherwise computes it with compute() and remembers it.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and (self.ttl is None or now - entry[0] < self.ttl):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if METRICS.enabled:
+                METRICS.count('cache_hits')
+            return entry[1]
+
+        self.misses += 1
+        if METRICS.enabled:
+            METRICS.count('cache_misses')
+        result = compute()
+        self._entries[key] = (now, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+        return result
+
+
+def _level_key(item: Any) -> Any:
+    """Returns the canonical form of one level of a query: None (any value) and single values are kept,
+    and collections of values (such as the cuisines) become a frozenset.
+
+    >>> _level_key(['Cafe', 'Bakery', 'Cafe']) == frozenset({'Bakery', 'Cafe'})
+    True
+    >>> _level_key('Cafe'), _level_key(None)
+    ('Cafe', None)
+    """
+    if item is None or isinstance(item, str):
+        return item
+    return frozenset(item)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    # python_ta.check_all('cache.py', config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['__future__', 'typing', 'time', 'bisect', 'collections', 'functions', 'metrics'],
+    #     'allowed-io': []
+    # })
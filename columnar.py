@@ -0,0 +1,304 @@
+""" CSC111 Project 2: Restaurant Recommendation System
+
+Module Description
+==================
+This module contains the ColumnarIndex class, an optional query engine that stores
+the restaurant dataset as NumPy arrays (one per column) instead of a tree of objects,
+and answers the same queries as Tree.filter_restaurants.
+
+This module requires NumPy, which is not needed by the rest of the program.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of students
+taking CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC111 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2024 UofT DCS Teaching Team """
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import numpy as np
+
+from functions import FLAGS, TreeBuilder, places_per_cuisine, select_places
+
+# names of the columns of a ColumnarIndex
+COLUMNS = ('og_index', 'price', 'rating', 'name_code', 'table_booking', 'online_order', 'cuisine_bits',
+           'type_bits', 'text', 'text_offsets', 'index_order')
+
+
+class ColumnarIndex:
+    """A column-oriented table of restaurants, used to answer filter_restaurants queries
+    with vectorized operations.
+
+    Each row is one restaurant, in the same order as the csv file. Cuisines and types are
+    stored as bitsets with one bit per value in cuisine_names and type_names. Every column is
+    a NumPy array (listed in COLUMNS), so the whole table can be placed in shared memory.
+
+    Representation Invariants:
+        - all(len(self.columns[name]) == len(self.columns['og_index']) for name in
+              ['price', 'rating', 'name_code', 'table_booking', 'online_order', 'cuisine_bits',
+               'type_bits', 'index_order'])
+        - len(self.columns['text_offsets']) == 3 * len(self.columns['og_index']) + 1
+        - self.cuisine_names == sorted(self.cuisine_names)
+        - self.type_names == sorted(self.type_names)
+
+    Instance Attributes:
+        - columns: maps the name of each column to its array:
+            - og_index: original index of each restaurant in the csv file
+            - price: average price (for 2 people, in CAD) of each restaurant
+            - rating: average rating (out of 5) of each restaurant
+            - name_code: position of each restaurant's name among all names, in alphabetical order
+            - table_booking: whether each restaurant has table booking
+            - online_order: whether each restaurant has online ordering
+            - cuisine_bits: packed bitset (one row per restaurant) of the cuisines of each restaurant
+            - type_bits: packed bitset (one row per restaurant) of the types of each restaurant
+            - text: the UTF-8 encoded name, types and cuisines of every restaurant, one after the other
+            - text_offsets: where the name, types and cuisines of each restaurant start in text
+            - index_order: the rows sorted by original index, used to find the row of an index
+        - cuisine_names: all cuisines, in alphabetical order
+        - type_names: all types, in alphabetical order
+    """
+    columns: dict[str, np.ndarray]
+    cuisine_names: list[str]
+    type_names: list[str]
+    # Private Instance Attributes:
+    #   - _cuisine_codes: maps each cuisine to its position in cuisine_names
+    #   - _type_codes: maps each type to its position in type_names
+    _cuisine_codes: dict[str, int]
+    _type_codes: dict[str, int]
+
+    def __init__(self, columns: dict[str, np.ndarray], cuisine_names: list[str], type_names: list[str]) -> None:
+        """Initialize a new ColumnarIndex with the given columns and cuisine and type names.
+
+        The arrays are used as they are (not copied), so they may be views of shared memory.
+
+        Preconditions:
+            - set(columns) == set(COLUMNS)
+        """
+        self.columns = columns
+        self.cuisine_names = cuisine_names
+        self.type_names = type_names
+        self._cuisine_codes = {c: code for code, c in enumerate(cuisine_names)}
+        self._type_codes = {t: code for code, t in enumerate(type_names)}
+
+    @classmethod
+    def from_infos(cls, infos: list[list[str]], indices: list[int]) -> ColumnarIndex:
+        """Return a new ColumnarIndex from the information of each restaurant, in the
+        format returned by TreeBuilder.get_info, and their original indices.
+
+        Preconditions:
+            - len(infos) == len(indices)
+        """
+        cuisine_names = sorted({c.lstrip() for info in infos for c in info[6].split(',')})
+        type_names = sorted({t.lstrip() for info in infos for t in info[5].split(',')})
+        cuisine_codes = {c: code for code, c in enumerate(cuisine_names)}
+        type_codes = {t: code for code, t in enumerate(type_names)}
+        name_codes = {name: code for code, name in enumerate(sorted({info[2] for info in infos}))}
+
+        text = [field.encode('utf-8') for info in infos for field in (info[2], info[5], info[6])]
+        og_index = np.array(indices, dtype=np.int64)
+        columns = {
+            'og_index': og_index,
+            'price': np.array([float(info[0]) for info in infos], dtype=np.float64),
+            'rating': np.array([float(info[1]) for info in infos], dtype=np.float64),
+            'name_code': np.array([name_codes[info[2]] for info in infos], dtype=np.int32),
+            'online_order': np.array([info[3] == 'Yes' for info in infos], dtype=np.bool_),
+            'table_booking': np.array([info[4] == 'Yes' for info in infos], dtype=np.bool_),
+            'cuisine_bits': _pack_bits([[cuisine_codes[c.lstrip()] for c in info[6].split(',')]
+                                        for info in infos], len(cuisine_names)),
+            'type_bits': _pack_bits([[type_codes[t.lstrip()] for t in info[5].split(',')]
+                                     for info in infos], len(type_names)),
+            'text': np.frombuffer(b''.join(text), dtype=np.uint8),
+            'text_offsets': np.cumsum([0] + [len(field) for field in text], dtype=np.int64),
+            'index_order': np.argsort(og_index, kind='stable')
+        }
+        return cls(columns, cuisine_names, type_names)
+
+    @classmethod
+    def from_tree_builder(cls, tree_builder: TreeBuilder) -> ColumnarIndex:
+        """Return a new ColumnarIndex holding every restaurant in the tree built by tree_builder.
+        """
+        indices = tree_builder.get_indices()
+        return cls.from_infos(tree_builder.get_infos(indices), indices)
+
+    def __len__(self) -> int:
+        """Return the number of rows in this table.
+        """
+        return len(self.columns['og_index'])
+
+    def filter_restaurants(self, num_places: int, max_budget: int, user_input: list) -> Optional[list[int]]:
+        """Returns a list of the indices of the restaurants whose total average prices fall within
+        the max_budget, including all cuisines listed in user_input.
+
+        Gives the same result as Tree.filter_restaurants on the tree built from the same data, including
+        for queries with None (any value) or a collection of values (any of them) at some levels.
+
+        Preconditions:
+            - 0 <= max_budget
+            - user_input[0] is None or len(user_input[0]) <= num_places
+            - user_input in the form [{cuisines}, type, table booking, online order]
+
+        >>> index = ColumnarIndex.from_tree_builder(TreeBuilder('test_data.csv'))
+        >>> index.filter_restaurants(2, 20, [{'North Indian'}, 'Takeaway', 'No', 'No'])
+        [7020]
+        >>> index.get_restaurant_info([7020])
+        [('Xpress Kitchen', 'North Indian, Chinese', 'Takeaway, Delivery', '3.3', '8.0')]
+        >>> index.filter_restaurants(2, 20, [{'Mexican'}, 'Takeaway', 'No', 'No']) is None
+        True
+        >>> index.filter_restaurants(3, 30, [None, None, 'No', 'Yes'])
+        [3430, 4564, 1277]
+        >>> index.filter_restaurants(3, 3000, [{'North Indian'}, 'Casual Dining', 'Maybe', 'No']) is None
+        True
+        >>> index.filter_restaurants(3, 30, [None, None, {'No', 'Maybe'}, {'Yes', 'Maybe'}])
+        [3430, 4564, 1277]
+        >>> index.filter_restaurants(3, 3000, [None, None, {'Maybe'}, None]) is None
+        True
+        """
+        budget = max_budget / num_places
+        all_restaurants = []
+
+        for cuisine in ([None] if user_input[0] is None else sorted(user_input[0])):
+            rows = self._find_rows(cuisine, user_input[1], user_input[2], user_input[3])
+            if rows is not None:
+                all_restaurants.append(self._top_rows(rows, budget, places_per_cuisine(num_places)))
+
+        return select_places(all_restaurants, num_places)
+
+    def _find_rows(self, cuisine: Any, res_type: Any, table_booking: Any, online_order: Any) -> Optional[np.ndarray]:
+        """Return the rows matching the given cuisine, type, table booking and online order,
+        or None if there are no matches. Each of them is a value, a collection of values (matching
+        any of them), or None (matching any value).
+        """
+        columns = self.columns
+        masks = [_match_bits(columns['cuisine_bits'], self._cuisine_codes, cuisine),
+                 _match_bits(columns['type_bits'], self._type_codes, res_type),
+                 _match_flags(columns['table_booking'], table_booking),
+                 _match_flags(columns['online_order'], online_order)]
+        masks = [level_mask for level_mask in masks if level_mask is not None]
+        if masks:
+            mask = masks[0]
+            for level_mask in masks[1:]:
+                mask &= level_mask
+            rows = np.flatnonzero(mask)
+        else:
+            rows = np.arange(len(self))
+        if len(rows) == 0:
+            return None
+        return rows
+
+    def _top_rows(self, rows: np.ndarray, budget: float, k: int) -> list[int]:
+        """Return the original indices of the (at most) k best rated rows whose price is within budget,
+        with ties broken by name, then index.
+        """
+        price, rating = self.columns['price'], self.columns['rating']
+        rows = rows[price[rows] <= budget]
+        if len(rows) > k:
+            # keep every row rated at least as high as the kth best, so ties can be broken by name
+            neg_rating = -rating[rows]
+            kth = neg_rating[np.argpartition(neg_rating, k - 1)[k - 1]]
+            rows = rows[neg_rating <= kth]
+
+        og_index = self.columns['og_index']
+        order = np.lexsort((og_index[rows], self.columns['name_code'][rows], -rating[rows]))
+        return og_index[rows[order[:k]]].tolist()
+
+    def get_restaurant_info(self, restaurant_indices: list[int]) -> list[tuple]:
+        """ Returns a list of tuples with each corresponding restaurant and their information
+        based on the indices in restaurant_indices, in the same form as Tree.get_restaurant_info:
+            (name, cuisines, types, rating, average price)
+
+        Restaurants with no matching index are skipped.
+        """
+        og_index, index_order = self.columns['og_index'], self.columns['index_order']
+        text, offsets = self.columns['text'], self.columns['text_offsets']
+        positions = np.searchsorted(og_index[index_order], restaurant_indices)
+
+        infos = []
+        for i, position in zip(restaurant_indices, positions.tolist()):
+            if position < len(index_order) and og_index[index_order[position]] == i:
+                row = int(index_order[position])
+                name, types, cuisines = (bytes(text[offsets[3 * row + k]:offsets[3 * row + k + 1]]).decode('utf-8')
+                                         for k in range(3))
+                infos.append((name, cuisines, types, str(float(self.columns['rating'][row])),
+                              str(float(self.columns['price'][row]))))
+        return infos
+
+    def get_all_cuisines(self) -> list[str]:
+        """ Returns a list of all cuisines (sorted in alphabetical order).
+        """
+        return list(self.cuisine_names)
+
+    def get_all_types(self) -> list[str]:
+        """ Returns a list of all types (sorted in alphabetical order).
+        """
+        return list(self.type_names)
+
+
+def _pack_bits(codes: list[list[int]], num_codes: int) -> np.ndarray:
+    """Return a packed bitset with one row for each list in codes, where bit c of row r
+    is set if and only if c is in codes[r].
+    """
+    rows = np.array([r for r, row_codes in enumerate(codes) for _ in row_codes], dtype=np.int64)
+    flat = np.array([c for row_codes in codes for c in row_codes], dtype=np.int64)
+    bits = np.zeros((len(codes), (num_codes + 7) // 8), dtype=np.uint8)
+    np.bitwise_or.at(bits, (rows, flat >> 3), (0x80 >> (flat & 7)).astype(np.uint8))
+    return bits
+
+
+def _has_bit(bits: np.ndarray, code: int) -> np.ndarray:
+    """Return a boolean array of whether bit code is set in each row of the packed bitset bits.
+    """
+    return (bits[:, code >> 3] & (0x80 >> (code & 7))) != 0
+
+
+def _match_bits(bits: np.ndarray, codes: dict[str, int], item: Any) -> Optional[np.ndarray]:
+    """Return a boolean array of whether each row of the packed bitset bits has the value item (or any
+    of the values in item, if it is a collection), where codes maps each value to its bit, or None if
+    item is None (every row matches).
+    """
+    if item is None:
+        return None
+
+    mask = np.zeros(len(bits), dtype=np.bool_)
+    for value in ([item] if isinstance(item, str) else item):
+        if value in codes:
+            mask |= _has_bit(bits, codes[value])
+    return mask
+
+
+def _match_flags(flags: np.ndarray, item: Any) -> Optional[np.ndarray]:
+    """Return a boolean array of whether each of the 'Yes'/'No' flags matches item ('Yes', 'No', or a
+    collection of them), or None if item is None (every flag matches). Any other value matches no flag,
+    as in Tree.filter_restaurants.
+    """
+    if item is None:
+        return None
+    elif isinstance(item, str):
+        if item not in FLAGS:
+            return np.zeros(len(flags), dtype=np.bool_)
+        return flags == FLAGS[item]
+
+    mask = np.zeros(len(flags), dtype=np.bool_)
+    for value in set(item):
+        if value in FLAGS:
+            mask |= flags == FLAGS[value]
+    return mask
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    # python_ta.check_all('columnar.py', config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['__future__', 'typing', 'numpy', 'functions'],
+    #     'allowed-io': []
+    # })
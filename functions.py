@@ -19,7 +19,52 @@ This file is Copyright (c) 2024 UofT DCS Teaching Team """
 from __future__ import annotations
 
 import csv
-from typing import Optional, Any
+import hashlib
+import heapq
+import os
+import pickle
+from bisect import bisect_right, insort
+from itertools import islice
+from math import isqrt
+from typing import Optional, Any, Callable, Iterable, Iterator
+
+from geo import GeoIndex, MAX_DISTANCE_KM, distance_km
+from metrics import METRICS
+
+# Identifies a snapshot file written by TreeBuilder.save_snapshot. The version must be
+# increased whenever the layout of Tree or Restaurant changes, so old snapshots are rebuilt.
+SNAPSHOT_MAGIC = b'RESTAURANT-TREE'
+SNAPSHOT_VERSION = 5
+
+# smallest number of restaurants in each block of a PriceIndex
+MIN_BLOCK_SIZE = 32
+
+# number of levels in each path of the tree (cuisine, type, table booking, online order)
+NUM_LEVELS = 4
+
+# the values of table booking and online order in the dataset, and how they are stored
+FLAGS = {'No': False, 'Yes': True}
+
+# the code given to values not in a Vocabulary (or FLAGS), which matches no restaurant
+UNKNOWN = -1
+
+# the columns of the csv file holding the information of each restaurant, named in its header, in the order
+# of the information (see TreeBuilder.get_info)
+CSV_COLUMNS = ('price', 'rating', 'name', 'online_order', 'table_booking', 'type', 'cuisines')
+
+# the names the column of the csv file holding each restaurant's index can have in its header (it has no name
+# in data.csv, as written by pandas). Without a header, or if no column has these names, it is the first column.
+INDEX_COLUMNS = ('', 'index')
+
+# the optional columns of the csv file holding the location of each restaurant (in degrees)
+LOCATION_COLUMNS = ('latitude', 'longitude')
+
+# number of csv rows read between calls to the progress callback of TreeBuilder.build_tree
+PROGRESS_INTERVAL = 2000
+
+# the largest budget accepted by validate_preferences (far above the price of any restaurant, but small
+# enough to divide as a float)
+MAX_BUDGET = 10 ** 9
 
 
 class Tree:
@@ -27,24 +72,57 @@ class Tree:
 
     Representation Invariants:
         - self._root is not None or self._subtrees == []
-        - self.rating >= 0
-        - self.price >= 0
+        - self._children == {subtree.get_key(): subtree for subtree in self._subtrees}
+        - not self._sorted or self._subtrees is sorted in ascending order by root
 
     Instance Attributes:
         - root: The item stored at this tree's root, or None if the tree is empty.
         - subtrees: The list of subtrees of this tree. This attribute is empty when
                     self._root is None (representing an empty tree). However, this attribute
                     may be empty when self._root is not None, which represents a tree consisting
-                    of just one item. Items are sorted in ascending order by root.
-        - rating: average rating (out of 5) for the restaurant
-        - price: average price (for 2 people) for the restaurant
-        - og_index: original index of the restaurant in the csv file
+                    of just one item. Items are sorted in ascending order by root whenever
+                    sorted is True.
+        - children: maps the key of each subtree (see get_key) to that subtree, used to find a
+                    matching subtree in constant time while adding and removing restaurants.
+        - sorted: whether subtrees is currently sorted. Subtrees added while building
+                  the tree are appended, and only sorted (once) when an ordered lookup needs them.
+
+    The leaves of the tree (restaurant names) are Restaurant objects. Each restaurant is
+    stored once, and shared by every path (cuisine -> type -> table booking -> online order)
+    that leads to it.
+
+    The roots of the cuisine and type subtrees are not strings, but their codes in the vocabulary
+    of the tree (see Vocabulary), and the roots of the table booking and online order subtrees are
+    booleans, so that paths are searched by comparing integers. Queries are given as strings, and
+    encoded once by the root.
+
+    Queries name a value for each level of the paths. Instead of a single value, any level can
+    be given a set (or other collection) of values, matching any of them, or None, matching any
+    value. Such queries are answered from an AttributeIndex of the root instead of the paths.
+
+    Restaurants with a location can also be queried by their distance from a point (see
+    filter_restaurants_near and nearest_restaurants), using a GeoIndex of the root.
     """
+    __slots__ = ('_root', '_subtrees', '_children', '_sorted', '_price_index', '_attribute_index', '_vocabulary',
+                 '_geo_index')
     _root: Optional[Any]
     _subtrees: list[Tree]
-    rating: Optional[float]
-    price: Optional[float]
-    og_index: Optional[int]
+    _children: dict[Any, Tree]
+    _sorted: bool
+    # Private Instance Attributes:
+    #   - _price_index: the restaurants in subtrees indexed by price, or None if it has not been
+    #                   built since subtrees last changed. Only used when this tree is an online
+    #                   order (so its subtrees are restaurants).
+    #   - _attribute_index: the restaurants in this tree indexed by the values of each level of their
+    #                       paths, or None if it has not been built. Only used when this tree is the root.
+    #   - _vocabulary: the vocabulary of the codes of the cuisines and types in this tree, or None if it
+    #                  has not been created yet. Only used when this tree is the root or a restaurant.
+    #   - _geo_index: the restaurants in this tree with a location, in a grid of their locations, or None
+    #                 if it has not been built. Only used when this tree is the root.
+    _price_index: Optional[PriceIndex]
+    _attribute_index: Optional[AttributeIndex]
+    _vocabulary: Optional[Vocabulary]
+    _geo_index: Optional[GeoIndex]
 
     def __init__(self, root: Optional[Any], subtrees: list[Tree]) -> None:
         """Initialize a new Tree with the given root value and subtrees.
@@ -56,6 +134,41 @@ class Tree:
         """
         self._root = root
         self._subtrees = subtrees
+        self._children = {subtree.get_key(): subtree for subtree in subtrees}
+        self._sorted = True
+        self._price_index = None
+        self._attribute_index = None
+        self._vocabulary = None
+        self._geo_index = None
+
+    def __reduce__(self) -> tuple:
+        """Return how to pickle this tree (for snapshots, and to send partial trees between processes).
+
+        Only the root, subtrees, whether they are sorted and the vocabulary are pickled, since children
+        can be recomputed from the subtrees.
+        """
+        return self.__class__, (self._root, self._subtrees), (self._sorted, self._vocabulary)
+
+    def __setstate__(self, state: tuple[bool, Optional[Vocabulary]]) -> None:
+        """Restore whether the subtrees of this tree are sorted, and its vocabulary, after unpickling it.
+        """
+        self._sorted, self._vocabulary = state
+
+    def get_key(self) -> Any:
+        """Return the key of this tree in its parent's children, which is its root.
+        """
+        return self._root
+
+    def get_vocabulary(self) -> Vocabulary:
+        """Return the vocabulary of the codes of the cuisines and types in this tree, creating it
+        if this tree does not have one yet.
+
+        Preconditions:
+            - self._root == 'root' or isinstance(self, Restaurant)
+        """
+        if self._vocabulary is None:
+            self._vocabulary = Vocabulary()
+        return self._vocabulary
 
     def is_empty(self) -> bool:
         """Return whether this tree is empty.
@@ -111,46 +224,127 @@ class Tree:
 
             return f'Tree({self._root}, [{", ".join(subtrees)}])'
 
-    def add_restaurant(self, info: list[str], i: int) -> None:
-        """ Mutates this tree to add given restaurant based on its information.
+    def add_restaurant(self, info: list[str], i: int) -> Restaurant:
+        """ Mutates this tree to add given restaurant based on its information, and
+        returns the Restaurant that was added.
 
-        Recursively adds each subsequent piece of information as a child of the
-        previous (in the order cuisine -> type -> table booking -> online order)
-        and adds the price/rating/index to the restaurant name.
+        Adds each subsequent piece of information as a child of the previous
+        (in the order cuisine -> type -> table booking -> online order), with the
+        restaurant itself (holding its price/rating/index) as the leaf.
 
         Preconditions:
-            - info is in proper format
+            - info is in proper format:
+                [price, rating, name, online order, table booking, types, cuisines]
+            - self._root == 'root'
         """
-        if len(info) == 2:
-            self.add_price_rating(float(info[0]), float(info[1]))
-            self.og_index = i
-        else:
-            items = info[len(info) - 1].split(',')
-            for item in items:
-                self._add_restaurant_helper(info, i, item.lstrip())
+        restaurant = Restaurant(info, i, self.get_vocabulary())
+        self.insert_restaurant(restaurant)
+        return restaurant
 
-    def _add_restaurant_helper(self, info: list[str], i: int, item: str) -> None:
-        """ Helper method for add_restaurant().
+    def insert_restaurant(self, restaurant: Restaurant) -> None:
+        """ Mutates this tree to add restaurant as a leaf of every path matching its
+        cuisines, types, table booking and online order.
+
+        If a restaurant with the same index is already on one of these paths, it is replaced.
+
+        Preconditions:
+            - self._root == 'root'
+            - restaurant.get_vocabulary() is self.get_vocabulary()
         """
-        tree = None
-        for subtree in self._subtrees:
-            if subtree._root == item:
-                tree = subtree
+        self._add_restaurant_helper(restaurant, restaurant.get_levels())
+        if self._attribute_index is not None:
+            self._attribute_index.add(restaurant)
+        if self._geo_index is not None and restaurant.latitude is not None:
+            self._geo_index.add(restaurant)
 
-        if tree is None:
-            tree = Tree(item, [])
-            self.insert_tree(tree)
+    def _add_restaurant_helper(self, restaurant: Restaurant, levels: list[tuple]) -> None:
+        """ Helper method for insert_restaurant().
+
+        levels holds the items of each remaining level of the path, with the restaurant
+        added as a child of the last one.
+        """
+        if not levels:
+            self._add_child(restaurant)
+        else:
+            for item in levels[0]:
+                tree = self._children.get(item)
+                if tree is None:
+                    tree = Tree(item, [])
+                    self._add_child(tree)
+
+                tree._add_restaurant_helper(restaurant, levels[1:])
+
+    def remove_restaurant(self, restaurant: Restaurant) -> bool:
+        """ Mutates this tree to remove restaurant from every path it is on, and returns
+        whether it was found. Subtrees left without any restaurants are removed as well.
+
+        >>> t = Tree('root', [])
+        >>> r = t.add_restaurant(['10.0', '4.0', 'x', 'No', 'No', 'Cafe', 'a, b'], 0)
+        >>> _ = t.add_restaurant(['10.0', '4.0', 'y', 'No', 'No', 'Cafe', 'b'], 1)
+        >>> t.remove_restaurant(r)
+        True
+        >>> t.get_all_cuisines()
+        ['b']
+        >>> [restaurant.name for restaurant in t._restaurants()]
+        ['y']
+        >>> t.remove_restaurant(r)
+        False
+        """
+        if self._attribute_index is not None:
+            self._attribute_index.remove(restaurant)
+        if self._geo_index is not None and restaurant.latitude is not None:
+            self._geo_index.remove(restaurant)
+        return self._remove_restaurant_helper(restaurant, restaurant.get_levels())
+
+    def _remove_restaurant_helper(self, restaurant: Restaurant, levels: list[tuple]) -> bool:
+        """ Helper method for remove_restaurant().
+        """
+        if not levels:
+            if self._children.get(restaurant.og_index) is restaurant:
+                self._remove_child(restaurant.og_index)
+                return True
+            return False
+        else:
+            removed = False
+            for item in levels[0]:
+                tree = self._children.get(item)
+                if tree is not None and tree._remove_restaurant_helper(restaurant, levels[1:]):
+                    removed = True
+                    if not tree._subtrees:
+                        self._remove_child(item)
 
-        tree.add_restaurant(info[:len(info) - 1], i)
+            return removed
 
-    def add_price_rating(self, price: float, rating: float) -> None:
-        """ Mutates this tree to add rating and price.
+    def _add_child(self, tree: Tree) -> None:
+        """ Mutates this tree to add tree to its subtrees, replacing the subtree with the same key
+        if there is one.
+
+        New subtrees are appended for now, and sorted in bulk by sort_subtrees() when it is needed.
+        """
+        key = tree.get_key()
+        old = self._children.get(key)
+        if old is not None:
+            self._subtrees[self._subtrees.index(old)] = tree
+        else:
+            if self._subtrees and self._subtrees[-1]._root > tree._root:
+                self._sorted = False
+            self._subtrees.append(tree)
+
+        self._children[key] = tree
+        self._price_index = None
+
+    def _remove_child(self, key: Any) -> None:
+        """ Mutates this tree to remove the subtree with the given key, keeping the others in order.
 
         Preconditions:
-            - this tree must be a restaurant name
+            - key in self._children
         """
-        self.price = price
-        self.rating = rating
+        tree = self._children.pop(key)
+        self._price_index = None
+        for i in range(len(self._subtrees)):
+            if self._subtrees[i] is tree:
+                del self._subtrees[i]
+                return
 
     def insert_tree(self, tree: Tree) -> None:
         """ Mutates this tree to add tree to subtrees while keeping it sorted.
@@ -163,75 +357,565 @@ class Tree:
         >>> t._subtrees
         [Tree(1, []), Tree(2, []), Tree(3, []), Tree(4, [])]
         """
-        if len(self._subtrees) == 0:
-            self._subtrees.append(tree)
-        else:
-            for i in range(len(self._subtrees)):
-                if self._subtrees[i]._root > tree._root:
-                    self._subtrees.insert(i, tree)
-                    return
-            self._subtrees.append(tree)
+        self.sort_subtrees()
+        insort(self._subtrees, tree, key=lambda subtree: subtree._root)
+        self._children[tree.get_key()] = tree
+        self._price_index = None
+        self._attribute_index = None
+        self._geo_index = None
+
+    def merge(self, other: Tree) -> None:
+        """ Mutates this tree to add every path of other to it. Restaurants in other replace
+        the restaurants in this tree with the same index on the same path.
+
+        If other is a root with a different vocabulary (e.g. it was built in another process), it is
+        first mutated to use the codes of this tree's vocabulary.
+
+        >>> t1 = Tree('root', [])
+        >>> _ = t1.add_restaurant(['10.0', '4.0', 'x', 'No', 'No', 'Cafe', 'a'], 0)
+        >>> t2 = Tree('root', [])
+        >>> _ = t2.add_restaurant(['10.0', '4.0', 'y', 'No', 'No', 'Cafe', 'a, b'], 1)
+        >>> t1.merge(t2)
+        >>> t1.get_all_cuisines()
+        ['a', 'b']
+        >>> sorted(r.name for r in t1.find_restaurants(['a', 'Cafe', 'No', 'No']))
+        ['x', 'y']
+        """
+        self._attribute_index = None
+        self._geo_index = None
+        if other._vocabulary is not None and other._vocabulary is not self.get_vocabulary():
+            other._recode(self._vocabulary)
+
+        for subtree in other._subtrees:
+            mine = self._children.get(subtree.get_key())
+            if mine is None or isinstance(subtree, Restaurant):
+                self._add_child(subtree)
+            else:
+                mine.merge(subtree)
+
+    def _recode(self, vocabulary: Vocabulary) -> None:
+        """ Mutates this tree (and its restaurants) to use the codes of vocabulary instead of its own.
+
+        Preconditions:
+            - self._root == 'root'
+        """
+        codes = [vocabulary.encode(value) for value in self.get_vocabulary().values]
+        self._recode_helper(codes, vocabulary, 0)
+        self._vocabulary = vocabulary
+        self._attribute_index = None
+
+    def _recode_helper(self, codes: list[int], vocabulary: Vocabulary, depth: int) -> None:
+        """ Helper method for _recode(), where codes maps each old code to its new code, and depth is the
+        level of this tree's subtrees (0 for cuisines, 1 for types, ...).
+        """
+        for subtree in self._subtrees:
+            if isinstance(subtree, Restaurant):
+                # each restaurant is on several paths, but only recoded once
+                if subtree._vocabulary is not vocabulary:
+                    subtree.cuisines = vocabulary.share(tuple(codes[code] for code in subtree.cuisines))
+                    subtree.types = vocabulary.share(tuple(codes[code] for code in subtree.types))
+                    subtree._vocabulary = vocabulary
+            else:
+                if depth < 2:
+                    subtree._root = codes[subtree._root]
+                subtree._recode_helper(codes, vocabulary, depth + 1)
+
+        if depth < 2:
+            self._children = {subtree.get_key(): subtree for subtree in self._subtrees}
+            self._sorted = False
+
+    def sort_subtrees(self, recursive: bool = False) -> None:
+        """ Mutates this tree to sort its subtrees in ascending order by root, if they
+        are not sorted already. If recursive is True, every subtree is sorted as well.
+
+        >>> t = Tree('root', [])
+        >>> _ = t.add_restaurant(['10.0', '4.0', 'x', 'No', 'No', 'Cafe', 'a'], 0)
+        >>> _ = t.add_restaurant(['10.0', '4.0', 'y', 'No', 'No', 'Cafe', 'c, b'], 1)
+        >>> t.get_all_cuisines()
+        ['a', 'b', 'c']
+        >>> [subtree._root for subtree in t._subtrees]
+        [0, 2, 3]
+        """
+        if not self._sorted:
+            self._subtrees.sort(key=lambda subtree: subtree._root)
+            self._sorted = True
+
+        if recursive:
+            for subtree in self._subtrees:
+                subtree.sort_subtrees(True)
 
-    def find_restaurants(self, user_input: list[str]) -> Optional[set[Tree]]:
+    def find_restaurants(self, user_input: list) -> Optional[set[Tree]]:
         """Returns a set of all restaurants matching user input for each category,
         or None if there are no matches.
 
-        Uses binary search on sorted subtrees to find matches.
+        The cuisine, type, table booking and online order are encoded (see _encode), and followed down
+        the tree. If any category is None (any value) or a collection of values (any of them), the
+        matches are found with the attribute index.
 
         Preconditions:
          - user_input in correct format:
             [cuisine, type, table booking, online order]
-         - self._subtrees is sorted
+         - self._root == 'root'
+
+        >>> tree = TreeBuilder('test_data.csv').build_tree()
+        >>> sorted(r.name for r in tree.find_restaurants([None, {'Takeaway', 'Dessert Parlor'}, 'No', None]))
+        ['Krispy Kreme', 'Sardar Tikka Singh', 'Xpress Kitchen']
+        >>> tree.find_restaurants(['Biryani', None, 'Yes', None]) is None
+        True
         """
-        # base case - return list of restaurants
-        if len(user_input) == 0:
-            return set(self._subtrees)
-        else:
-            start = 0
-            end = len(self._subtrees)
-
-            while start < end:
-                mid = (start + end) // 2
-                mid_subtree = self._subtrees[mid]
-
-                if user_input[0] == mid_subtree._root:
-                    # recursively search on matching subtree
-                    return mid_subtree.find_restaurants(user_input[1:])
-                elif user_input[0] < mid_subtree._root:
-                    end = mid
-                else:
-                    start = mid + 1
+        path = self._encode(user_input)
+        if not all(isinstance(item, str) for item in user_input):
+            matches = self.get_attribute_index().match(path)
+            return set(matches) if matches else None
 
+        tree = self._find_tree(path)
+        if tree is None:
             return None
+        else:
+            return set(tree._subtrees)
+
+    def _encode(self, user_input: list) -> list:
+        """Returns user_input with each value replaced by the key of the subtrees matching it: the code
+        of each cuisine and type in this tree's vocabulary (or UNKNOWN), and True or False for table
+        booking and online order. Collections of values are replaced by sets of keys, and None is kept.
+
+        Preconditions:
+            - self._root == 'root'
+            - user_input in the form [cuisine, type, table booking, online order]
+
+        >>> t = Tree('root', [])
+        >>> _ = t.add_restaurant(['10.0', '4.0', 'x', 'No', 'Yes', 'Cafe', 'a, b'], 0)
+        >>> t._encode([{'b', 'z'}, 'Cafe', 'Yes', None])
+        [{1, -1}, 2, True, None]
+        """
+        codes = self.get_vocabulary().codes
+        path = []
+        for level, item in enumerate(user_input):
+            keys = codes if level < 2 else FLAGS
+            if item is None:
+                path.append(None)
+            elif isinstance(item, str):
+                path.append(keys.get(item, UNKNOWN))
+            else:
+                path.append({keys.get(value, UNKNOWN) for value in item})
+
+        return path
+
+    def _find_tree(self, path: list) -> Optional[Tree]:
+        """Returns the subtree at the end of the given path of keys (see _encode), or None if there is none.
+
+        Since the keys are small integers and booleans, each subtree on the path is found in the
+        children of the one before it, which is faster than a binary search comparing them.
+        """
+        tree = self
+        visited = 1
+        for key in path:
+            tree = tree._children.get(key)
+            if tree is None:
+                break
+            visited += 1
+
+        if METRICS.enabled:
+            METRICS.count('nodes_visited', visited)
+        return tree
 
     def filter_restaurants(self, num_places: int, max_budget: int, user_input: list) -> Optional[list[int]]:
         """Returns a list of the indices of the restaurants whose total average prices fall within
         the max_budget, including all cuisines listed in user_input.
 
+        Restaurants are ranked by rating (highest first), with ties broken by name, then index. Cuisines are
+        considered in alphabetical order, so the result does not depend on the order of the set.
+
+        The cuisines can be None, to choose from restaurants of any cuisine, and the type, table booking
+        and online order can each be None (any value) or a collection of values (any of them).
+
         Preconditions:
             - all(r.rating is not None and r.price is not None for r in restaurants)
             - 0 <= max_budget
-            - len(user_input[0]) <= num_places
+            - user_input[0] is None or len(user_input[0]) <= num_places
             - user_input in the form [{cuisines}, type, table booking, online order]
             - self._root == 'root'
+
+        >>> tree = TreeBuilder('test_data.csv').build_tree()
+        >>> tree.filter_restaurants(3, 30, [None, None, 'No', 'Yes'])
+        [3430, 4564, 1277]
+        >>> tree.filter_restaurants(2, 20, [{'North Indian'}, {'Takeaway', 'Delivery'}, 'No', None])
+        [7020, 5285]
+        """
+        with METRICS.stage('filter_restaurants'):
+            if not _is_exact(user_input):
+                with METRICS.stage('attribute_match'):
+                    return self._filter_restaurants_by_attributes(num_places, max_budget, user_input)
+
+            # the stages below run for every cuisine, so they are only measured while METRICS is enabled
+            measured = METRICS.enabled
+            budget = max_budget / num_places
+            all_restaurants = []
+            path = self._encode(user_input)
+
+            for cuisine in sorted(user_input[0]):
+                path[0] = self._vocabulary.find(cuisine)
+                tree = METRICS.timed('descent', self._find_tree, path) if measured else self._find_tree(path)
+                if tree is not None:
+                    index = METRICS.timed('budget_filter', tree.get_price_index) if measured else tree.get_price_index()
+                    # lazily walks the restaurants within budget from best to worst rated, so only as many
+                    # as needed are read
+                    ranked = index.within_budget(budget)
+                    if measured:
+                        ranked = METRICS.counted('candidates_scanned', ranked)
+                    all_restaurants.append(r.og_index for r in ranked)
+
+            # the restaurants within budget are merged by rank during this stage, as select_places reads them
+            if measured:
+                return METRICS.timed('select', select_places, all_restaurants, num_places)
+            return select_places(all_restaurants, num_places)
+
+    def _filter_restaurants_by_attributes(self, num_places: int, max_budget: int,
+                                          user_input: list) -> Optional[list[int]]:
+        """ Helper for filter_restaurants(), which answers queries that do not name one path per cuisine
+        (see _is_exact) from the attribute index, in time proportional to the number of matches.
         """
         budget = max_budget / num_places
+        index = self.get_attribute_index()
         all_restaurants = []
+        path = self._encode(user_input)
 
-        for cuisine in user_input[0]:
-            restaurants = self.find_restaurants([cuisine] + user_input[1:])
-            if restaurants is not None:
-                restaurants = [r for r in restaurants if r.price <= budget]
-                restaurants.sort(key=lambda r: r.rating, reverse=True)
-                all_restaurants.append(restaurants)
-
-        if all_restaurants:
-            selected = [rts[0].og_index for rts in all_restaurants if rts]
-            all_restaurants = [restaurant for rts in all_restaurants for restaurant in rts if
-                               restaurant.og_index not in selected]
-            return selected + [restaurant.og_index for restaurant in all_restaurants[:num_places - len(selected)]]
-        else:
-            return None
+        for cuisine in ([None] if user_input[0] is None else sorted(user_input[0])):
+            path[0] = None if cuisine is None else self._vocabulary.find(cuisine)
+            matches = index.match(path)
+            if METRICS.enabled:
+                METRICS.count('candidates_scanned', len(matches))
+            if matches:
+                top = top_places((r for r in matches if r.price <= budget), num_places, rank_key)
+                all_restaurants.append([r.og_index for r in top])
+
+        return select_places(all_restaurants, num_places)
+
+    def explore_restaurants(self, num_places: int, max_budget: int, user_input: list) -> ResultCursor:
+        """Returns a cursor over every restaurant whose average price falls within max_budget / num_places,
+        and which has any of the cuisines listed in user_input, ranked like filter_restaurants.
+
+        Unlike filter_restaurants, the number of restaurants is not limited to num_places, and their
+        information is only looked up as each page of the cursor is read. Like filter_restaurants, any
+        level can be None or a collection of values.
+
+        Preconditions:
+            - 0 <= max_budget and num_places >= 1
+            - user_input in the form [{cuisines}, type, table booking, online order]
+            - self._root == 'root'
+
+        >>> t = TreeBuilder('test_data.csv')
+        >>> cursor = t.build_tree().explore_restaurants(2, 40, [{'Biryani', 'North Indian'}, 'Delivery', 'No', 'Yes'])
+        >>> len(cursor)
+        2
+        >>> cursor.get_page(0, 10, t)
+        [('Behrouz Biryani', 'Biryani', 'Delivery', '3.9', '10.4'), \
+('Sardar Tikka Singh', 'North Indian', 'Takeaway, Delivery', '2.8', '8.0')]
+        """
+        with METRICS.stage('explore_restaurants'):
+            budget = max_budget / num_places
+            restaurants = set()
+            path = self._encode(user_input)
+            cuisines = [None] if path[0] is None else path[0]
+
+            if _is_exact(user_input):
+                for cuisine in cuisines:
+                    with METRICS.stage('descent'):
+                        tree = self._find_tree([cuisine] + path[1:])
+                    if tree is not None:
+                        with METRICS.stage('budget_filter'):
+                            restaurants.update(tree.get_price_index().within_budget(budget))
+            else:
+                with METRICS.stage('attribute_match'):
+                    index = self.get_attribute_index()
+                    for cuisine in cuisines:
+                        restaurants.update(r for r in index.match([cuisine] + path[1:]) if r.price <= budget)
+
+            if METRICS.enabled:
+                METRICS.count('candidates_scanned', len(restaurants))
+            with METRICS.stage('rank'):
+                return ResultCursor(sorted(restaurants, key=rank_key))
+
+    def get_price_index(self) -> PriceIndex:
+        """ Returns the restaurants in this tree's subtrees, indexed by price.
+
+        The index is kept until the subtrees change, so it is only built once.
+
+        Preconditions:
+            - this tree is an online order (its subtrees are restaurants)
+        """
+        if self._price_index is None:
+            self._price_index = PriceIndex(self._subtrees)
+        return self._price_index
+
+    def get_attribute_index(self) -> AttributeIndex:
+        """ Returns the restaurants in this tree, indexed by the values of each level of their paths.
+
+        The index is built the first time it is needed, then kept up to date as restaurants are
+        inserted and removed (it is built again after merge() or insert_tree()).
+
+        Preconditions:
+            - self._root == 'root'
+        """
+        if self._attribute_index is None:
+            restaurants = {restaurant.og_index: restaurant for restaurant in self._restaurants()}
+            self._attribute_index = AttributeIndex(restaurants.values())
+        return self._attribute_index
+
+    def get_geo_index(self) -> GeoIndex:
+        """ Returns the restaurants in this tree with a location, in a grid of their locations.
+
+        The index is built the first time it is needed (TreeBuilder builds it as soon as the tree is built
+        or loaded, if the dataset has locations), then kept up to date as restaurants are inserted and
+        removed (it is built again after merge() or insert_tree()).
+
+        Preconditions:
+            - self._root == 'root'
+        """
+        if self._geo_index is None:
+            restaurants = {restaurant.og_index: restaurant for restaurant in self._restaurants()
+                           if restaurant.latitude is not None}
+            self._geo_index = GeoIndex(restaurants.values())
+        return self._geo_index
+
+    def filter_restaurants_near(self, num_places: int, max_budget: int, user_input: list, latitude: float,
+                                longitude: float, radius_km: float) -> Optional[list[int]]:
+        """Returns the indices of the restaurants chosen as in filter_restaurants, but only from the restaurants
+        within radius_km of the given point. Restaurants without a location are never chosen.
+
+        For each cuisine, the restaurants are found from whichever is smaller: the restaurants in the cells
+        of the geo index overlapping the circle (whose paths are checked), or the restaurants on the path of
+        the cuisine (whose distances are checked, from best to worst rated, until there are enough).
+
+        Preconditions:
+            - the preconditions of filter_restaurants hold
+            - -90 <= latitude <= 90 and -180 <= longitude <= 180
+            - radius_km >= 0
+
+        >>> t = Tree('root', [])
+        >>> for i, (name, rating, location) in enumerate([('a', '4.0', ['43.6629', '-79.3957']),
+        ...                                               ('b', '4.5', ['43.6426', '-79.3871']),
+        ...                                               ('c', '4.9', ['45.5048', '-73.5772'])]):
+        ...     _ = t.add_restaurant(['10.0', rating, name, 'No', 'No', 'Cafe', 'Tea'] + location, i)
+        >>> t.filter_restaurants_near(2, 20, [{'Tea'}, 'Cafe', 'No', 'No'], 43.66, -79.39, 5.0)
+        [1, 0]
+        >>> t.filter_restaurants_near(2, 20, [None, None, 'No', None], 45.5, -73.6, 5.0)
+        [2]
+        """
+        with METRICS.stage('filter_restaurants_near'):
+            budget = max_budget / num_places
+            exact = _is_exact(user_input)
+            geo_index = self.get_geo_index()
+            cells = geo_index.cells_within(latitude, longitude, radius_km)
+            num_near = sum(len(points) for points in cells)
+            near = None
+            all_restaurants = []
+            path = self._encode(user_input)
+
+            for cuisine in ([None] if user_input[0] is None else sorted(user_input[0])):
+                path[0] = None if cuisine is None else self._vocabulary.find(cuisine)
+                if self._count_matches(path, exact, budget) <= num_near:
+                    ranked = (r for r in self._ranked_matches(path, exact, budget) if r.latitude is not None
+                              and distance_km(latitude, longitude, r.latitude, r.longitude) <= radius_km)
+                    all_restaurants.append([r.og_index for r in top_places(ranked, num_places)])
+                else:
+                    if near is None:
+                        near = [r for _, r in geo_index.within(latitude, longitude, radius_km, cells)]
+                        if METRICS.enabled:
+                            METRICS.count('candidates_scanned', num_near)
+                    top = top_places((r for r in near if r.price <= budget and r.matches(path)), num_places, rank_key)
+                    all_restaurants.append([r.og_index for r in top])
+
+            return select_places(all_restaurants, num_places)
+
+    def nearest_restaurants(self, num_places: int, max_budget: int, user_input: list, latitude: float,
+                            longitude: float) -> Optional[list[int]]:
+        """Returns the indices of the restaurants chosen as in filter_restaurants, but ranked by their distance
+        from the given point (nearest first, with ties ranked by rating) instead of by rating. Restaurants
+        without a location are never chosen.
+
+        The circle searched around the point starts as the size of one cell of the geo index, and doubles
+        until it holds enough matching restaurants for every cuisine. A cuisine with fewer restaurants on
+        its path than there are restaurants in the circle is answered from its path instead.
+
+        Preconditions:
+            - the preconditions of filter_restaurants hold
+            - -90 <= latitude <= 90 and -180 <= longitude <= 180
+
+        >>> t = Tree('root', [])
+        >>> for i, (name, rating, location) in enumerate([('a', '4.0', ['43.6629', '-79.3957']),
+        ...                                               ('b', '4.5', ['43.6426', '-79.3871']),
+        ...                                               ('c', '4.9', ['45.5048', '-73.5772'])]):
+        ...     _ = t.add_restaurant(['10.0', rating, name, 'No', 'No', 'Cafe', 'Tea'] + location, i)
+        >>> t.nearest_restaurants(2, 20, [{'Tea'}, 'Cafe', 'No', 'No'], 45.0, -74.0)
+        [2, 0]
+        """
+        with METRICS.stage('nearest_restaurants'):
+            budget = max_budget / num_places
+            exact = _is_exact(user_input)
+            geo_index = self.get_geo_index()
+            path = self._encode(user_input)
+            cuisines = [None] if user_input[0] is None else [self._vocabulary.find(c) for c in sorted(user_input[0])]
+            limit = places_per_cuisine(num_places)
+            ranked = [None] * len(cuisines)
+            radius = geo_index.cell_km
+
+            while None in ranked:
+                cells = geo_index.cells_within(latitude, longitude, radius)
+                num_near = sum(len(points) for points in cells)
+                near = None
+                for c in range(len(cuisines)):
+                    if ranked[c] is not None:
+                        continue
+
+                    path[0] = cuisines[c]
+                    if self._count_matches(path, exact, budget) <= num_near:
+                        found = [(distance_km(latitude, longitude, r.latitude, r.longitude), r)
+                                 for r in self._matches(path, exact) if r.price <= budget and r.latitude is not None]
+                    else:
+                        if near is None:
+                            near = geo_index.within(latitude, longitude, radius, cells)
+                            if METRICS.enabled:
+                                METRICS.count('candidates_scanned', num_near)
+                        found = [(distance, r) for distance, r in near if r.price <= budget and r.matches(path)]
+                        # there may be nearer restaurants than the ones outside this circle, until it covers the Earth
+                        if len(found) < limit and radius < MAX_DISTANCE_KM:
+                            continue
+
+                    top = top_places(found, num_places, lambda pair: (pair[0], rank_key(pair[1])))
+                    ranked[c] = [r.og_index for _, r in top]
+                radius *= 2
+
+            return select_places(ranked, num_places)
+
+    def _count_matches(self, path: list, exact: bool, budget: float) -> int:
+        """ Returns the number of restaurants matching path (encoded as in _encode) with a price within budget,
+        or more if the path is not exact (see _is_exact), without finding them.
+        """
+        if not exact:
+            return self.get_attribute_index().estimate(path)
+
+        tree = self._find_tree(path)
+        return 0 if tree is None else bisect_right(tree.get_price_index().prices, budget)
+
+    def _matches(self, path: list, exact: bool) -> list[Restaurant]:
+        """ Returns the restaurants matching path (encoded as in _encode), where exact is whether the path
+        names one value at every level (see _is_exact).
+        """
+        if not exact:
+            return self.get_attribute_index().match(path)
+
+        tree = self._find_tree(path)
+        return [] if tree is None else tree._subtrees
+
+    def _ranked_matches(self, path: list, exact: bool, budget: float) -> Iterable[Restaurant]:
+        """ Returns the restaurants matching path (encoded as in _encode) with a price within budget, from best
+        to worst rated. If exact is True (see _is_exact), they are ranked lazily by the path's price index.
+        """
+        if not exact:
+            return sorted((r for r in self.get_attribute_index().match(path) if r.price <= budget), key=rank_key)
+
+        tree = self._find_tree(path)
+        return [] if tree is None else tree.get_price_index().within_budget(budget)
+
+    def _restaurants(self) -> Iterator[Restaurant]:
+        """ Yields the restaurant at the end of every path of this tree (so each restaurant is yielded
+        once for each of its paths).
+        """
+        for subtree in self._subtrees:
+            if isinstance(subtree, Restaurant):
+                yield subtree
+            else:
+                yield from subtree._restaurants()
+
+    def filter_restaurants_batch(self, queries: list[tuple[int, int, list]]) -> list[Optional[list[int]]]:
+        """Returns the result of filter_restaurants for each query in queries, in the same order.
+        Each query is a tuple of the arguments to filter_restaurants: (num_places, max_budget, user_input).
+
+        Queries sharing a path (cuisine, type, table booking, online order) are answered together:
+        the path is only searched once, and its restaurants are only walked once for all of them.
+        Queries with None or several values at some level are answered one at a time.
+
+        Preconditions:
+            - the preconditions of filter_restaurants hold for every query
+            - self._root == 'root'
+
+        >>> t = TreeBuilder('test_data.csv')
+        >>> tree = t.build_tree()
+        >>> tree.filter_restaurants_batch([(2, 20, [{'North Indian'}, 'Takeaway', 'No', 'No']),
+        ...                                (2, 20, [{'North Indian'}, 'Takeaway', 'No', 'Yes']),
+        ...                                (2, 10, [{'North Indian'}, 'Takeaway', 'No', 'No']),
+        ...                                (1, 20, [{'Mexican'}, 'Takeaway', 'No', 'No'])])
+        [[7020], [5285], [], None]
+        """
+        with METRICS.stage('filter_restaurants_batch'):
+            # maps each path to the (query, cuisine) positions that need it
+            paths = {}
+            # maps the position of each query not naming one path per cuisine to its result
+            other_results = {}
+            for q, (num_places, max_budget, user_input) in enumerate(queries):
+                if not _is_exact(user_input):
+                    with METRICS.stage('attribute_match'):
+                        other_results[q] = self._filter_restaurants_by_attributes(num_places, max_budget, user_input)
+                    continue
+                for c, cuisine in enumerate(sorted(user_input[0])):
+                    paths.setdefault((cuisine,) + tuple(user_input[1:]), []).append((q, c))
+
+            ranked = [[None] * len(user_input[0] or []) for _, _, user_input in queries]
+            for path, positions in paths.items():
+                with METRICS.stage('descent'):
+                    tree = self._find_tree(self._encode(list(path)))
+                if tree is not None:
+                    budgets = [queries[q][1] / queries[q][0] for q, _ in positions]
+                    limits = [places_per_cuisine(queries[q][0]) for q, _ in positions]
+                    with METRICS.stage('budget_filter'):
+                        top = tree._top_within_budgets(budgets, limits)
+                    for (q, c), indices in zip(positions, top):
+                        ranked[q][c] = indices
+
+            with METRICS.stage('select'):
+                return [other_results[q] if q in other_results
+                        else select_places([indices for indices in ranked[q] if indices is not None], queries[q][0])
+                        for q in range(len(queries))]
+
+    def _top_within_budgets(self, budgets: list[float], limits: list[int]) -> list[list[int]]:
+        """ Returns, for each budget in budgets, the indices of the (at most) limits[j] best ranked
+        restaurants in this tree's subtrees with a price within budgets[j].
+
+        The restaurants are walked once for all budgets, and the walk stops once every list is full.
+
+        Preconditions:
+            - this tree is an online order (its subtrees are restaurants)
+            - len(budgets) == len(limits)
+        """
+        results = [[] for _ in budgets]
+        # budgets that still need restaurants, from highest to lowest
+        open_budgets = sorted((j for j in range(len(budgets)) if limits[j] > 0), key=lambda j: -budgets[j])
+        neg_budgets = [-budgets[j] for j in open_budgets]
+        num_full = 0
+
+        ranked = self.get_price_index().within_budget(-neg_budgets[0]) if open_budgets else iter([])
+        if METRICS.enabled:
+            ranked = METRICS.counted('candidates_scanned', ranked)
+
+        for restaurant in ranked:
+            if not open_budgets:
+                break
+
+            # every budget in open_budgets[:n] is at least the price of this restaurant
+            n = bisect_right(neg_budgets, -restaurant.price)
+            for j in open_budgets[:n]:
+                if len(results[j]) < limits[j]:
+                    results[j].append(restaurant.og_index)
+                    num_full += len(results[j]) == limits[j]
+
+            # full budgets are skipped above, and only removed once they are half of open_budgets
+            if num_full * 2 > len(open_budgets):
+                open_budgets = [j for j in open_budgets if len(results[j]) < limits[j]]
+                neg_budgets = [-budgets[j] for j in open_budgets]
+                num_full = 0
+
+        return results
 
     def get_all_cuisines(self) -> list[str]:
         """ Returns a list of all cuisines in tree (sorted in alphabetical order).
@@ -239,24 +923,23 @@ class Tree:
         Preconditions:
             - self._root == 'root'
         """
+        vocabulary = self.get_vocabulary()
         cuisines = []
         for cuisine in self._subtrees:
-            cuisines.append(cuisine._root)
+            cuisines.append(vocabulary.values[cuisine._root])
 
-        return cuisines
+        return sorted(cuisines)
 
     def get_all_types(self) -> list[str]:
         """ Returns a list of all types in tree.
 
+        The types are read from the attribute index, so they are only collected from the paths once.
+
         Preconditions:
             - self._root == 'root'
         """
-        types = set()
-        for cuisine in self._subtrees:
-            for res_type in cuisine._subtrees:
-                types.add(res_type._root)
-
-        return list(types)
+        vocabulary = self.get_vocabulary()
+        return [vocabulary.values[code] for code in self.get_attribute_index().get_values(1)]
 
     def get_restaurant_info(self, restaurant_indices: list[int], tree_builder: TreeBuilder) -> list[tuple]:
         """ Returns a list of tuples with each corresponding restaurant and their information
@@ -266,11 +949,150 @@ class Tree:
         Preconditions:
             - all(0 <= i <= 7104 for i in restaurant_indices)
         """
-        infos = []
-        for i in restaurant_indices:
-            info = tuple(tree_builder.get_info(i))
-            infos.append((info[2], info[6], info[5], info[1], info[0]))
-        return infos
+        with METRICS.stage('get_restaurant_info'):
+            infos = []
+            for info in tree_builder.get_infos(restaurant_indices):
+                infos.append((info[2], info[6], info[5], info[1], info[0]))
+            return infos
+
+
+class Restaurant(Tree):
+    """A restaurant from the dataset, stored as a leaf of the tree.
+
+    The same Restaurant is shared by every path of the tree leading to it, and by the
+    TreeBuilder's table of records, so each row of the dataset is only stored once.
+
+    Representation Invariants:
+        - self._subtrees == []
+        - self.rating >= 0
+        - self.price >= 0
+
+    Instance Attributes:
+        - name: name of the restaurant (this is also the root of the leaf)
+        - og_index: original index of the restaurant in the csv file
+        - price: average price (for 2 people) for the restaurant
+        - rating: average rating (out of 5) for the restaurant
+        - online_order: whether the restaurant has online ordering
+        - table_booking: whether the restaurant has table booking
+        - types: the codes of the types of the restaurant, in its vocabulary
+        - cuisines: the codes of the cuisines of the restaurant, in its vocabulary
+        - latitude: the latitude of the restaurant (in degrees), or None if its location is not known
+        - longitude: the longitude of the restaurant (in degrees), or None if its location is not known
+
+    >>> vocabulary = Vocabulary()
+    >>> r = Restaurant(['8.0', '3.9', 'Chai Point', 'Yes', 'No', 'Cafe', 'Tea, Fast Food'], 12, vocabulary)
+    >>> r.cuisines, r.types, r.online_order, r.latitude
+    ((0, 1), (2,), True, None)
+    >>> r.get_cuisines()
+    ['Tea', 'Fast Food']
+    >>> r.get_info()
+    ['8.0', '3.9', 'Chai Point', 'Yes', 'No', 'Cafe', 'Tea, Fast Food']
+    >>> r = Restaurant(['8.0', '3.9', 'Chai Point', 'Yes', 'No', 'Cafe', 'Tea', '12.97', '77.59'], 12, vocabulary)
+    >>> r.latitude, r.get_info()[7:]
+    (12.97, ['12.97', '77.59'])
+    """
+    __slots__ = ('og_index', 'price', 'rating', 'online_order', 'table_booking', 'types', 'cuisines', 'latitude',
+                 'longitude')
+    og_index: int
+    price: float
+    rating: float
+    online_order: bool
+    table_booking: bool
+    types: tuple[int, ...]
+    cuisines: tuple[int, ...]
+    latitude: Optional[float]
+    longitude: Optional[float]
+
+    def __init__(self, info: list[str], i: int, vocabulary: Vocabulary) -> None:
+        """Initialize a new Restaurant with the given information and original index, encoding its
+        cuisines and types in vocabulary.
+
+        Preconditions:
+            - info is in proper format:
+                [price, rating, name, online order, table booking, types, cuisines]
+              optionally followed by its latitude and longitude
+        """
+        super().__init__(info[2], [])
+        self.og_index = i
+        self.add_price_rating(float(info[0]), float(info[1]))
+        self.online_order = info[3] == 'Yes'
+        self.table_booking = info[4] == 'Yes'
+        self.cuisines = vocabulary.encode_all(info[6])
+        self.types = vocabulary.encode_all(info[5])
+        self._vocabulary = vocabulary
+        if len(info) > 7:
+            self.latitude, self.longitude = float(info[7]), float(info[8])
+        else:
+            self.latitude = self.longitude = None
+
+    def __reduce__(self) -> tuple:
+        """Return how to pickle this restaurant, from its codes (so they are not encoded again).
+        """
+        return _restore_restaurant, (self._root, self.og_index, self.price, self.rating, self.online_order,
+                                     self.table_booking, self.types, self.cuisines, self._vocabulary,
+                                     self.latitude, self.longitude)
+
+    @property
+    def name(self) -> str:
+        """The name of this restaurant.
+        """
+        return self._root
+
+    def get_key(self) -> int:
+        """Return the key of this restaurant in its parents' children, which is its original index
+        (so that restaurants with the same name are kept apart).
+        """
+        return self.og_index
+
+    def get_levels(self) -> list[tuple]:
+        """ Returns the keys of each level of the paths leading to this restaurant in the tree,
+        in the order cuisine -> type -> table booking -> online order.
+        """
+        return [self.cuisines, self.types, (self.table_booking,), (self.online_order,)]
+
+    def matches(self, path: list) -> bool:
+        """ Returns whether this restaurant is at the end of path, which gives each level either a key, a set
+        of keys (matching any of them), or None (matching any key), as in AttributeIndex.match.
+        """
+        cuisine, res_type, table_booking, online_order = path
+        return _matches_level(cuisine, self.cuisines) and _matches_level(res_type, self.types) \
+            and (table_booking is None or table_booking == self.table_booking
+                 or isinstance(table_booking, set) and self.table_booking in table_booking) \
+            and (online_order is None or online_order == self.online_order
+                 or isinstance(online_order, set) and self.online_order in online_order)
+
+    def add_price_rating(self, price: float, rating: float) -> None:
+        """ Mutates this restaurant to add rating and price.
+        """
+        self.price = price
+        self.rating = rating
+
+    def get_cuisines(self) -> list[str]:
+        """ Returns a list of the cuisines of this restaurant.
+        """
+        values = self._vocabulary.values
+        return [values[code] for code in self.cuisines]
+
+    def get_types(self) -> list[str]:
+        """ Returns a list of the types of this restaurant.
+        """
+        values = self._vocabulary.values
+        return [values[code] for code in self.types]
+
+    def get_info(self) -> list[str]:
+        """ Returns the information of this restaurant in the form:
+            [price, rating, name, online order, table booking, types, cuisines]
+        followed by its latitude and longitude, if its location is known.
+
+        This is where the codes of the restaurant are decoded, so the types and cuisines are
+        always separated by ', '.
+        """
+        info = [str(self.price), str(self.rating), self._root, 'Yes' if self.online_order else 'No',
+                'Yes' if self.table_booking else 'No', self._vocabulary.decode_all(self.types),
+                self._vocabulary.decode_all(self.cuisines)]
+        if self.latitude is not None:
+            info += [str(self.latitude), str(self.longitude)]
+        return info
 
 
 class TreeBuilder:
@@ -278,37 +1100,482 @@ class TreeBuilder:
 
      Instance Attributes:
         - data: csv file name of restaurant dataset
+        - dropped: number of rows of the dataset left out of the tree the last time it was
+                   built, for each reason (e.g. 'missing info')
+        - version: number of times the restaurants in the tree have been changed (by building
+                   the tree, or by adding, updating or deleting a restaurant). Anything computed
+                   from the tree can compare this to tell whether it is out of date.
+
+    Representation Invariants:
+        - all(self._records[i].og_index == i for i in self._records)
+        - self.version >= 0
     """
     data: str
+    dropped: dict[str, int]
+    version: int
+    # Private Instance Attributes:
+    #   - _records: maps the original index of each restaurant in the tree to the
+    #               Restaurant stored in the tree, filled in by build_tree
+    #   - _header: the header row of the csv file, or None if it has none (or it has not been read yet)
+    #   - _positions: the position in each row of each column in CSV_COLUMNS, followed by each column in
+    #                 LOCATION_COLUMNS if the csv file has them, or None if the header has not been read yet
+    #   - _index_position: the position in each row of the column holding the restaurant's index
+    _records: dict[int, Restaurant]
+    _header: Optional[list[str]]
+    _positions: Optional[list[int]]
+    _index_position: int
 
     def __init__(self, data: str) -> None:
         """Initialize a new TreeBuilder with the given data.
         """
         self.data = data
-
-    def build_tree(self) -> Tree:
+        self._records = {}
+        self.dropped = {}
+        self.version = 0
+        self._header = None
+        self._positions = None
+        self._index_position = 0
+
+    def build_tree(self, workers: int = 1, progress: Optional[Callable[[float], Any]] = None) -> Tree:
         """Creates tree representing restaurant dataset.
+
+        Also stores the information of every restaurant added to the tree, so that
+        get_info() does not need to read the csv file again, and counts the rows that
+        were left out in self.dropped.
+
+        If workers > 1, the csv file is split into that many chunks of bytes, which are read
+        by separate processes into partial trees and then merged.
+
+        If progress is given, it is called every so often with the fraction (between 0 and 1)
+        of the csv file read so far, and with 1.0 once the tree is built.
+
+        Preconditions:
+            - workers >= 1
+            - if workers > 1, no field of the csv file contains a line break
+
+        >>> t = TreeBuilder('test_data.csv')
+        >>> len(t.build_tree().get_all_cuisines())
+        10
+        >>> t.dropped
+        {'missing info': 1}
         """
-        tree = Tree('root', [])
-        with open(self.data, "r") as file:
-            reader = csv.reader(file)
-            for row in reader:
-                if '' not in row:  # does not use restaurants with missing info
-                    # converts indian rupees to canadian dollars for tree
-                    tree.add_restaurant([str(self.inr_to_cad(float(row[1])))] + row[2:], int(row[0]))
+        with METRICS.stage('build_tree'):
+            if workers > 1:
+                tree = self._build_tree_parallel(workers, progress)
+            else:
+                tree = Tree('root', [])
+                self._records = {}
+                self.dropped = {}
+                self._read_header()
+                size = os.path.getsize(self.data)
+                with open(self.data, 'rb') as file, METRICS.stage('read_csv'):
+                    lines = (line.decode('utf-8') for line in file)
+                    row_num = 0
+                    for row_num, row in enumerate(csv.reader(lines), 1):
+                        self._add_row(tree, row)
+                        if progress is not None and row_num % PROGRESS_INTERVAL == 1:
+                            progress(file.tell() / size)
+
+                if METRICS.enabled:
+                    METRICS.count('rows_read', row_num)
+                with METRICS.stage('sort_subtrees'):
+                    tree.sort_subtrees(recursive=True)
+                self.version += 1
+                if progress is not None:
+                    progress(1.0)
+
+            if self.has_locations():
+                with METRICS.stage('geo_index'):
+                    tree.get_geo_index()
+            return tree
+
+    def _build_tree_parallel(self, workers: int, progress: Optional[Callable[[float], Any]]) -> Tree:
+        """ Helper method for build_tree(), which reads the csv file in chunks using a process for each.
+        """
+        # imported here, since only parallel builds need it and importing it slows down every startup
+        from concurrent.futures import ProcessPoolExecutor
 
+        bounds = self._chunk_bounds(workers)
+        parts = []
+        with METRICS.stage('read_csv'), ProcessPoolExecutor(workers) as executor:
+            for part in executor.map(_build_chunk, [self.data] * (len(bounds) - 1), bounds[:-1], bounds[1:]):
+                parts.append(part)
+                if progress is not None:
+                    progress(bounds[len(parts)] / bounds[-1])
+
+        tree = Tree('root', [])
+        self._records = {}
+        self.dropped = {}
+        with METRICS.stage('merge'):
+            # the chunks are merged in order, so later rows replace earlier rows with the same index
+            for part_tree, records, dropped in parts:
+                for i in records:
+                    if i in self._records:
+                        tree.remove_restaurant(self._records[i])
+                tree.merge(part_tree)
+                self._records.update(records)
+                for reason in dropped:
+                    self.dropped[reason] = self.dropped.get(reason, 0) + dropped[reason]
+                if METRICS.enabled:
+                    METRICS.count('rows_read', len(records) + sum(dropped.values()))
+
+        with METRICS.stage('sort_subtrees'):
+            tree.sort_subtrees(recursive=True)
+        self.version += 1
+        if progress is not None:
+            progress(1.0)
         return tree
 
+    def _chunk_bounds(self, num_chunks: int) -> list[int]:
+        """ Returns the byte offsets splitting the csv file into (at most) num_chunks chunks of about
+        the same size, each starting at the beginning of a line. The first offset is 0 and the last is
+        the size of the file.
+        """
+        size = os.path.getsize(self.data)
+        bounds = [0]
+        with open(self.data, 'rb') as file:
+            for k in range(1, num_chunks):
+                file.seek(max(size * k // num_chunks, bounds[-1]))
+                file.readline()  # skips to the start of the next line
+                if file.tell() < size and file.tell() > bounds[-1]:
+                    bounds.append(file.tell())
+
+        bounds.append(size)
+        return bounds
+
+    def _read_chunk(self, start: int, end: int) -> tuple[Tree, dict[int, Restaurant], dict[str, int]]:
+        """ Returns a tree of the rows of the csv file between byte offsets start and end, along with
+        its table of records and the number of rows left out for each reason.
+
+        Preconditions:
+            - start and end are each the start of a line, or the end of the file
+        """
+        tree = Tree('root', [])
+        self._records = {}
+        self.dropped = {}
+        self._read_header()
+        with open(self.data, 'rb') as file:
+            file.seek(start)
+            lines = (line.decode('utf-8') for line in _read_lines(file, end - start))
+            for row in csv.reader(lines):
+                self._add_row(tree, row)
+
+        return tree, self._records, self.dropped
+
+    def _read_header(self) -> None:
+        """ Reads the header row of the csv file (if it has not been read yet), to find the position of each
+        column by its name. The columns are named as in CSV_COLUMNS and LOCATION_COLUMNS (ignoring case),
+        and the index column as in INDEX_COLUMNS, and may be in any order, along with other columns (which
+        are not used).
+
+        If the first row does not name every column in CSV_COLUMNS, the csv file has no header, and its
+        columns are in the order of data.csv: the index, then the columns in CSV_COLUMNS.
+        """
+        if self._positions is not None:
+            return
+
+        with open(self.data, 'r', newline='', encoding='utf-8') as file:
+            first = next(csv.reader(file), [])
+
+        names = [name.strip().lower() for name in first]
+        if all(column in names for column in CSV_COLUMNS):
+            self._header = first
+            self._positions = [names.index(column) for column in CSV_COLUMNS]
+            if all(column in names for column in LOCATION_COLUMNS):
+                self._positions += [names.index(column) for column in LOCATION_COLUMNS]
+            self._index_position = next((position for position, name in enumerate(names) if name in INDEX_COLUMNS), 0)
+        else:
+            self._header = None
+            self._positions = list(range(1, len(CSV_COLUMNS) + 1))
+            self._index_position = 0
+
+    def has_locations(self) -> bool:
+        """ Returns whether the csv file has a column for the latitude and longitude of each restaurant.
+
+        >>> TreeBuilder('test_data.csv').has_locations()
+        False
+        """
+        self._read_header()
+        return len(self._positions) > len(CSV_COLUMNS)
+
+    def _add_row(self, tree: Tree, row: list[str]) -> None:
+        """ Mutates tree to add the restaurant in the given row of the csv file, or counts it in
+        self.dropped if it cannot be used. The header row is skipped.
+
+        Preconditions:
+            - self._read_header() has been called
+        """
+        if row == self._header:
+            return
+
+        try:
+            i, info = self.parse_row(row)
+        except ValueError as error:
+            self.dropped[str(error)] = self.dropped.get(str(error), 0) + 1
+        else:
+            self._upsert(tree, info, i)
+
+    def parse_row(self, row: list[str]) -> tuple[int, list[str]]:
+        """ Returns the index of the restaurant in the given row of the csv file, and its information
+        in the same format returned by get_info (with the price converted to CAD).
+
+        If the csv file has location columns (see has_locations), a restaurant whose latitude and longitude
+        are both empty has no location, and is kept.
+
+        Raises a ValueError, whose message is the reason, if the row cannot be used.
+
+        >>> t = TreeBuilder('data.csv')
+        >>> t.parse_row(['4', '600.0', '4.2', 'Big Pitcher', 'Yes', 'Yes', 'Pub', 'North Indian'])
+        (4, ['9.6', '4.2', 'Big Pitcher', 'Yes', 'Yes', 'Pub', 'North Indian'])
+        >>> t.parse_row(['4', '600.0', '', 'Big Pitcher', 'Yes', 'Yes', 'Pub', 'North Indian'])
+        Traceback (most recent call last):
+        ValueError: missing info
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     with open(os.path.join(directory, 'moved.csv'), 'w') as file:
+        ...         _ = file.write('name,price,rating,online_order,table_booking,type,cuisines,index\\n')
+        ...     TreeBuilder(os.path.join(directory, 'moved.csv')).parse_row(
+        ...         ['Big Pitcher', '600.0', '4.2', 'Yes', 'Yes', 'Pub', 'North Indian', '4'])
+        (4, ['9.6', '4.2', 'Big Pitcher', 'Yes', 'Yes', 'Pub', 'North Indian'])
+        """
+        self._read_header()
+        if len(row) != (len(CSV_COLUMNS) + 1 if self._header is None else len(self._header)):
+            raise ValueError('wrong number of columns')
+
+        info = [row[position] for position in self._positions[:len(CSV_COLUMNS)]]
+        if row[self._index_position] == '' or '' in info:  # does not use restaurants with missing info
+            raise ValueError('missing info')
+        elif info[3] not in FLAGS or info[4] not in FLAGS:
+            raise ValueError('invalid yes/no')
+
+        try:
+            i = int(row[self._index_position])
+            # converts indian rupees to canadian dollars for tree
+            info[0] = str(self.inr_to_cad(float(info[0])))
+            float(info[1])
+        except ValueError:
+            raise ValueError('invalid number') from None
+
+        location = [row[position] for position in self._positions[len(CSV_COLUMNS):]]
+        if any(location):
+            try:
+                latitude, longitude = float(location[0]), float(location[1])
+            except ValueError:
+                raise ValueError('invalid location') from None
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                raise ValueError('invalid location')
+            info += location
+
+        return i, info
+
+    def upsert_restaurant(self, tree: Tree, info: list[str], i: int) -> Restaurant:
+        """ Mutates tree to add the restaurant with the given information and index, replacing the
+        restaurant with the same index if there is one (e.g. to change its rating), and returns it.
+
+        Preconditions:
+            - tree was built by this tree builder
+            - info is in the same format returned by get_info (with the price in CAD)
+
+        >>> t = TreeBuilder('test_data.csv')
+        >>> tree = t.build_tree()
+        >>> _ = t.upsert_restaurant(tree, ['8.0', '4.5', 'Xpress Kitchen', 'No', 'No', 'Takeaway',
+        ...                                'North Indian, Chinese'], 7020)
+        >>> t.get_info(7020)[1]
+        '4.5'
+        >>> [r.rating for r in tree.find_restaurants(['Chinese', 'Takeaway', 'No', 'No'])]
+        [4.5]
+        """
+        restaurant = self._upsert(tree, info, i)
+        self.version += 1
+        return restaurant
+
+    def delete_restaurant(self, tree: Tree, i: int) -> bool:
+        """ Mutates tree to remove the restaurant with index i, and returns whether there was one.
+
+        Preconditions:
+            - tree was built by this tree builder
+
+        >>> t = TreeBuilder('test_data.csv')
+        >>> tree = t.build_tree()
+        >>> t.delete_restaurant(tree, 664)
+        True
+        >>> t.get_info(664) is None and tree.find_restaurants(['Biryani', 'Delivery', 'No', 'Yes']) is None
+        True
+        >>> t.delete_restaurant(tree, 664)
+        False
+        """
+        restaurant = self._records.pop(i, None)
+        if restaurant is None:
+            return False
+
+        tree.remove_restaurant(restaurant)
+        self.version += 1
+        return True
+
+    def _upsert(self, tree: Tree, info: list[str], i: int) -> Restaurant:
+        """ Helper for build_tree() and upsert_restaurant(), which does not change the version.
+        """
+        old = self._records.get(i)
+        if old is not None:
+            tree.remove_restaurant(old)
+
+        restaurant = tree.add_restaurant(info, i)
+        self._records[i] = restaurant
+        return restaurant
+
     def get_info(self, i: int) -> Optional[list[str]]:
-        """ Returns a list of corresponding information to restaurant, based on its index.
+        """ Returns a list of corresponding information to restaurant, based on its index,
+        or None if there is no restaurant with that index in the tree.
+
+        If build_tree() has not been called yet, the csv file is read once to fill in the records.
         """
-        with open(self.data, "r") as file:
-            reader = csv.reader(file)
-            for row in reader:
-                if row[0] != '' and i == int(row[0]):
-                    return [str(self.inr_to_cad(float(row[1])))] + row[2:]
+        if not self._records:
+            self._rescan()
+        if METRICS.enabled:
+            METRICS.count('records_looked_up')
 
+        restaurant = self._records.get(i)
+        if restaurant is None:
             return None
+        else:
+            return restaurant.get_info()
+
+    def get_infos(self, indices: list[int]) -> list[list[str]]:
+        """ Returns a list of the information of each restaurant in indices, in the same order.
+
+        Restaurants with no matching index are skipped.
+
+        Preconditions:
+            - all(isinstance(i, int) for i in indices)
+        """
+        if not self._records:
+            self._rescan()
+        if METRICS.enabled:
+            METRICS.count('records_looked_up', len(indices))
+
+        return [self._records[i].get_info() for i in indices if i in self._records]
+
+    def get_prices(self) -> list[float]:
+        """ Returns the price of every restaurant in the tree, in the order they appear in the csv file.
+
+        Unlike get_infos, this does not build the information of each restaurant.
+        """
+        if not self._records:
+            self._rescan()
+
+        return [restaurant.price for restaurant in self._records.values()]
+
+    def get_restaurants(self) -> list[Restaurant]:
+        """ Returns every restaurant in the tree, in the order they appear in the csv file.
+
+        The restaurants are the ones stored in the tree, so they must not be mutated.
+        """
+        if not self._records:
+            self._rescan()
+
+        return list(self._records.values())
+
+    def get_indices(self) -> list[int]:
+        """ Returns the indices of all restaurants in the tree, in the order they appear in the csv file.
+        """
+        if not self._records:
+            self._rescan()
+
+        return list(self._records)
+
+    def _rescan(self) -> None:
+        """ Reads the csv file to fill in the records, for lookups made before build_tree() was called.
+        """
+        if METRICS.enabled:
+            METRICS.count('csv_rescans')
+        self.build_tree()
+
+    def load_tree(self, snapshot: Optional[str] = None, progress: Optional[Callable[[float], Any]] = None) -> Tree:
+        """Returns the tree representing restaurant dataset, loading it from the snapshot file
+        if it is up to date with the csv file. Otherwise, the tree is built from the csv file
+        and saved to the snapshot file for the next time (unless it cannot be written, e.g. if its
+        directory is read-only, in which case the tree is still returned).
+
+        If snapshot is None, the snapshot file is the csv file name followed by '.snapshot'.
+        If progress is given, it is called as in build_tree (only with 1.0 if the snapshot is used).
+        """
+        if snapshot is None:
+            snapshot = self.data + '.snapshot'
+
+        tree = self.load_snapshot(snapshot)
+        if tree is None:
+            tree = self.build_tree(progress=progress)
+            try:
+                self.save_snapshot(tree, snapshot)
+            except OSError:
+                pass
+        else:
+            if self.has_locations():
+                with METRICS.stage('geo_index'):
+                    tree.get_geo_index()
+            if progress is not None:
+                progress(1.0)
+
+        return tree
+
+    def save_snapshot(self, tree: Tree, snapshot: str) -> None:
+        """Saves tree (and the table of records) to the snapshot file, along with the size,
+        modification time and hash of the csv file it was built from.
+
+        Preconditions:
+            - tree was returned by self.build_tree()
+        """
+        header = SNAPSHOT_MAGIC + SNAPSHOT_VERSION.to_bytes(4, 'big')
+        contents = {'source': self.source_signature(), 'tree': tree, 'records': self._records}
+
+        # write to a temporary file first, so a crash never leaves a partial snapshot behind
+        temp = snapshot + '.tmp'
+        try:
+            with open(temp, 'wb') as file:
+                file.write(header)
+                pickle.dump(contents, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, snapshot)
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+    def load_snapshot(self, snapshot: str) -> Optional[Tree]:
+        """Returns the tree saved in the snapshot file, or None if the file does not exist, cannot be
+        read (e.g. it is truncated or corrupt), was written by a different version of this program, or
+        the csv file has changed since.
+        """
+        if not os.path.exists(snapshot):
+            return None
+
+        header = SNAPSHOT_MAGIC + SNAPSHOT_VERSION.to_bytes(4, 'big')
+        with METRICS.stage('load_snapshot'):
+            try:
+                with open(snapshot, 'rb') as file:
+                    if file.read(len(header)) != header:
+                        return None
+                    contents = pickle.load(file)
+                if contents['source'] != self.source_signature():
+                    return None
+                records, tree = contents['records'], contents['tree']
+            except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, KeyError, TypeError):
+                return None
+
+        self._records = records
+        self.version += 1
+        return tree
+
+    def source_signature(self) -> tuple[int, int, str]:
+        """Returns the size, modification time (in nanoseconds) and SHA-256 hash of the csv file, which
+        are saved with anything computed from it (e.g. the snapshot) to tell whether it is up to date.
+        """
+        stat = os.stat(self.data)
+        sha = hashlib.sha256()
+        with open(self.data, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                sha.update(chunk)
+
+        return stat.st_size, stat.st_mtime_ns, sha.hexdigest()
 
     def inr_to_cad(self, amount: float) -> float:
         """ Converts amount (given in Indian rupees) to Canadian dollars.
@@ -317,6 +1584,601 @@ class TreeBuilder:
         return round(amount * 0.016, 1)
 
 
+class Vocabulary:
+    """The cuisines and types of the restaurants in a tree, each encoded as a small integer code.
+
+    Each value is only stored once (in values), so every restaurant and path with the same cuisine
+    or type shares it, and paths compare codes instead of strings. A code is given to each new
+    value as it is encoded, so codes are not in alphabetical order.
+
+    The lists of codes of restaurants (e.g. all the cuisines of one restaurant) are shared too:
+    restaurants with the same list of cuisines hold the same tuple, which is only decoded once.
+
+    Representation Invariants:
+        - all(self.codes[value] == code for code, value in enumerate(self.values))
+
+    Instance Attributes:
+        - values: the value of each code (the value with code c is values[c])
+        - codes: maps each value to its code
+
+    >>> vocabulary = Vocabulary()
+    >>> vocabulary.encode('Cafe'), vocabulary.encode('Bakery'), vocabulary.encode('Cafe')
+    (0, 1, 0)
+    >>> vocabulary.find('Bakery'), vocabulary.find('Tea')
+    (1, -1)
+    >>> vocabulary.values[1]
+    'Bakery'
+    >>> codes = vocabulary.encode_all('Tea, Cafe')
+    >>> codes, codes is vocabulary.encode_all('Tea,Cafe'), vocabulary.decode_all(codes)
+    ((2, 0), True, 'Tea, Cafe')
+    """
+    __slots__ = ('values', 'codes', '_shared', '_texts')
+    values: list[str]
+    codes: dict[str, int]
+    # Private Instance Attributes:
+    #   - _shared: maps each list of codes given out by encode_all or share to itself
+    #   - _texts: maps each list of codes decoded by decode_all to its values, separated by ', '
+    _shared: dict[tuple[int, ...], tuple[int, ...]]
+    _texts: dict[tuple[int, ...], str]
+
+    def __init__(self, values: Iterable[str] = ()) -> None:
+        """Initialize a new Vocabulary, giving the given (different) values the codes 0, 1, 2, ...
+        """
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+        self._shared = {}
+        self._texts = {}
+
+    def __reduce__(self) -> tuple:
+        """Return how to pickle this vocabulary, from its values (the codes are recomputed).
+        """
+        return Vocabulary, (self.values,)
+
+    def __len__(self) -> int:
+        """Return the number of values in this vocabulary.
+        """
+        return len(self.values)
+
+    def encode(self, value: str) -> int:
+        """Return the code of value, giving it the next code if it is not in this vocabulary yet.
+        """
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def find(self, value: str) -> int:
+        """Return the code of value, or UNKNOWN if it is not in this vocabulary (without adding it).
+        """
+        return self.codes.get(value, UNKNOWN)
+
+    def encode_all(self, text: str) -> tuple[int, ...]:
+        """Return the codes of the values in text, which are separated by commas (and possibly spaces).
+        """
+        return self.share(tuple(self.encode(value.lstrip()) for value in text.split(',')))
+
+    def share(self, codes: tuple[int, ...]) -> tuple[int, ...]:
+        """Return the tuple equal to codes that this vocabulary already gave out, or codes itself
+        (which is given out from now on) if there is none.
+        """
+        return self._shared.setdefault(codes, codes)
+
+    def decode_all(self, codes: tuple[int, ...]) -> str:
+        """Return the values of codes, separated by ', '.
+        """
+        text = self._texts.get(codes)
+        if text is None:
+            text = ', '.join([self.values[code] for code in codes])
+            self._texts[codes] = text
+        return text
+
+
+class PriceIndex:
+    """The restaurants of one online order (the end of a path), indexed to find the best rated
+    restaurants within a budget without reading the restaurants over it.
+
+    The restaurants are sorted by price, and split into blocks of (up to) block_size restaurants
+    in a row. Within each block, the restaurants are ranked by rating (see rank_key). When only a
+    few restaurants are within a budget, they are the blocks before it (found by binary search),
+    which are merged lazily by rank, and the restaurants within budget in the block it falls in.
+    When most restaurants are within budget, it is faster to read all of them by rank, skipping
+    the few over budget.
+
+    Representation Invariants:
+        - self.prices == sorted(self.prices)
+        - self.ranked == sorted(self.ranked, key=rank_key)
+        - self.block_size >= MIN_BLOCK_SIZE
+        - all(block == sorted(block, key=rank_key) for block in self.blocks)
+        - sorted((r.price for block in self.blocks for r in block)) == self.prices
+        - self.heads == [(rank_key(block[0]), j, 0, block[0]) for j, block in enumerate(self.blocks)]
+
+    Instance Attributes:
+        - prices: the price of every restaurant, in ascending order
+        - ranked: every restaurant, ranked by rating
+        - blocks: the restaurants in each block of block_size prices in a row, ranked by rating
+        - block_size: the number of restaurants in each block (except possibly the last)
+        - heads: for each block, (the rank_key of its best rated restaurant, its position in blocks, 0,
+                 that restaurant), ready to be put in the heap that merges the blocks
+
+    >>> vocabulary = Vocabulary()
+    >>> restaurants = [Restaurant([str(p), str(r), n, 'No', 'No', 'Cafe', 'a'], i, vocabulary)
+    ...                for i, (p, r, n) in enumerate([(10.0, 3.0, 'a'), (5.0, 4.5, 'b'), (20.0, 4.9, 'c'),
+    ...                                               (5.0, 3.5, 'd')])]
+    >>> index = PriceIndex(restaurants)
+    >>> [r.name for r in index.within_budget(10.0)]
+    ['b', 'd', 'a']
+    >>> [r.name for r in index.within_budget(4.0)]
+    []
+    >>> many = [Restaurant([str(i % 97), str(i % 7 / 2), f'r{i}', 'No', 'No', 'Cafe', 'a'], i, vocabulary)
+    ...         for i in range(2000)]
+    >>> index = PriceIndex(many)
+    >>> list(index.within_budget(12.5)) == sorted((r for r in many if r.price <= 12.5), key=rank_key)
+    True
+    """
+    __slots__ = ('prices', 'ranked', 'blocks', 'block_size', 'heads')
+    prices: list[float]
+    ranked: list[Restaurant]
+    blocks: list[list[Restaurant]]
+    block_size: int
+    heads: list[tuple[tuple[float, str, int], int, int, Restaurant]]
+
+    def __init__(self, restaurants: list[Restaurant]) -> None:
+        """Initialize a new PriceIndex of the given restaurants.
+
+        Blocks hold about the square root of the number of restaurants, so that a query merges
+        at most that many blocks, and reads at most that many restaurants over budget.
+        """
+        self.ranked = sorted(restaurants, key=rank_key)
+        by_price = sorted(self.ranked, key=lambda r: r.price)
+        self.prices = [r.price for r in by_price]
+        self.block_size = max(MIN_BLOCK_SIZE, isqrt(len(by_price)))
+        self.blocks = [sorted(by_price[start:start + self.block_size], key=rank_key)
+                       for start in range(0, len(by_price), self.block_size)]
+        self.heads = [(rank_key(block[0]), j, 0, block[0]) for j, block in enumerate(self.blocks)]
+
+    def within_budget(self, budget: float) -> Iterator[Restaurant]:
+        """Returns an iterator over the restaurants with a price within budget, from best to worst
+        rated (see rank_key). Restaurants are only ranked as they are read.
+        """
+        num_within = bisect_right(self.prices, budget)
+        if num_within == len(self.prices):
+            return iter(self.ranked)
+        elif num_within * 2 >= len(self.prices):
+            return (r for r in self.ranked if r.price <= budget)
+
+        num_blocks, remainder = divmod(num_within, self.block_size)
+        if remainder == 0:
+            return self._merge_blocks(num_blocks, iter([]))
+        else:
+            # the block the budget falls in is read lazily too, since the first few may be enough
+            return self._merge_blocks(num_blocks, (r for r in self.blocks[num_blocks] if r.price <= budget))
+
+    def _merge_blocks(self, num_blocks: int, rest: Iterator[Restaurant]) -> Iterator[Restaurant]:
+        """Yields the restaurants of the first num_blocks blocks and of rest (which are ranked by rating),
+        from best to worst rated.
+
+        The heap holds the next restaurant of each block, with the block it came from and its position
+        in the block (or -1 for rest). Its first entries are copied from heads, so starting the merge
+        only takes one slice and one heapify.
+        """
+        heap = self.heads[:num_blocks]
+        for restaurant in rest:
+            heap.append((rank_key(restaurant), num_blocks, -1, restaurant))
+            break
+        heapq.heapify(heap)
+
+        while heap:
+            _, j, position, restaurant = heap[0]
+            yield restaurant
+
+            if position < 0:
+                restaurant = next(rest, None)
+            elif position + 1 < len(self.blocks[j]):
+                position += 1
+                restaurant = self.blocks[j][position]
+            else:
+                restaurant = None
+
+            if restaurant is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (rank_key(restaurant), j, position, restaurant))
+
+
+class AttributeIndex:
+    """An inverted index of restaurants, from each value of each level of their paths (cuisine, type,
+    table booking and online order) to the restaurants with that value.
+
+    Used to answer queries giving None (any value) or a collection of values (any of them) at some
+    levels, without walking every path of the tree they could match. The postings of each level
+    given in a query are intersected from smallest to largest, so a query takes time proportional to
+    its smallest posting (usually close to its number of matches), not to the size of the tree.
+
+    Representation Invariants:
+        - len(self.postings) == NUM_LEVELS
+        - all(posting != set() for level in self.postings for posting in level.values())
+        - all(i in self.restaurants for level in self.postings for posting in level.values() for i in posting)
+
+    Values are the keys of the subtrees of the tree: codes for cuisines and types, and booleans for
+    table booking and online order (see Tree._encode).
+
+    Instance Attributes:
+        - restaurants: maps the original index of each restaurant to the restaurant
+        - postings: for each level, maps each value to the original indices of the restaurants with it
+
+    >>> vocabulary = Vocabulary()
+    >>> index = AttributeIndex([Restaurant(['8.0', '3.9', 'x', 'Yes', 'No', 'Cafe, Bakery', 'Tea'], 0, vocabulary),
+    ...                         Restaurant(['9.0', '4.1', 'y', 'No', 'No', 'Bakery', 'Tea, Mithai'], 1, vocabulary)])
+    >>> tea, cafe, bakery = vocabulary.find('Tea'), vocabulary.find('Cafe'), vocabulary.find('Bakery')
+    >>> sorted(r.name for r in index.match([None, bakery, None, None]))
+    ['x', 'y']
+    >>> [r.name for r in index.match([tea, {cafe, UNKNOWN}, False, None])]
+    ['x']
+    >>> index.match([vocabulary.find('Mithai'), None, None, True])
+    []
+    >>> sorted(vocabulary.values[code] for code in index.get_values(1))
+    ['Bakery', 'Cafe']
+    """
+    __slots__ = ('restaurants', 'postings')
+    restaurants: dict[int, Restaurant]
+    postings: list[dict[Any, set[int]]]
+
+    def __init__(self, restaurants: Iterable[Restaurant]) -> None:
+        """Initialize a new AttributeIndex of the given restaurants.
+        """
+        self.restaurants = {}
+        self.postings = [{} for _ in range(NUM_LEVELS)]
+        for restaurant in restaurants:
+            self.add(restaurant)
+
+    def add(self, restaurant: Restaurant) -> None:
+        """ Mutates this index to add restaurant, replacing the restaurant with the same index if there is one.
+        """
+        old = self.restaurants.get(restaurant.og_index)
+        if old is restaurant:
+            return
+        elif old is not None:
+            self.remove(old)
+
+        self.restaurants[restaurant.og_index] = restaurant
+        for level, values in zip(self.postings, restaurant.get_levels()):
+            for value in values:
+                level.setdefault(value, set()).add(restaurant.og_index)
+
+    def remove(self, restaurant: Restaurant) -> None:
+        """ Mutates this index to remove restaurant, if it is in the index.
+        """
+        if self.restaurants.get(restaurant.og_index) is not restaurant:
+            return
+
+        del self.restaurants[restaurant.og_index]
+        for level, values in zip(self.postings, restaurant.get_levels()):
+            for value in values:
+                posting = level.get(value)
+                if posting is not None:
+                    posting.discard(restaurant.og_index)
+                    if not posting:
+                        del level[value]
+
+    def get_values(self, level: int) -> list:
+        """ Returns every value (code or boolean) of the given level (0 for cuisines, 1 for types,
+        2 for table booking and 3 for online order) that some restaurant has.
+
+        Preconditions:
+            - 0 <= level < NUM_LEVELS
+        """
+        return list(self.postings[level])
+
+    def estimate(self, path: list) -> int:
+        """ Returns an upper bound on the number of restaurants matching path (as in match), without
+        intersecting the postings: the size of the smallest posting of a level given in path.
+
+        Preconditions:
+            - path in the form [cuisine, type, table booking, online order], encoded as in Tree._encode
+        """
+        smallest = len(self.restaurants)
+        for level, item in zip(self.postings, path):
+            if item is None:
+                continue
+            elif not isinstance(item, set):
+                smallest = min(smallest, len(level.get(item, ())))
+            else:
+                smallest = min(smallest, sum(len(level[value]) for value in item if value in level))
+
+        return smallest
+
+    def match(self, path: list) -> list[Restaurant]:
+        """ Returns the restaurants matching path, which gives each level either a value, a set of
+        values (matching any of them), or None (matching any value).
+
+        Preconditions:
+            - path in the form [cuisine, type, table booking, online order], encoded as in Tree._encode
+        """
+        postings = []
+        for level, item in zip(self.postings, path):
+            if item is None:
+                continue
+            elif not isinstance(item, set):
+                postings.append(level.get(item, set()))
+            else:
+                postings.append(set().union(*(level[value] for value in item if value in level)))
+
+        if not postings:
+            return list(self.restaurants.values())
+
+        postings.sort(key=len)
+        matches = postings[0]
+        for posting in postings[1:]:
+            if not matches:
+                break
+            # & iterates over the smaller of the two sets
+            matches = matches & posting
+
+        return [self.restaurants[i] for i in matches]
+
+
+class ResultCursor:
+    """The restaurants matching a query (see Tree.explore_restaurants), read one page at a time.
+
+    The cursor only holds the matching restaurants, so it can be sorted again without repeating
+    the query, and the information shown for them is only looked up for the pages that are read.
+
+    Representation Invariants:
+        - self.sorted_by in {'rating', 'price'}
+
+    Instance Attributes:
+        - sorted_by: 'rating' if the restaurants are ranked by rating (see rank_key), or 'price' if
+                     they are ranked by price, with ties ranked by rating
+        - reverse: whether the order is reversed (worst rated, or most expensive, first)
+
+    >>> t = TreeBuilder('test_data.csv')
+    >>> cursor = t.build_tree().explore_restaurants(2, 40, [{'Biryani', 'North Indian'}, 'Delivery', 'No', 'Yes'])
+    >>> cursor.sort('price')
+    >>> cursor.get_page(0, 1, t)
+    [('Sardar Tikka Singh', 'North Indian', 'Takeaway, Delivery', '2.8', '8.0')]
+    >>> cursor.get_page(1, 1, t)
+    [('Behrouz Biryani', 'Biryani', 'Delivery', '3.9', '10.4')]
+    >>> cursor.num_pages(1), cursor.get_page(2, 1, t)
+    (2, [])
+    """
+    sorted_by: str
+    reverse: bool
+    # Private Instance Attributes:
+    #   - _restaurants: the matching restaurants, in the current order
+    _restaurants: list[Restaurant]
+
+    def __init__(self, restaurants: list[Restaurant]) -> None:
+        """Initialize a new ResultCursor over the given restaurants.
+
+        Preconditions:
+            - restaurants == sorted(restaurants, key=rank_key)
+        """
+        self._restaurants = restaurants
+        self.sorted_by = 'rating'
+        self.reverse = False
+
+    def __len__(self) -> int:
+        """Returns the number of matching restaurants.
+        """
+        return len(self._restaurants)
+
+    def sort(self, sorted_by: str, reverse: bool = False) -> None:
+        """Ranks the restaurants by rating (best first) or price (cheapest first), reversed if reverse is True.
+
+        Preconditions:
+            - sorted_by in {'rating', 'price'}
+        """
+        if sorted_by == 'rating':
+            self._restaurants.sort(key=rank_key)
+        else:
+            self._restaurants.sort(key=lambda r: (r.price, rank_key(r)))
+        if reverse:
+            self._restaurants.reverse()
+
+        self.sorted_by = sorted_by
+        self.reverse = reverse
+
+    def num_pages(self, page_size: int) -> int:
+        """Returns the number of pages of page_size restaurants (the last page may have fewer).
+
+        Preconditions:
+            - page_size >= 1
+        """
+        return -(-len(self._restaurants) // page_size)
+
+    def get_page(self, page: int, page_size: int, tree_builder: TreeBuilder) -> list[tuple]:
+        """Returns the information of the restaurants on the given page (counting from 0) of page_size
+        restaurants, in the same form as Tree.get_restaurant_info. Restaurants that were deleted
+        from the tree since the query are skipped.
+
+        Preconditions:
+            - page >= 0 and page_size >= 1
+            - tree_builder built the tree that was queried
+        """
+        indices = [r.og_index for r in self._restaurants[page * page_size:(page + 1) * page_size]]
+        return [(info[2], info[6], info[5], info[1], info[0]) for info in tree_builder.get_infos(indices)]
+
+
+def _is_exact(user_input: list) -> bool:
+    """ Returns whether user_input (in the form [{cuisines}, type, table booking, online order]) names one
+    path of the tree for each cuisine: it has a set of cuisines, and one value at every other level.
+    """
+    return user_input[0] is not None and isinstance(user_input[1], str) and isinstance(user_input[2], str) \
+        and isinstance(user_input[3], str)
+
+
+def _matches_level(item: Any, keys: tuple[int, ...]) -> bool:
+    """ Returns whether a restaurant with the given keys (codes) at some level of its paths matches item, which is
+    a key, a set of keys (matching any of them) or None (matching any key).
+    """
+    if item is None:
+        return True
+    elif isinstance(item, set):
+        return not item.isdisjoint(keys)
+    else:
+        return item in keys
+
+
+def _restore_restaurant(name: str, i: int, price: float, rating: float, online_order: bool, table_booking: bool,
+                        types: tuple[int, ...], cuisines: tuple[int, ...], vocabulary: Vocabulary,
+                        latitude: Optional[float], longitude: Optional[float]) -> Restaurant:
+    """ Returns the Restaurant pickled by Restaurant.__reduce__, without encoding its cuisines and types again.
+    """
+    restaurant = Restaurant.__new__(Restaurant)
+    Tree.__init__(restaurant, name, [])
+    restaurant.og_index = i
+    restaurant.add_price_rating(price, rating)
+    restaurant.online_order = online_order
+    restaurant.table_booking = table_booking
+    restaurant.types = types
+    restaurant.cuisines = cuisines
+    restaurant._vocabulary = vocabulary
+    restaurant.latitude = latitude
+    restaurant.longitude = longitude
+    return restaurant
+
+
+def _build_chunk(data: str, start: int, end: int) -> tuple[Tree, dict[int, Restaurant], dict[str, int]]:
+    """ Returns the result of TreeBuilder._read_chunk for the given chunk of the csv file data.
+
+    This is a module-level function so that it can be run in a separate process.
+    """
+    return TreeBuilder(data)._read_chunk(start, end)
+
+
+def _read_lines(file: Any, length: int) -> Any:
+    """ Yields the lines (as bytes) of the next length bytes of the binary file.
+    """
+    while length > 0:
+        line = file.readline()
+        if not line:
+            return
+        length -= len(line)
+        yield line
+
+
+def validate_preferences(budget: str, num_places: int, cuisines: list[str], restaurant_type: str) -> Optional[str]:
+    """ Returns an error message describing what is wrong with the given user preferences,
+    or None if they are valid.
+
+    These are the rules checked by the user interface before searching for restaurants.
+
+    >>> validate_preferences('100', 3, ['Chinese'], 'Cafe') is None
+    True
+    >>> validate_preferences('100.5', 3, ['Chinese'], 'Cafe')
+    'Budget must be an integer.'
+    >>> validate_preferences('²', 3, ['Chinese'], 'Cafe')
+    'Budget must be an integer.'
+    >>> validate_preferences('1' * 400, 3, ['Chinese'], 'Cafe')
+    'Budget must be at most 1000000000.'
+    >>> validate_preferences('100', -1, ['Chinese'], 'Cafe')
+    'Please choose 1-10 number of places to go.'
+    >>> validate_preferences('100', 1, ['Chinese', 'Mexican'], 'Cafe')
+    'Too many cuisines chosen, please only choose up to 1 cuisine(s)'
+    """
+    # required fields are empty
+    if budget.strip() == '' or not cuisines or restaurant_type.strip() == '':
+        return "Please fill out all the required fields."
+    # budget is not an integer (written in ASCII digits, since str.isdigit also accepts e.g. '²',
+    # which int() cannot convert)
+    elif not (budget.isascii() and budget.isdecimal()):
+        return "Budget must be an integer."
+    # budget is too large (checked by its length first, since int() refuses very long strings)
+    elif len(budget.lstrip('0')) > len(str(MAX_BUDGET)) or int(budget) > MAX_BUDGET:
+        return f"Budget must be at most {MAX_BUDGET}."
+    # number of places chosen to go is not 1-10
+    elif not 1 <= num_places <= 10:
+        return "Please choose 1-10 number of places to go."
+    # too many cuisines chosen
+    elif len(cuisines) > num_places:
+        return f"Too many cuisines chosen, please only choose up to {num_places} cuisine(s)"
+
+    return None
+
+
+def rank_key(restaurant: Restaurant) -> tuple[float, str, int]:
+    """ Returns the key used to rank restaurants: by rating (highest first), with ties broken
+    by name, then index.
+    """
+    return -restaurant.rating, restaurant.name, restaurant.og_index
+
+
+def places_per_cuisine(num_places: int) -> int:
+    """ Returns the most restaurants of one cuisine that select_places can read for num_places places:
+    num_places restaurants, plus num_places restaurants that were already chosen for other cuisines.
+    Queries only need to rank this many restaurants of each cuisine.
+
+    >>> places_per_cuisine(3)
+    6
+    """
+    return 2 * num_places
+
+
+def top_places(restaurants: Iterable[Any], num_places: int, key: Optional[Callable[[Any], Any]] = None) -> list:
+    """ Returns the (at most) places_per_cuisine(num_places) first items of restaurants ranked by key (the
+    smallest first), or if key is None, of restaurants in the order they are given (which must already be
+    ranked, so only as many items as needed are read).
+
+    >>> top_places([5, 1, 4, 2, 3], 2, key=lambda x: x)
+    [1, 2, 3, 4]
+    >>> top_places(iter([5, 1, 4, 2, 3]), 1)
+    [5, 1]
+    """
+    if key is None:
+        return list(islice(restaurants, places_per_cuisine(num_places)))
+    return heapq.nsmallest(places_per_cuisine(num_places), restaurants, key=key)
+
+
+def select_places(ranked: list[Iterable[int]], num_places: int) -> Optional[list[int]]:
+    """ Returns the indices of the restaurants to recommend, given the ranked restaurant
+    indices for each cuisine (best restaurant first), or None if ranked is empty.
+
+    The best restaurant of each cuisine (that was not chosen already) is chosen first, and
+    the remaining places are filled with the other restaurants in order of their cuisine,
+    then rank. No restaurant is chosen twice.
+
+    Each iterable in ranked is only read as far as needed, so they can be lazy.
+
+    Preconditions:
+        - len(ranked) <= num_places
+
+    >>> select_places([[3, 1, 2], [5, 4]], 4)
+    [3, 5, 1, 2]
+    >>> select_places([[3, 5, 1], [3, 5, 4]], 3)
+    [3, 5, 1]
+    >>> select_places([[], [5, 4]], 1)
+    [5]
+    >>> select_places([], 2) is None
+    True
+    """
+    if not ranked:
+        return None
+
+    iterators = [iter(rts) for rts in ranked]
+    selected = []
+    seen = set()
+    for restaurants in iterators:
+        for i in restaurants:
+            if i not in seen:
+                selected.append(i)
+                seen.add(i)
+                break
+
+    for restaurants in iterators:
+        if len(selected) >= num_places:
+            break
+        for i in restaurants:
+            if i not in seen:
+                selected.append(i)
+                seen.add(i)
+                if len(selected) >= num_places:
+                    break
+
+    return selected
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod(verbose=True)
@@ -325,6 +2187,9 @@ if __name__ == '__main__':
 
     # python_ta.check_all('functions.py', config={
     #     'max-line-length': 120,
-    #     'extra-imports': ['__future__', 'typing', 'csv'],
-    #     'allowed-io': ['TreeBuilder.build_tree', 'TreeBuilder.get_info']
+    #     'extra-imports': ['__future__', 'typing', 'csv', 'bisect', 'hashlib', 'heapq', 'itertools', 'math', 'os',
+    #                       'pickle', 'concurrent.futures', 'geo', 'metrics'],
+    #     'allowed-io': ['TreeBuilder.build_tree', 'TreeBuilder.save_snapshot',
+    #                    'TreeBuilder.load_snapshot', 'TreeBuilder.source_signature', 'TreeBuilder._chunk_bounds',
+    #                    'TreeBuilder._read_chunk']
     # })
@@ -0,0 +1,257 @@
+""" CSC111 Project 2: Restaurant Recommendation System
+
+Module Description
+==================
+This module contains the GeoIndex class, a grid of the restaurants with a location (latitude and
+longitude), used to find the restaurants within some distance of a point without measuring the
+distance to every restaurant.
+
+The grid splits the Earth into rows of the same height (cell_km), and each row into cells about
+cell_km wide, so that rows closer to the poles have fewer cells. Only the cells overlapping the
+circle around the point are read, and the distance to each of their restaurants is measured
+along the surface of the Earth (the haversine formula).
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of students
+taking CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC111 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2024 UofT DCS Teaching Team """
+
+from __future__ import annotations
+
+from math import asin, ceil, cos, degrees, floor, pi, radians, sin, sqrt
+from typing import Any, Iterable, Optional
+
+# mean radius of the Earth
+EARTH_RADIUS_KM = 6371.0088
+
+# length of one degree of latitude
+KM_PER_DEGREE = pi * EARTH_RADIUS_KM / 180
+
+# the largest distance between two points on the Earth (half its circumference)
+MAX_DISTANCE_KM = pi * EARTH_RADIUS_KM
+
+# the height (and about the width) of each cell of a GeoIndex, by default
+DEFAULT_CELL_KM = 1.0
+
+
+def distance_km(latitude1: float, longitude1: float, latitude2: float, longitude2: float) -> float:
+    """Returns the distance (in km, along the surface of the Earth) between two points given in degrees.
+
+    >>> round(distance_km(43.6629, -79.3957, 45.5048, -73.5772))  # Toronto to Montreal
+    504
+    >>> distance_km(10.0, 179.5, 10.0, -179.5) < 110
+    True
+    """
+    phi1, phi2 = radians(latitude1), radians(latitude2)
+    a = sin((phi2 - phi1) / 2) ** 2 + cos(phi1) * cos(phi2) * sin(radians(longitude2 - longitude1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+
+class GeoIndex:
+    """A grid of points (e.g. restaurants) on the Earth, to find the points within a distance of another.
+
+    Points are any objects with latitude and longitude attributes (in degrees), which must not change
+    while they are in the index. Cell (row, column) holds the points with
+        row == floor((latitude + 90) / self.cell_degrees)
+        column == floor((longitude + 180) / 360 * self.columns[row]) % self.columns[row]
+
+    Representation Invariants:
+        - self.cell_km > 0
+        - len(self.columns) == ceil(180 / self.cell_degrees)
+        - all(points != [] for points in self.cells.values())
+        - self.size == sum(len(points) for points in self.cells.values())
+
+    Instance Attributes:
+        - cell_km: the height of each row of cells (in km)
+        - cell_degrees: the height of each row of cells (in degrees of latitude)
+        - columns: the number of cells in each row, from the south pole to the north pole
+        - cells: maps each (row, column) holding some points to those points
+        - size: the number of points in the index
+
+    >>> class Place:
+    ...     def __init__(self, name, latitude, longitude):
+    ...         self.name, self.latitude, self.longitude = name, latitude, longitude
+    >>> places = [Place('a', 43.6629, -79.3957), Place('b', 43.6426, -79.3871), Place('c', 45.5048, -73.5772)]
+    >>> index = GeoIndex(places)
+    >>> [(round(distance), place.name) for distance, place in sorted(index.within(43.66, -79.39, 5))]
+    [(1, 'a'), (2, 'b')]
+    >>> index.remove(places[0])
+    True
+    >>> [place.name for _, place in index.within(43.66, -79.39, 600)]
+    ['b', 'c']
+    """
+    __slots__ = ('cell_km', 'cell_degrees', 'columns', 'cells', 'size')
+    cell_km: float
+    cell_degrees: float
+    columns: list[int]
+    cells: dict[tuple[int, int], list]
+    size: int
+
+    def __init__(self, points: Iterable = (), cell_km: float = DEFAULT_CELL_KM) -> None:
+        """Initialize a new GeoIndex of the given points, in cells of about cell_km by cell_km.
+
+        Preconditions:
+            - cell_km > 0
+        """
+        self.cell_km = cell_km
+        self.cell_degrees = cell_km / KM_PER_DEGREE
+        self.columns = []
+        for row in range(ceil(180 / self.cell_degrees)):
+            # the widest part of the row, where it is closest to the equator
+            south, north = row * self.cell_degrees - 90, (row + 1) * self.cell_degrees - 90
+            widest = 0.0 if south <= 0 <= north else min(abs(south), abs(north))
+            self.columns.append(max(1, floor(360 * cos(radians(widest)) * KM_PER_DEGREE / cell_km)))
+        self.cells = {}
+        self.size = 0
+
+        for point in points:
+            self.add(point)
+
+    def __len__(self) -> int:
+        """Return the number of points in this index.
+        """
+        return self.size
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        """Returns the (row, column) of the cell holding the given point.
+        """
+        row = min(floor((latitude + 90) / self.cell_degrees), len(self.columns) - 1)
+        num_columns = self.columns[row]
+        return row, floor((longitude + 180) / 360 * num_columns) % num_columns
+
+    def add(self, point: Any) -> None:
+        """Mutates this index to add point.
+
+        Preconditions:
+            - -90 <= point.latitude <= 90 and -180 <= point.longitude <= 180
+        """
+        self.cells.setdefault(self._cell(point.latitude, point.longitude), []).append(point)
+        self.size += 1
+
+    def remove(self, point: Any) -> bool:
+        """Mutates this index to remove point (the same object that was added), and returns whether it was found.
+        """
+        cell = self._cell(point.latitude, point.longitude)
+        points = self.cells.get(cell, [])
+        for i in range(len(points)):
+            if points[i] is point:
+                del points[i]
+                self.size -= 1
+                if not points:
+                    del self.cells[cell]
+                return True
+
+        return False
+
+    def cells_within(self, latitude: float, longitude: float, radius_km: float) -> list[list]:
+        """Returns the points of each cell that overlaps the circle of radius_km around the given point.
+        Every point within radius_km is in one of them, but they may hold points farther away too.
+
+        If there are fewer cells holding points than cells overlapping the circle, the cells holding
+        points are read instead, so a query never reads more cells than the index has.
+
+        Preconditions:
+            - -90 <= latitude <= 90 and -180 <= longitude <= 180
+            - radius_km >= 0
+        """
+        if radius_km >= MAX_DISTANCE_KM:
+            return list(self.cells.values())
+
+        radius_degrees = radius_km / KM_PER_DEGREE
+        first_row = self._cell(max(latitude - radius_degrees, -90.0), 0.0)[0]
+        last_row = self._cell(min(latitude + radius_degrees, 90.0), 0.0)[0]
+        if abs(latitude) + radius_degrees >= 90:
+            # the circle holds a pole, so it covers every longitude
+            half_width = 180.0
+        else:
+            # the most longitude covered by the circle, at any latitude
+            half_width = degrees(asin(sin(radians(radius_degrees)) / cos(radians(latitude))))
+
+        # the (first, last) column of each row overlapping the circle, where last may be past the end of the row
+        spans = []
+        num_cells = 0
+        for row in range(first_row, last_row + 1):
+            num_columns = self.columns[row]
+            first = floor((longitude - half_width + 180) / 360 * num_columns)
+            last = floor((longitude + half_width + 180) / 360 * num_columns)
+            if last - first + 1 >= num_columns:
+                first, last = 0, num_columns - 1
+            spans.append((first, last))
+            num_cells += last - first + 1
+
+        if num_cells > len(self.cells):
+            return [points for (row, column), points in self.cells.items()
+                    if first_row <= row <= last_row and _in_span(column, spans[row - first_row],
+                                                                 self.columns[row])]
+
+        found = []
+        for row, (first, last) in enumerate(spans, first_row):
+            num_columns = self.columns[row]
+            for column in range(first, last + 1):
+                points = self.cells.get((row, column % num_columns))
+                if points is not None:
+                    found.append(points)
+
+        return found
+
+    def within(self, latitude: float, longitude: float, radius_km: float,
+               cells: Optional[list[list]] = None) -> list[tuple[float, Any]]:
+        """Returns (distance in km, point) for each point within radius_km of the given point, in no
+        particular order.
+
+        cells can be given the result of cells_within for the same circle, if it was already found.
+
+        Preconditions:
+            - -90 <= latitude <= 90 and -180 <= longitude <= 180
+            - radius_km >= 0
+        """
+        # distance_km, with the terms of the given point only computed once. Points farther away in latitude
+        # alone are skipped first, and so are points whose haversine term is over that of radius_km (with a
+        # small margin, since the distance of the others is compared as in distance_km).
+        phi = radians(latitude)
+        cos_phi = cos(phi)
+        max_latitude = radius_km / KM_PER_DEGREE * (1 + 1e-9)
+        max_a = sin(min(radius_km / EARTH_RADIUS_KM, pi) / 2) ** 2 * (1 + 1e-9)
+        if cells is None:
+            cells = self.cells_within(latitude, longitude, radius_km)
+
+        found = []
+        for points in cells:
+            for point in points:
+                if abs(point.latitude - latitude) > max_latitude:
+                    continue
+                phi2 = radians(point.latitude)
+                a = sin((phi2 - phi) / 2) ** 2 \
+                    + cos_phi * cos(phi2) * sin(radians(point.longitude - longitude) / 2) ** 2
+                if a <= max_a:
+                    distance = 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+                    if distance <= radius_km:
+                        found.append((distance, point))
+
+        return found
+
+
+def _in_span(column: int, span: tuple[int, int], num_columns: int) -> bool:
+    """Returns whether column is in span (the first and last columns of a row overlapping a circle, where
+    last may be past the end of the row, continuing from its start), in a row of num_columns columns.
+    """
+    first, last = span
+    return first <= column <= last or first <= column + num_columns <= last \
+        or first <= column - num_columns <= last
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    # import python_ta
+    # python_ta.check_all('geo.py', config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['__future__', 'typing', 'math']
+    # })
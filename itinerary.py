@@ -0,0 +1,450 @@
+""" CSC111 Project 2: Restaurant Recommendation System
+
+Module Description
+==================
+This module plans itineraries: it chooses num_places restaurants whose total price is within
+the whole budget, instead of splitting the budget evenly between them like
+Tree.filter_restaurants does. A cheap stop can then leave room for a better rated, more
+expensive one, while every requested cuisine is still covered.
+
+Plans are found by branch and bound over the matching restaurants, after removing every
+restaurant that could always be swapped for an unchosen one that is no more expensive, rated
+no lower, and covers the same requested cuisines (see pareto_frontier).
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of students
+taking CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC111 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2024 UofT DCS Teaching Team """
+
+from __future__ import annotations
+
+import heapq
+import math
+import time
+from bisect import insort
+from typing import Any, Optional
+
+from functions import Restaurant, Tree, TreeBuilder, Vocabulary, rank_key
+from metrics import METRICS
+
+# what a plan can maximize: the total rating of its restaurants, or their lowest rating
+# (with ties broken by total rating)
+OBJECTIVES = ('total', 'min')
+
+# most branches explored by the solver before it returns the best plan found so far
+DEFAULT_MAX_NODES = 200_000
+
+# most Lagrange multipliers (prices of the budget, in rating) used to bound the rating of a plan
+MAX_MULTIPLIERS = 8
+
+
+class Itinerary:
+    """A plan of restaurants to visit, and statistics about how it was found.
+
+    Instance Attributes:
+        - restaurants: the indices of the chosen restaurants (best rated first),
+                       or None if no plan satisfies the query
+        - total_price: the sum of the average prices of the chosen restaurants
+        - total_rating: the sum of the ratings of the chosen restaurants
+        - min_rating: the lowest rating of the chosen restaurants
+        - stats: statistics of the solver:
+            - objective: what the plan maximizes (one of OBJECTIVES)
+            - candidates: the number of restaurants matching the query within the budget
+            - frontier: the number of them left after removing dominated restaurants
+            - nodes: the number of branches explored
+            - optimal: whether the plan was proven to be the best (False if the solver ran out of nodes)
+            - seconds: the time taken to plan
+    """
+    restaurants: Optional[list[int]]
+    total_price: float
+    total_rating: float
+    min_rating: float
+    stats: dict[str, Any]
+
+    def __init__(self, restaurants: Optional[list[Restaurant]], stats: dict[str, Any]) -> None:
+        """Initialize a new Itinerary of the given restaurants (or None if there is no plan)
+        and solver statistics.
+        """
+        self.stats = stats
+        if restaurants is None:
+            self.restaurants = None
+            self.total_price = self.total_rating = self.min_rating = 0.0
+        else:
+            restaurants = sorted(restaurants, key=rank_key)
+            self.restaurants = [r.og_index for r in restaurants]
+            self.total_price = math.fsum(r.price for r in restaurants)
+            self.total_rating = math.fsum(r.rating for r in restaurants)
+            self.min_rating = min((r.rating for r in restaurants), default=0.0)
+
+    def get_restaurant_info(self, tree: Tree, tree_builder: TreeBuilder) -> list[tuple]:
+        """ Returns the information of the chosen restaurants, in the same format as Tree.get_restaurant_info.
+        """
+        return tree.get_restaurant_info(self.restaurants or [], tree_builder)
+
+
+class ItinerarySolver:
+    """A branch and bound search for the plan of num_places restaurants among candidates with the
+    highest total rating.
+
+    Candidates are ranked by rating (see rank_key), and each branch chooses the next restaurant of
+    the plan among those ranked after the last one chosen. Since later candidates are never rated
+    higher, a branch is cut (along with every later branch) once it cannot beat the best plan found.
+    The total rating of the r restaurants still to choose is at most:
+        - the highest total rating of r remaining candidates having the cuisines the plan is missing
+        - for any multiplier m >= 0, m * B plus the sum of the r highest values of (rating - m * price)
+          among the remaining candidates, where B is the remaining budget (a Lagrangian relaxation of
+          the budget). The multipliers used are slopes of the upper concave envelope of the (price,
+          rating) of the candidates, which are the best multipliers for different average prices.
+    Before searching, the lowest price and highest total rating of r of the candidates from each position
+    having every cuisine a plan may still be missing are found by dynamic programming, so a branch is
+    also only explored if it can be completed within the budget.
+
+    Representation Invariants:
+        - self.num_places >= 1
+        - self.candidates == sorted(self.candidates, key=rank_key)
+
+    Instance Attributes:
+        - candidates: the restaurants that can be chosen, ranked by rating
+        - masks: for each candidate, the set of requested cuisines it has, as a bitmask
+        - full_mask: the bitmask of every requested cuisine
+        - num_places: the number of restaurants in a plan
+        - max_nodes: most branches explored before giving up on proving the best plan is optimal
+        - nodes: the number of branches explored so far
+        - best_total: the total rating of the best plan found so far, or None
+        - best_plan: the positions in candidates of the best plan found so far, or None
+    """
+    candidates: list[Restaurant]
+    masks: list[int]
+    full_mask: int
+    num_places: int
+    max_nodes: int
+    nodes: int
+    best_total: Optional[float]
+    best_plan: Optional[list[int]]
+    # Private Instance Attributes:
+    #   - _ratings: the rating of each candidate
+    #   - _prices: the price of each candidate
+    #   - _multipliers: the multipliers used to bound the total rating of a plan
+    #   - _best_sums: _best_sums[j][r][i] is the sum of the r highest values of
+    #                 (rating - _multipliers[i] * price) among the candidates from position j
+    #                 (minus infinity if there are fewer than r of them)
+    #   - _missing_positions: maps each bitmask of cuisines a plan can be missing (the full mask, less the
+    #                         cuisines of some candidates) to its position in the lists of _costs
+    #   - _costs: _costs[j][r][_missing_positions[m]] is the lowest total price of r candidates from
+    #             position j with every cuisine in m between them (infinity if there are none)
+    #   - _totals: _totals[j][r][_missing_positions[m]] is the highest total rating of r candidates from
+    #              position j with every cuisine in m between them (minus infinity if there are none)
+    _ratings: list[float]
+    _prices: list[float]
+    _multipliers: list[float]
+    _best_sums: list[list[list[float]]]
+    _missing_positions: dict[int, int]
+    _costs: list[list[list[float]]]
+    _totals: list[list[list[float]]]
+
+    def __init__(self, candidates: list[tuple[Restaurant, int]], full_mask: int, num_places: int,
+                 max_nodes: int = DEFAULT_MAX_NODES) -> None:
+        """Initialize a new ItinerarySolver choosing among candidates, given as (restaurant, bitmask
+        of its requested cuisines) pairs.
+
+        Preconditions:
+            - num_places >= 1
+        """
+        candidates = sorted(candidates, key=lambda candidate: rank_key(candidate[0]))
+        self.candidates = [restaurant for restaurant, _ in candidates]
+        self.masks = [mask for _, mask in candidates]
+        self.full_mask = full_mask
+        self.num_places = num_places
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.best_total = None
+        self.best_plan = None
+
+        self._ratings = [r.rating for r in self.candidates]
+        self._prices = [r.price for r in self.candidates]
+        self._find_bounds()
+        self._find_costs()
+
+    def _find_bounds(self) -> None:
+        """Fills in _multipliers and _best_sums, from the last candidate to the first.
+        """
+        self._multipliers = []
+        if self.candidates:
+            xs, ys = _upper_envelope(list(zip(self._prices, self._ratings)))
+            slopes = [(ys[i + 1] - ys[i]) / (xs[i + 1] - xs[i]) for i in range(len(xs) - 1)]
+            self._multipliers = slopes[::max(1, -(-len(slopes) // MAX_MULTIPLIERS))]
+
+        # for each multiplier, the num_places highest values of (rating - multiplier * price) so far,
+        # negated (so they are in ascending order)
+        highest = [[] for _ in self._multipliers]
+        self._best_sums = [[] for _ in range(len(self.candidates))]
+        self._best_sums.append([[0.0] * len(self._multipliers)]
+                               + [[-math.inf] * len(self._multipliers) for _ in range(self.num_places)])
+        for j in range(len(self.candidates) - 1, -1, -1):
+            for i, multiplier in enumerate(self._multipliers):
+                insort(highest[i], multiplier * self._prices[j] - self._ratings[j])
+                del highest[i][self.num_places:]
+            sums = [[0.0] * len(self._multipliers)]
+            for r in range(1, self.num_places + 1):
+                sums.append([sums[r - 1][i] - values[r - 1] if r <= len(values) else -math.inf
+                             for i, values in enumerate(highest)])
+            self._best_sums[j] = sums
+
+    def _find_costs(self) -> None:
+        """Fills in _missing_positions, _costs and _totals, from the last candidate to the first.
+        """
+        missing_masks = [self.full_mask]
+        self._missing_positions = {self.full_mask: 0}
+        for mask in set(self.masks):
+            for missing in list(missing_masks):
+                if missing & ~mask not in self._missing_positions:
+                    self._missing_positions[missing & ~mask] = len(missing_masks)
+                    missing_masks.append(missing & ~mask)
+
+        no_cost = [0.0 if missing == 0 else math.inf for missing in missing_masks]
+        no_total = [0.0 if missing == 0 else -math.inf for missing in missing_masks]
+        self._costs = [[] for _ in range(len(self.candidates))]
+        self._costs.append([no_cost] + [[math.inf] * len(missing_masks) for _ in range(self.num_places)])
+        self._totals = [[] for _ in range(len(self.candidates))]
+        self._totals.append([no_total] + [[-math.inf] * len(missing_masks) for _ in range(self.num_places)])
+        for j in range(len(self.candidates) - 1, -1, -1):
+            later_costs, later_totals = self._costs[j + 1], self._totals[j + 1]
+            price, rating = self._prices[j], self._ratings[j]
+            # the position of what is still missing after choosing candidate j
+            left = [self._missing_positions[missing & ~self.masks[j]] for missing in missing_masks]
+            self._costs[j] = [no_cost] + [[min(cost, price + later_costs[r - 1][i])
+                                           for cost, i in zip(later_costs[r], left)]
+                                          for r in range(1, self.num_places + 1)]
+            self._totals[j] = [no_total] + [[max(total, rating + later_totals[r - 1][i])
+                                             for total, i in zip(later_totals[r], left)]
+                                            for r in range(1, self.num_places + 1)]
+
+    def solve(self, budget: float) -> Optional[list[Restaurant]]:
+        """Returns the best plan within budget, or None if there is none. If more than max_nodes
+        branches are needed, the best plan found by then is returned.
+        """
+        if self.is_feasible(budget):
+            self._search(0, self.num_places, budget, self.full_mask, 0.0, [])
+        if self.best_plan is None:
+            return None
+        return [self.candidates[j] for j in self.best_plan]
+
+    def is_feasible(self, budget: float) -> bool:
+        """Returns whether there is a plan within budget.
+        """
+        return self._costs[0][self.num_places][self._missing_positions[self.full_mask]] <= budget
+
+    def is_optimal(self) -> bool:
+        """Returns whether the search finished, so that the plan returned by solve is the best.
+        """
+        return self.nodes < self.max_nodes
+
+    def _search(self, start: int, remaining: int, budget: float, missing: int, total: float,
+                chosen: list[int]) -> None:
+        """Searches for the best way to add remaining restaurants (from position start of candidates)
+        to the chosen ones, which leave budget to spend, are missing the cuisines in missing, and have
+        the given total rating.
+
+        Preconditions:
+            - self._costs[start][remaining][self._missing_positions[missing]] <= budget
+        """
+        self.nodes += 1
+        if remaining == 0:
+            if self.best_total is None or total > self.best_total:
+                self.best_total = total
+                self.best_plan = list(chosen)
+            return
+
+        position = self._missing_positions[missing]
+        for j in range(start, len(self.candidates) - remaining + 1):
+            # completing the plan from later candidates only gets more expensive
+            if self.nodes >= self.max_nodes or self._costs[j][remaining][position] > budget:
+                return
+
+            # the best total of a plan choosing j next: it only has candidates from position j on
+            most = min([self._totals[j][remaining][position]]
+                       + [multiplier * budget + best for multiplier, best in
+                          zip(self._multipliers, self._best_sums[j][remaining])])
+            if self.best_total is not None and total + most <= self.best_total:
+                return
+
+            left = missing & ~self.masks[j]
+            if self._prices[j] + self._costs[j + 1][remaining - 1][self._missing_positions[left]] <= budget:
+                chosen.append(j)
+                self._search(j + 1, remaining - 1, budget - self._prices[j], left, total + self._ratings[j], chosen)
+                chosen.pop()
+
+
+def plan_itinerary(tree: Tree, num_places: int, max_budget: float, user_input: list, objective: str = 'total',
+                   max_nodes: int = DEFAULT_MAX_NODES) -> Itinerary:
+    """Returns the best plan of num_places different restaurants matching user_input, whose total price
+    is within max_budget, and which have every cuisine in user_input between them.
+
+    user_input is in the same form as for Tree.filter_restaurants: [{cuisines}, type, table booking,
+    online order], where any level can be None (any value) or a collection of values.
+
+    Preconditions:
+        - tree._root == 'root'
+        - objective in OBJECTIVES
+        - num_places >= 1 and max_budget >= 0
+        - user_input[0] is None or len(user_input[0]) <= num_places
+
+    >>> t = TreeBuilder('test_data.csv')
+    >>> tree = t.build_tree()
+    >>> plan = plan_itinerary(tree, 2, 20, [{'Biryani', 'Fast Food'}, None, None, None])
+    >>> plan.restaurants, round(plan.total_price, 2), round(plan.total_rating, 2)
+    ([664, 1277], 13.6, 7.1)
+    >>> plan.stats['optimal']
+    True
+    >>> plan_itinerary(tree, 2, 20, [{'Biryani', 'Fast Food'}, None, None, None], objective='min').restaurants
+    [664, 1277]
+    >>> plan_itinerary(tree, 2, 10, [{'Biryani', 'Goan'}, None, None, None]).restaurants is None
+    True
+    """
+    start_time = time.perf_counter()
+    with METRICS.stage('plan_itinerary'):
+        cuisines = [] if user_input[0] is None else sorted(user_input[0])
+        bits = {cuisine: 1 << c for c, cuisine in enumerate(cuisines)}
+
+        # maps each restaurant within budget to the bitmask of the requested cuisines it has
+        masks = {}
+        for cuisine in cuisines or [None]:
+            for restaurant in tree.find_restaurants([cuisine] + list(user_input[1:])) or set():
+                if restaurant.price <= max_budget:
+                    masks[restaurant] = masks.get(restaurant, 0) | bits.get(cuisine, 0)
+
+        candidates = list(masks.items())
+        frontier = pareto_frontier(candidates, num_places)
+        full_mask = (1 << len(cuisines)) - 1
+        if objective == 'min':
+            # every plan of these candidates has the highest lowest rating, so the best of them has the
+            # highest total rating
+            frontier = _rated_at_least_best_minimum(frontier, full_mask, num_places, max_budget)
+        solver = ItinerarySolver(frontier, full_mask, num_places, max_nodes)
+        plan = solver.solve(max_budget)
+
+        stats = {'objective': objective, 'candidates': len(candidates), 'frontier': len(frontier),
+                 'nodes': solver.nodes, 'optimal': solver.is_optimal(),
+                 'seconds': time.perf_counter() - start_time}
+        if METRICS.enabled:
+            METRICS.count('itinerary_nodes', solver.nodes)
+        return Itinerary(plan, stats)
+
+
+def pareto_frontier(candidates: list[tuple[Restaurant, int]], k: int) -> list[tuple[Restaurant, int]]:
+    """Returns the candidates (pairs of a restaurant and the bitmask of its requested cuisines) that are
+    dominated by fewer than k others, in the same order.
+
+    A candidate dominates another if it costs no more, is rated no lower, and has every requested
+    cuisine the other has (ties are broken like rank_key, so two equal candidates do not dominate each
+    other). In a plan of k restaurants including one dominated by k others, one of those others is not
+    in the plan, and could replace it: so some best plan only uses the candidates returned.
+
+    >>> vocabulary = Vocabulary()
+    >>> a = Restaurant(['8.0', '3.5', 'a', 'No', 'No', 'Cafe', 'Tea'], 0, vocabulary)
+    >>> b = Restaurant(['9.0', '3.0', 'b', 'No', 'No', 'Cafe', 'Tea'], 1, vocabulary)
+    >>> c = Restaurant(['12.0', '3.2', 'c', 'No', 'No', 'Cafe', 'Tea, Momos'], 2, vocabulary)
+    >>> [r.name for r, _ in pareto_frontier([(a, 1), (b, 1), (c, 3)], 1)]
+    ['a', 'c']
+    >>> [r.name for r, _ in pareto_frontier([(a, 1), (b, 1), (c, 3)], 2)]
+    ['a', 'b', 'c']
+    """
+    by_price = sorted(candidates, key=lambda candidate: (candidate[0].price, rank_key(candidate[0])))
+
+    # first remove the candidates dominated by k others with the same cuisines, which is faster
+    top_ratings = {}
+    reduced = []
+    for restaurant, mask in by_price:
+        ratings = top_ratings.setdefault(mask, [])
+        if len(ratings) < k:
+            heapq.heappush(ratings, restaurant.rating)
+            reduced.append((restaurant, mask))
+        elif ratings[0] < restaurant.rating:
+            heapq.heappushpop(ratings, restaurant.rating)
+            reduced.append((restaurant, mask))
+
+    kept = set()
+    for mask in top_ratings:
+        # the k highest ratings of the candidates seen so far that have every cuisine in mask
+        ratings = []
+        for restaurant, other_mask in reduced:
+            if other_mask & mask != mask:
+                continue
+            if other_mask == mask and (len(ratings) < k or ratings[0] < restaurant.rating):
+                kept.add(restaurant.og_index)
+
+            if len(ratings) < k:
+                heapq.heappush(ratings, restaurant.rating)
+            else:
+                heapq.heappushpop(ratings, restaurant.rating)
+
+    return [candidate for candidate in candidates if candidate[0].og_index in kept]
+
+
+def _rated_at_least_best_minimum(candidates: list[tuple[Restaurant, int]], full_mask: int, num_places: int,
+                                 budget: float) -> list[tuple[Restaurant, int]]:
+    """Returns the candidates rated at least as high as the lowest rating of the plan within budget whose
+    lowest rating is the highest (or every candidate, if there is no plan within budget).
+
+    The lowest rating is found by binary search over the ratings of the candidates, since the higher it
+    is, the fewer candidates there are to choose from.
+    """
+    ratings = sorted({restaurant.rating for restaurant, _ in candidates}, reverse=True)
+    low, high = 0, len(ratings)
+    while low < high:
+        mid = (low + high) // 2
+        rated = [candidate for candidate in candidates if candidate[0].rating >= ratings[mid]]
+        if ItinerarySolver(rated, full_mask, num_places).is_feasible(budget):
+            high = mid
+        else:
+            low = mid + 1
+
+    if low == len(ratings):
+        return candidates
+    return [candidate for candidate in candidates if candidate[0].rating >= ratings[low]]
+
+
+def _upper_envelope(points: list[tuple[float, float]]) -> tuple[list[float], list[float]]:
+    """Returns the vertices of the smallest concave, non-decreasing function at least as high as every
+    (x, y) point, as a list of their x and a list of their y, in ascending order.
+
+    Preconditions:
+        - points != []
+
+    >>> _upper_envelope([(1.0, 1.0), (2.0, 3.0), (3.0, 3.5), (4.0, 2.0), (2.0, 1.0)])
+    ([1.0, 2.0, 3.0], [1.0, 3.0, 3.5])
+    >>> _upper_envelope([(1.0, 1.0), (2.0, 1.2), (3.0, 3.0)])
+    ([1.0, 3.0], [1.0, 3.0])
+    """
+    hull = []
+    for x, y in sorted(points):
+        if hull and hull[-1][0] == x:
+            hull.pop()
+        # remove the last vertex while it is on or below the line from the one before it to (x, y)
+        while len(hull) >= 2 and (hull[-1][0] - hull[-2][0]) * (y - hull[-2][1]) \
+                >= (hull[-1][1] - hull[-2][1]) * (x - hull[-2][0]):
+            hull.pop()
+        hull.append((x, y))
+
+    # the envelope stays at its highest point from there on
+    highest = max(range(len(hull)), key=lambda i: (hull[i][1], -i))
+    return [x for x, _ in hull[:highest + 1]], [y for _, y in hull[:highest + 1]]
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    # python_ta.check_all('itinerary.py', config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['__future__', 'typing', 'bisect', 'heapq', 'math', 'time', 'functions', 'metrics'],
+    #     'allowed-io': []
+    # })
@@ -5,6 +5,10 @@ Module Description
 This module contains the main block of code to run the restaurant
 recommendation program.
 
+Run this file without arguments to open the user interface. With arguments, e.g.
+    python main.py --budget 100 --places 3 --cuisine Chinese --type Cafe
+the query is answered on the command line instead (see recommend.py), without importing tkinter.
+
 Copyright and Usage Information
 ===============================
 
@@ -16,18 +20,38 @@ please consult our Course Syllabus.
 
 This file is Copyright (c) 2024 UofT DCS Teaching Team """
 
-import tkinter as tk
+import sys
+
 from functions import TreeBuilder
-from user_interface import RestaurantSelector
 
-t = TreeBuilder('data.csv')
-tree = t.build_tree()
 
-root = tk.Tk()
-app = RestaurantSelector(root, tree, t)
+def run_gui(data: str = 'data.csv') -> None:
+    """Shows the restaurant recommendation window for the dataset in the csv file data,
+    until it is closed.
+    """
+    # tkinter (and the user interface) are only imported when the window is shown,
+    # so the command line interface starts without them
+    import tkinter as tk
+    from user_interface import RestaurantSelector
+
+    t = TreeBuilder(data)
+
+    # the window is shown straight away, and the tree is loaded in the background
+    root = tk.Tk()
+    app = RestaurantSelector(root, t)
+
+    # Uncomment these 3 lines to try the sample output (as shown in the report) for these inputs
+    # tree = t.load_tree()
+    # results = tree.filter_restaurants(6, 100, [{'Mexican', 'Chinese', 'North Indian'}, 'Casual Dining', 'Yes', 'No'])
+    # app.display_results(tree.get_restaurant_info(results, t))
+
+    root.mainloop()
+
 
-# Uncomment these 2 lines to try the sample output (as shown in the report) for these inputs
-# results = tree.filter_restaurants(6, 100, [{'Mexican', 'Chinese', 'North Indian'}, 'Casual Dining', 'Yes', 'No'])
-# app.display_results(tree.get_restaurant_info(results, t))
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        from recommend import main
 
-root.mainloop()
+        sys.exit(main())
+    else:
+        run_gui()
@@ -0,0 +1,306 @@
+""" CSC111 Project 2: Restaurant Recommendation System
+
+Module Description
+==================
+This module contains the Metrics class, which measures where the time goes in the tree
+and tree builder: how long each stage of an operation takes, and how much work it does
+(tree nodes visited, restaurants scanned, csv rows read, cache hits, ...).
+
+Measuring is off until METRICS.enable() is called. While it is off, stages only get back a shared
+context manager that does nothing. Stages run many times per call of the most frequent operations
+(Tree.filter_restaurants, ...) are measured with Metrics.timed instead, only when METRICS.enabled is
+true, so they cost one check of METRICS.enabled while it is off.
+
+While it is on, the time of each stage and every count are added up, and can be exported
+in the Prometheus text format or as JSON lines. Some operations (a random sample) are also
+traced: the time of each of their stages and their counts are sent, as a dict, to every sink.
+For example, to trace 1% of operations into traces.jsonl:
+    METRICS.enable(sample_rate=0.01, sinks=[JsonLinesSink(open('traces.jsonl', 'a'))])
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of students
+taking CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC111 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2024 UofT DCS Teaching Team """
+
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Iterable, Iterator, Optional, TextIO
+
+# prefix of the name of every exported metric
+PREFIX = 'restaurant'
+
+# the context manager returned by Metrics.stage while measuring is off
+_NOT_MEASURED = nullcontext()
+
+
+class Metrics:
+    """Counters and stage timers for the tree and tree builder, with sampled traces.
+
+    Each stage is measured with
+        with METRICS.stage('name'):
+            ...
+    A stage started while no other stage is running on the same thread starts a new operation,
+    which may be traced. Stages started inside it are part of its trace.
+
+    Representation Invariants:
+        - 0 <= self.sample_rate <= 1
+        - self.timer_counts.keys() == self.timer_totals.keys()
+
+    Instance Attributes:
+        - enabled: whether anything is being measured
+        - sample_rate: the probability that an operation is traced
+        - counters: maps the name of each counter to its total
+        - timer_counts: maps the name of each stage to the number of times it ran
+        - timer_totals: maps the name of each stage to its total time, in seconds
+        - sinks: functions called with the trace of each traced operation
+
+    >>> metrics = Metrics()
+    >>> traces = []
+    >>> metrics.enable(sample_rate=1.0, sinks=[traces.append])
+    >>> with metrics.stage('query'):
+    ...     with metrics.stage('descent'):
+    ...         metrics.count('nodes_visited', 4)
+    >>> metrics.counters, metrics.timer_counts
+    ({'nodes_visited': 4}, {'descent': 1, 'query': 1})
+    >>> traces[0]['operation'], list(traces[0]['stages']), traces[0]['counters']
+    ('query', ['descent'], {'nodes_visited': 4})
+    >>> print(metrics.to_prometheus().splitlines()[1])
+    restaurant_nodes_visited_total 4
+    """
+    enabled: bool
+    sample_rate: float
+    counters: dict[str, int]
+    timer_counts: dict[str, int]
+    timer_totals: dict[str, float]
+    sinks: list[Callable[[dict[str, Any]], Any]]
+    # Private Instance Attributes:
+    #   - _local: the trace of the operation running on each thread (or None), as _local.trace
+    #   - _lock: held while adding to the counters and timers, which every thread shares
+    #   - _random: decides which operations are traced
+    _local: threading.local
+    _lock: threading.Lock
+    _random: random.Random
+
+    def __init__(self) -> None:
+        """Initialize a new, disabled Metrics with no sinks.
+        """
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.sinks = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.reset()
+
+    def enable(self, sample_rate: float = 0.0,
+               sinks: Optional[list[Callable[[dict[str, Any]], Any]]] = None) -> None:
+        """Start measuring, tracing each operation with probability sample_rate, and sending
+        the traces to sinks (if given).
+
+        Preconditions:
+            - 0 <= sample_rate <= 1
+        """
+        self.sample_rate = sample_rate
+        if sinks is not None:
+            self.sinks = sinks
+        self.enabled = True
+
+    def disable(self) -> None:
+        """Stop measuring (keeping what was measured so far).
+        """
+        self.enabled = False
+
+    def reset(self) -> None:
+        """Forget every count and time measured so far.
+        """
+        with self._lock:
+            self.counters = {}
+            self.timer_counts = {}
+            self.timer_totals = {}
+
+    def stage(self, name: str) -> Any:
+        """Returns a context manager measuring the time of the stage with the given name.
+        """
+        if not self.enabled:
+            return _NOT_MEASURED
+        return _Stage(self, name)
+
+    def timed(self, name: str, function: Callable[..., Any], *args: Any) -> Any:
+        """Returns function(*args), measuring its time as the stage with the given name. This is the same as
+        calling it inside self.stage(name), but used as
+            result = METRICS.timed(name, function, *args) if METRICS.enabled else function(*args)
+        it costs nothing while measuring is off (unlike a with statement, even one doing nothing).
+        """
+        with self.stage(name):
+            return function(*args)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Adds amount to the counter with the given name (and to the trace of the current operation).
+
+        Preconditions:
+            - self.enabled
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace['counters'][name] = trace['counters'].get(name, 0) + amount
+
+    def counted(self, name: str, items: Iterable) -> Iterator:
+        """Returns an iterator over items, which adds 1 to the counter with the given name for each item read.
+
+        Preconditions:
+            - self.enabled
+        """
+        for item in items:
+            self.count(name)
+            yield item
+
+    def to_prometheus(self) -> str:
+        """Returns the counters and timers in the Prometheus text exposition format.
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            timer_counts = dict(self.timer_counts)
+            timer_totals = dict(self.timer_totals)
+
+        lines = []
+        for name in sorted(counters):
+            lines.append(f'# TYPE {PREFIX}_{name}_total counter')
+            lines.append(f'{PREFIX}_{name}_total {counters[name]}')
+        if timer_counts:
+            lines.append(f'# TYPE {PREFIX}_stage_seconds summary')
+        for name in sorted(timer_counts):
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{name}"}} {timer_counts[name]}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{name}"}} {timer_totals[name]:.9f}')
+
+        return '\n'.join(lines) + '\n'
+
+    def to_json_lines(self) -> str:
+        """Returns the counters and timers as JSON lines: one JSON object per counter or timer.
+        """
+        with self._lock:
+            lines = [json.dumps({'type': 'counter', 'name': name, 'value': value})
+                     for name, value in sorted(self.counters.items())]
+            lines.extend(json.dumps({'type': 'timer', 'name': name, 'count': self.timer_counts[name],
+                                     'seconds': self.timer_totals[name]})
+                         for name in sorted(self.timer_counts))
+
+        return ''.join(line + '\n' for line in lines)
+
+    def _start(self) -> bool:
+        """Called when a stage starts. Returns whether it starts a new operation on this thread,
+        in which case the operation's trace is started if it is sampled.
+        """
+        if getattr(self._local, 'depth', 0) > 0:
+            self._local.depth += 1
+            return False
+
+        self._local.depth = 1
+        if self.sample_rate > 0 and self._random.random() < self.sample_rate:
+            self._local.trace = {'stages': {}, 'counters': {}}
+        return True
+
+    def _finish(self, name: str, seconds: float, is_operation: bool) -> None:
+        """Called when a stage finishes, after the given number of seconds. If it is an operation,
+        its trace (if any) is sent to the sinks.
+        """
+        with self._lock:
+            self.timer_counts[name] = self.timer_counts.get(name, 0) + 1
+            self.timer_totals[name] = self.timer_totals.get(name, 0.0) + seconds
+
+        self._local.depth -= 1
+        trace = getattr(self._local, 'trace', None)
+        if trace is None:
+            return
+        elif not is_operation:
+            trace['stages'][name] = trace['stages'].get(name, 0.0) + seconds
+        else:
+            self._local.trace = None
+            trace.update(operation=name, seconds=seconds, time=time.time())
+            for sink in self.sinks:
+                sink(trace)
+
+
+class _Stage:
+    """A context manager measuring one run of a stage.
+
+    Instance Attributes:
+        - metrics: where the time of the stage is added
+        - name: name of the stage
+        - start: the value of time.perf_counter() when the stage started
+        - is_operation: whether the stage started a new operation
+    """
+    metrics: Metrics
+    name: str
+    start: float
+    is_operation: bool
+
+    def __init__(self, metrics: Metrics, name: str) -> None:
+        """Initialize a new _Stage for the stage with the given name.
+        """
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+        self.is_operation = False
+
+    def __enter__(self) -> _Stage:
+        """Starts timing the stage.
+        """
+        self.is_operation = self.metrics._start()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Stops timing the stage.
+        """
+        self.metrics._finish(self.name, time.perf_counter() - self.start, self.is_operation)
+
+
+class JsonLinesSink:
+    """A sink writing each trace to a file, as one line of JSON.
+
+    Instance Attributes:
+        - file: the (text) file the traces are written to
+    """
+    file: TextIO
+
+    def __init__(self, file: TextIO) -> None:
+        """Initialize a new JsonLinesSink writing to file.
+        """
+        self.file = file
+
+    def __call__(self, trace: dict[str, Any]) -> None:
+        """Writes trace to the file.
+        """
+        self.file.write(json.dumps(trace, default=str) + '\n')
+
+
+# the metrics of the tree and tree builder
+METRICS = Metrics()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    # python_ta.check_all('metrics.py', config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['__future__', 'typing', 'json', 'random', 'threading', 'time', 'contextlib'],
+    #     'allowed-io': ['JsonLinesSink.__call__'],
+    #     'disable': ['protected-access']
+    # })
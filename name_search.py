@@ -0,0 +1,200 @@
+""" CSC111 Project 2: Restaurant Recommendation System
+
+Module Description
+==================
+This module contains the NameIndex class, which finds restaurants by (part of) their name,
+even if it is misspelled, without reading the csv file or walking the tree.
+
+Names are compared by their trigrams, as in PostgreSQL's pg_trgm: each word of a name (in lowercase,
+with apostrophes removed and other punctuation separating words) is padded with two spaces before and
+one after, and every 3 characters in a row of it is a trigram. The similarity of two names is the
+number of trigrams they share divided by the number of trigrams in either (their Jaccard index), so a
+typo only changes a few trigrams.
+
+This module requires NumPy, which is not needed by the rest of the program.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of students
+taking CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC111 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2024 UofT DCS Teaching Team """
+
+from __future__ import annotations
+
+import numpy as np
+
+from functions import Restaurant, TreeBuilder, rank_key
+
+# the lowest similarity of a name to the searched text for it to be found, by default (as in pg_trgm)
+DEFAULT_MIN_SIMILARITY = 0.3
+
+# number of restaurants found by a search, by default
+DEFAULT_LIMIT = 10
+
+
+def trigrams(text: str) -> set[str]:
+    """Returns the trigrams of text.
+
+    >>> sorted(trigrams("Mom's Cafe"))
+    ['  c', '  m', ' ca', ' mo', 'afe', 'caf', 'fe ', 'mom', 'ms ', 'oms']
+    """
+    words = ''.join(char if char.isalnum() else ' ' for char in text.lower().replace("'", '')).split()
+    grams = set()
+    for word in words:
+        padded = '  ' + word + ' '
+        grams.update(padded[start:start + 3] for start in range(len(padded) - 2))
+    return grams
+
+
+def similarity(text1: str, text2: str) -> float:
+    """Returns the similarity of text1 and text2 (between 0 and 1): the number of trigrams they share,
+    divided by the number of trigrams in either.
+
+    >>> similarity('Truffles', 'trufles')
+    0.7
+    >>> similarity('Truffles', 'Truffles!'), similarity('Truffles', 'Onesta')
+    (1.0, 0.0)
+    """
+    grams1, grams2 = trigrams(text1), trigrams(text2)
+    if not grams1 and not grams2:
+        return 0.0
+    return len(grams1 & grams2) / len(grams1 | grams2)
+
+
+class NameIndex:
+    """An index of the names of the restaurants of a tree builder, for finding restaurants by name.
+
+    Restaurants are ranked by the similarity of their name to the searched text (best first), with ties
+    ranked by rating (see rank_key). Names less similar than min_similarity are not found.
+
+    Names are found from an inverted index, from each trigram to the names that have it (as a NumPy array).
+    The arrays of the trigrams of the text are joined, and the number of times each name appears in them is
+    the number of trigrams it shares with the text, so the similarity of every name with some trigram of the
+    text is computed at once, without comparing any strings.
+
+    The index is built again whenever the tree builder's version changes (the tree was rebuilt, or a
+    restaurant was added, updated or deleted).
+
+    Representation Invariants:
+        - 0 < self.min_similarity <= 1
+        - len(self._restaurants) == len(self._num_grams)
+
+    Instance Attributes:
+        - t: tree builder of the restaurants
+        - min_similarity: the lowest similarity of a name to the searched text for it to be found
+
+    >>> t = TreeBuilder('test_data.csv')
+    >>> index = NameIndex(t)
+    >>> index.search('krispy creme')
+    [3430]
+    >>> [t.get_info(i)[2] for i in index.search('kitchen')]
+    ["Pai's Kitchen", 'Xpress Kitchen']
+    >>> index.search('Behrouz Biryani') == index.search('behruz biriyani') == [664]
+    True
+    >>> index.search('pizza')
+    []
+    """
+    t: TreeBuilder
+    min_similarity: float
+    # Private Instance Attributes:
+    #   - _restaurants: the restaurants with each different name, best rated first (see rank_key), where
+    #                   names with the same trigrams count as the same. A name's position in this list
+    #                   identifies it in the index.
+    #   - _num_grams: the number of trigrams of each name
+    #   - _grams: maps each trigram to the positions of the names with it, in ascending order
+    #   - _version: the version of the tree builder when the index was last built
+    _restaurants: list[list[Restaurant]]
+    _num_grams: np.ndarray
+    _grams: dict[str, np.ndarray]
+    _version: int
+
+    def __init__(self, t: TreeBuilder, min_similarity: float = DEFAULT_MIN_SIMILARITY) -> None:
+        """Initialize a new NameIndex of the restaurants of t (which is only built by the first search).
+
+        Preconditions:
+            - 0 < min_similarity <= 1
+        """
+        self.t = t
+        self.min_similarity = min_similarity
+        self._restaurants = []
+        self._num_grams = np.zeros(0, dtype=np.int32)
+        self._grams = {}
+        self._version = -1
+
+    def build(self) -> None:
+        """Builds the index from the restaurants of the tree builder.
+        """
+        self._restaurants = []
+        num_grams = []
+        grams_positions = {}
+        # maps the trigrams of each name (in sorted order) to its position
+        positions = {}
+        for restaurant in self.t.get_restaurants():
+            grams = trigrams(restaurant.name)
+            key = tuple(sorted(grams))
+            position = positions.get(key)
+            if position is None:
+                position = len(self._restaurants)
+                positions[key] = position
+                self._restaurants.append([])
+                num_grams.append(len(grams))
+                for gram in grams:
+                    grams_positions.setdefault(gram, []).append(position)
+            self._restaurants[position].append(restaurant)
+
+        for restaurants in self._restaurants:
+            restaurants.sort(key=rank_key)
+        self._num_grams = np.array(num_grams, dtype=np.int32)
+        self._grams = {gram: np.array(names, dtype=np.int32) for gram, names in grams_positions.items()}
+        self._version = self.t.version
+
+    def search(self, text: str, limit: int = DEFAULT_LIMIT) -> list[int]:
+        """Returns the original indices of the (at most limit) restaurants whose names are most similar
+        to text, best match first.
+
+        Preconditions:
+            - limit >= 0
+        """
+        if self._version != self.t.version:
+            self.build()
+
+        grams = trigrams(text)
+        postings = [self._grams[gram] for gram in grams if gram in self._grams]
+        if not postings or limit == 0:
+            return []
+
+        positions, shared = np.unique(np.concatenate(postings), return_counts=True)
+        scores = shared / (len(grams) + self._num_grams[positions] - shared)
+        found = scores >= self.min_similarity - 1e-9
+        positions, scores = positions[found], scores[found]
+
+        # the names are read from most to least similar, until limit restaurants are found and the next
+        # name is less similar (so its restaurants cannot tie with the ones found)
+        top = []
+        for k in np.argsort(-scores, kind='stable').tolist():
+            score = scores[k]
+            if len(top) >= limit and -score > top[limit - 1][0]:
+                break
+            top.extend((-score, rank_key(restaurant), restaurant.og_index)
+                       for restaurant in self._restaurants[positions[k]][:limit])
+            if len(top) >= limit:
+                top.sort()
+
+        top.sort()
+        return [i for _, _, i in top[:limit]]
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    # import python_ta
+    # python_ta.check_all('name_search.py', config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['__future__', 'numpy', 'functions']
+    # })
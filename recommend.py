@@ -0,0 +1,410 @@
+""" CSC111 Project 2: Restaurant Recommendation System
+
+Module Description
+==================
+This module contains a headless command line interface for restaurant recommendations,
+for calling from scripts. It imports only the query core (functions.py, never tkinter),
+and the restaurant tree is only loaded (from its snapshot, if it is up to date) when the
+first query is run.
+
+Run this file with a query to print the recommended restaurants, e.g.
+    python recommend.py --budget 100 --places 3 --cuisine Chinese --cuisine Mexican --type "Casual Dining"
+
+Options:
+    - --table-booking, --online-order: yes, no (the default) or any
+    - --plan total or --plan min: plan the places with itinerary.py instead (spending the budget on
+      the best total rating, or the best lowest rating), rather than taking the best rated ones
+    - --near LAT,LON: only recommend restaurants with a location (if the dataset has locations), taking
+      the nearest ones to the point, or with --radius KM, the best rated ones within KM of the point
+    - --name TEXT: find restaurants by name instead (even if misspelled), with name_search.py, taking up to
+      --places of them (10 by default); no other options are needed
+    - --similar-to INDEX: recommend the places most like the restaurant with original index INDEX instead,
+      with similarity.py, taking up to --places of them (10 by default) that cost at most --budget each
+      (if it is given). Unless --no-snapshot is given, the neighbours of every restaurant are saved to
+      the csv file name followed by '.neighbours', and only found again when the csv file changes
+    - --json: print the results as a JSON object (as returned by POST /recommend in server.py), along
+      with the plan's total price, total rating, lowest rating and solver statistics for --plan
+    - --batch: read one query per line from standard input (in the same options as the command line,
+      e.g. --budget 100 --places 3 --cuisine Chinese --type Cafe) and print one JSON object per line,
+      so that many queries only load the tree once. Options given on the command line are the defaults
+      of each query, except --cuisine
+    - --timing: print the time taken to start, load the tree and answer each query to standard error
+
+The exit status is 0 if restaurants were found, 1 if there were no matches and 2 if the query is invalid.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of students
+taking CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC111 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2024 UofT DCS Teaching Team """
+
+from __future__ import annotations
+
+import time
+
+# when this module started being imported, for --timing
+_STARTED = time.perf_counter()
+
+# pylint: disable=wrong-import-position
+import argparse
+import json
+import shlex
+import sys
+from typing import TYPE_CHECKING, Any, Optional
+
+from cache import QueryCache
+from functions import MAX_BUDGET, Tree, TreeBuilder, validate_preferences
+
+if TYPE_CHECKING:
+    from name_search import NameIndex
+    from similarity import SimilarityIndex
+
+# number of restaurants found by --name or --similar-to without --places (as in name_search.DEFAULT_LIMIT)
+DEFAULT_LIMIT = 10
+
+# the most places --similar-to can recommend (as in similarity.DEFAULT_NUM_NEIGHBOURS)
+MAX_SIMILAR = 50
+
+# the level values that can be given for table booking and online order ('any' matches both)
+CHOICES = {'yes': 'Yes', 'no': 'No', 'any': None}
+
+# the keys of the information of each result, in the order of Tree.get_restaurant_info
+RESULT_KEYS = ('name', 'cuisines', 'types', 'rating', 'price')
+
+
+class Recommender:
+    """Answers recommendation queries, loading the restaurant tree on the first query.
+
+    Instance Attributes:
+        - t: tree builder of the dataset
+        - load_seconds: the time taken to load the tree, or None if it has not been loaded yet
+
+    >>> recommender = Recommender('test_data.csv', use_snapshot=False)
+    >>> recommender.load_seconds is None
+    True
+    >>> recommender.recommend(2, 20, [{'North Indian'}, 'Takeaway', 'No', 'No'])
+    [('Xpress Kitchen', 'North Indian, Chinese', 'Takeaway, Delivery', '3.3', '8.0')]
+    >>> recommender.load_seconds > 0
+    True
+    >>> results, summary = recommender.plan(2, 20, [{'North Indian'}, 'Takeaway', 'No', None], 'total')
+    >>> [result[0] for result in results], summary['total_price'], summary['total_rating'], summary['stats']['optimal']
+    (['Xpress Kitchen', 'Sardar Tikka Singh'], 16.0, 6.1, True)
+    """
+    t: TreeBuilder
+    load_seconds: Optional[float]
+    # Private Instance Attributes:
+    #   - _use_snapshot: whether the tree is loaded from (and saved to) its snapshot file,
+    #                    rather than always built from the csv file
+    #   - _tree: tree representing dataset of restaurants, or None if it has not been loaded yet
+    #   - _cache: cache of recent query results from the tree, or None if it has not been loaded yet
+    #   - _names: index of the restaurant names, or None if no name has been searched yet
+    #   - _similar: neighbours of every restaurant, or None if no similar places have been asked for yet
+    _use_snapshot: bool
+    _tree: Optional[Tree]
+    _cache: Optional[QueryCache]
+    _names: Optional[NameIndex]
+    _similar: Optional[SimilarityIndex]
+
+    def __init__(self, data: str, use_snapshot: bool = True) -> None:
+        """Initialize a new Recommender for the dataset in the csv file data.
+
+        If use_snapshot is True, the tree is loaded as in TreeBuilder.load_tree (from the csv file
+        name followed by '.snapshot', if it is up to date). Otherwise, it is built from the csv file.
+        """
+        self.t = TreeBuilder(data)
+        self.load_seconds = None
+        self._use_snapshot = use_snapshot
+        self._tree = None
+        self._cache = None
+        self._names = None
+        self._similar = None
+
+    def get_tree(self) -> Tree:
+        """Returns the restaurant tree, loading it first if it has not been loaded yet.
+        """
+        if self._tree is None:
+            start = time.perf_counter()
+            self._tree = self.t.load_tree() if self._use_snapshot else self.t.build_tree()
+            self._cache = QueryCache(self._tree, self.t)
+            self.load_seconds = time.perf_counter() - start
+
+        return self._tree
+
+    def recommend(self, num_places: int, max_budget: int, user_input: list) -> Optional[list[tuple]]:
+        """Returns the information of the recommended restaurants (in the same format as
+        Tree.get_restaurant_info), or None if there are no matches.
+
+        Preconditions:
+            - the preconditions of Tree.filter_restaurants hold
+        """
+        self.get_tree()
+        return self._cache.recommend(num_places, max_budget, user_input)
+
+    def plan(self, num_places: int, max_budget: int, user_input: list,
+             objective: str) -> tuple[Optional[list[tuple]], dict[str, Any]]:
+        """Returns the information of the restaurants planned by itinerary.plan_itinerary (in the same
+        format as Tree.get_restaurant_info), or None if there is no plan within the budget, along with
+        the plan's total price, total rating, lowest rating and solver statistics (see Itinerary).
+
+        Preconditions:
+            - the preconditions of itinerary.plan_itinerary hold
+        """
+        # imported here, since only --plan needs it
+        from itinerary import plan_itinerary
+
+        tree = self.get_tree()
+        itinerary = plan_itinerary(tree, num_places, max_budget, user_input, objective)
+        summary = {'total_price': round(itinerary.total_price, 1), 'total_rating': round(itinerary.total_rating, 1),
+                   'min_rating': itinerary.min_rating, 'stats': itinerary.stats}
+        if itinerary.restaurants is None:
+            return None, summary
+        return itinerary.get_restaurant_info(tree, self.t), summary
+
+    def recommend_near(self, num_places: int, max_budget: int, user_input: list, latitude: float, longitude: float,
+                       radius_km: Optional[float] = None) -> Optional[list[tuple]]:
+        """Returns the information of the restaurants chosen by Tree.nearest_restaurants, or if radius_km is
+        given, by Tree.filter_restaurants_near (in the same format as Tree.get_restaurant_info), or None if
+        there are no matches.
+
+        Preconditions:
+            - the preconditions of Tree.filter_restaurants_near hold (radius_km can be None)
+        """
+        tree = self.get_tree()
+        if radius_km is None:
+            indices = tree.nearest_restaurants(num_places, max_budget, user_input, latitude, longitude)
+        else:
+            indices = tree.filter_restaurants_near(num_places, max_budget, user_input, latitude, longitude, radius_km)
+        return tree.get_restaurant_info(indices, self.t) if indices else None
+
+    def search_name(self, text: str, limit: int) -> Optional[list[tuple]]:
+        """Returns the information of the (at most limit) restaurants found by NameIndex.search (in the same
+        format as Tree.get_restaurant_info), or None if there are no matches.
+
+        Preconditions:
+            - limit >= 0
+        """
+        # imported here, since only --name needs it
+        from name_search import NameIndex
+
+        tree = self.get_tree()
+        if self._names is None:
+            self._names = NameIndex(self.t)
+        indices = self._names.search(text, limit)
+        return tree.get_restaurant_info(indices, self.t) if indices else None
+
+    def similar_to(self, og_index: int, k: int, budget: Optional[int] = None) -> Optional[list[tuple]]:
+        """Returns the information of the restaurants found by SimilarityIndex.similar_to (in the same format
+        as Tree.get_restaurant_info), or None if there are no matches.
+
+        Preconditions:
+            - the preconditions of SimilarityIndex.similar_to hold
+        """
+        # imported here, since only --similar-to needs it
+        from similarity import SimilarityIndex
+
+        tree = self.get_tree()
+        if self._similar is None:
+            self._similar = SimilarityIndex(self.t)
+            if self._use_snapshot:
+                self._similar.load_or_build()
+        indices = self._similar.similar_to(og_index, k, budget)
+        return tree.get_restaurant_info(indices, self.t) if indices else None
+
+    def run(self, args: argparse.Namespace) -> tuple[int, dict[str, Any]]:
+        """Returns the exit status and JSON response (as a dict) for the query in the parsed arguments.
+        """
+        if args.name is not None:
+            if args.places < 0:
+                return 2, {'error': 'Please give a number of places of at least 0.'}
+            results = self.search_name(args.name, args.places or DEFAULT_LIMIT)
+            return _response(results)
+        if args.similar_to is not None:
+            if not 0 <= args.places <= MAX_SIMILAR:
+                return 2, {'error': f'Please give a number of places between 0 and {MAX_SIMILAR}.'}
+            elif args.budget is not None and not (args.budget.isascii() and args.budget.isdecimal()):
+                return 2, {'error': 'Budget must be an integer.'}
+            elif args.budget is not None and (len(args.budget.lstrip('0')) > len(str(MAX_BUDGET))
+                                              or int(args.budget) > MAX_BUDGET):
+                return 2, {'error': f'Budget must be at most {MAX_BUDGET}.'}
+            self.get_tree()
+            if self.t.get_info(args.similar_to) is None:
+                return 2, {'error': f'No restaurant has index {args.similar_to}.'}
+            budget = None if args.budget is None else int(args.budget)
+            return _response(self.similar_to(args.similar_to, args.places or DEFAULT_LIMIT, budget))
+
+        cuisines = list(dict.fromkeys(args.cuisine or []))
+        error = validate_preferences(args.budget or '', args.places, cuisines, args.type or '')
+        if error is None:
+            error = _validate_location(args)
+        if error is not None:
+            return 2, {'error': error}
+
+        user_input = [set(cuisines), args.type, CHOICES[args.table_booking], CHOICES[args.online_order]]
+        if args.near is not None:
+            results = self.recommend_near(args.places, int(args.budget), user_input, *args.near, args.radius)
+        elif args.plan is None:
+            results = self.recommend(args.places, int(args.budget), user_input)
+        else:
+            results, summary = self.plan(args.places, int(args.budget), user_input, args.plan)
+            status, response = _response(results)
+            response['plan'] = summary
+            return status, response
+
+        return _response(results)
+
+
+def _response(results: Optional[list[tuple]]) -> tuple[int, dict[str, Any]]:
+    """Returns the exit status and JSON response (as a dict) for the results of a query (in the same format
+    as Tree.get_restaurant_info), or None if there were no matches.
+    """
+    return (1 if results is None else 0), {'results': [dict(zip(RESULT_KEYS, result)) for result in results or []]}
+
+
+def make_parser() -> argparse.ArgumentParser:
+    """Returns the parser of the command line arguments (and of each query read by --batch).
+    """
+    parser = argparse.ArgumentParser(description='Recommend restaurants without the user interface.')
+    parser.add_argument('--data', default='data.csv', help='csv file of the restaurant dataset')
+    parser.add_argument('--no-snapshot', action='store_true', help='build the tree instead of loading its snapshot')
+    parser.add_argument('--budget', help='total budget (an integer)')
+    parser.add_argument('--places', type=int, default=0, help='number of places to go (1-10)')
+    parser.add_argument('--cuisine', action='append', help='a cuisine to include (can be repeated)')
+    parser.add_argument('--type', help='restaurant type, e.g. "Casual Dining"')
+    parser.add_argument('--table-booking', choices=list(CHOICES), default='no')
+    parser.add_argument('--online-order', choices=list(CHOICES), default='no')
+    parser.add_argument('--plan', choices=['total', 'min'],
+                        help='plan the places to spend the budget on the best total (or lowest) rating')
+    parser.add_argument('--near', type=_parse_point, metavar='LAT,LON',
+                        help='recommend the nearest restaurants to this point (in degrees)')
+    parser.add_argument('--radius', type=float, metavar='KM',
+                        help='with --near, recommend the best rated restaurants within this distance instead')
+    parser.add_argument('--name', metavar='TEXT', help='find restaurants by name instead (even if misspelled)')
+    parser.add_argument('--similar-to', type=int, metavar='INDEX',
+                        help='recommend the places most like the restaurant with this index instead')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    parser.add_argument('--batch', action='store_true', help='read one query per line from standard input')
+    parser.add_argument('--timing', action='store_true', help='print timings to standard error')
+    return parser
+
+
+def _parse_point(text: str) -> tuple[float, float]:
+    """Returns the (latitude, longitude) given as text in the form LAT,LON, for --near.
+
+    >>> _parse_point('12.97, 77.59')
+    (12.97, 77.59)
+    """
+    latitude, longitude = text.split(',')
+    return float(latitude), float(longitude)
+
+
+def _validate_location(args: argparse.Namespace) -> Optional[str]:
+    """Returns the error message for the --near and --radius options in the parsed arguments, or None if
+    they are valid.
+    """
+    if args.near is None:
+        return None if args.radius is None else 'Please give --near with --radius.'
+    elif args.plan is not None:
+        return 'Please give either --near or --plan.'
+    elif not (-90 <= args.near[0] <= 90 and -180 <= args.near[1] <= 180):
+        return 'Please give a latitude between -90 and 90, and a longitude between -180 and 180.'
+    elif args.radius is not None and not args.radius >= 0:
+        return 'Please give a radius of at least 0 km.'
+    return None
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Runs the command line interface with the given arguments (by default, those of this process),
+    and returns the exit status.
+
+    Unless --json or --batch is given, each result is printed as a line of tab-separated columns.
+
+    >>> main(['--data', 'test_data.csv', '--no-snapshot', '--budget', '20', '--places', '2',
+    ...       '--cuisine', 'North Indian', '--type', 'Takeaway', '--online-order', 'any', '--json'])
+    {"results": [{"name": "Xpress Kitchen", "cuisines": "North Indian, Chinese", "types": "Takeaway, Delivery", \
+"rating": "3.3", "price": "8.0"}, {"name": "Sardar Tikka Singh", "cuisines": "North Indian", \
+"types": "Takeaway, Delivery", "rating": "2.8", "price": "8.0"}]}
+    0
+    >>> main(['--data', 'test_data.csv', '--no-snapshot', '--budget', '20', '--places', '2',
+    ...       '--cuisine', 'Goan', '--type', 'Takeaway', '--json'])
+    {"results": []}
+    1
+    >>> main(['--data', 'test_data.csv', '--no-snapshot', '--name', 'xpres kitchen', '--places', '1', '--json'])
+    {"results": [{"name": "Xpress Kitchen", "cuisines": "North Indian, Chinese", "types": "Takeaway, Delivery", \
+"rating": "3.3", "price": "8.0"}]}
+    0
+    >>> main(['--data', 'test_data.csv', '--no-snapshot', '--similar-to', '7020', '--places', '1', '--json'])
+    {"results": [{"name": "Sardar Tikka Singh", "cuisines": "North Indian", "types": "Takeaway, Delivery", \
+"rating": "2.8", "price": "8.0"}]}
+    0
+    >>> import io
+    >>> stdin = sys.stdin
+    >>> sys.stdin = io.StringIO("--cuisine 'North Indian' --type Takeaway\\n--cuisine Goan --type Takeaway\\n")
+    >>> main(['--data', 'test_data.csv', '--no-snapshot', '--budget', '20', '--places', '1', '--cuisine', 'Goan',
+    ...       '--batch'])
+    {"results": [{"name": "Xpress Kitchen", "cuisines": "North Indian, Chinese", "types": "Takeaway, Delivery", \
+"rating": "3.3", "price": "8.0"}]}
+    {"results": []}
+    0
+    >>> sys.stdin = stdin
+    """
+    started = time.perf_counter()
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    recommender = Recommender(args.data, not args.no_snapshot)
+
+    if not args.batch:
+        status, response = recommender.run(args)
+        if 'error' in response:
+            print(response['error'], file=sys.stderr)
+        elif args.json:
+            print(json.dumps(response), file=sys.stdout)
+        elif status == 1:
+            print('No restaurants found.', file=sys.stderr)
+        else:
+            for result in response['results']:
+                print('\t'.join(result[key] for key in RESULT_KEYS), file=sys.stdout)
+        num_queries = 1
+    else:
+        status = 0
+        num_queries = 0
+        # the options of the command line are the defaults of each query, except those that can be
+        # repeated (such as --cuisine), which would otherwise be added to the query's own
+        defaults = {key: value for key, value in vars(args).items() if not isinstance(value, list)}
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            try:
+                query = parser.parse_args(shlex.split(line), namespace=argparse.Namespace(**defaults))
+            except (SystemExit, ValueError):  # ValueError: shlex.split found e.g. an unclosed quote
+                response = {'error': f'Invalid query: {line.strip()}'}
+            else:
+                response = recommender.run(query)[1]
+            print(json.dumps(response), file=sys.stdout, flush=True)
+            num_queries += 1
+
+    if args.timing:
+        finished = time.perf_counter()
+        load_seconds = recommender.load_seconds or 0.0
+        print(f'startup: {(started - _STARTED) * 1000:.1f} ms (importing this module)\n'
+              f'load: {load_seconds * 1000:.1f} ms (loading the tree)\n'
+              f'queries: {(finished - started - load_seconds) * 1000:.1f} ms ({num_queries} queries)',
+              file=sys.stderr)
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+    # import python_ta
+    # python_ta.check_all('recommend.py', config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['__future__', 'typing', 'argparse', 'json', 'shlex', 'sys', 'time', 'cache',
+    #                       'functions', 'itinerary', 'name_search', 'similarity'],
+    #     'allowed-io': ['main']
+    # })
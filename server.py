@@ -0,0 +1,338 @@
+""" CSC111 Project 2: Restaurant Recommendation System
+
+Module Description
+==================
+This module contains a headless HTTP/JSON service for restaurant recommendations,
+using asyncio. The restaurant tree is loaded once, and shared by every request.
+
+Run this file to start the service:
+    python server.py --port 8000 --data data.csv
+
+With --workers N, the service runs in N processes sharing one copy of the dataset (see shared_index.py).
+
+Endpoints:
+    - GET /health: {"status": "ok", "restaurants": <number of restaurants>}
+    - GET /cuisines, GET /types: the cuisines and restaurant types that can be chosen
+    - POST /recommend, with a JSON body such as
+        {"budget": "100", "num_places": 3, "cuisines": ["Chinese", "Mexican"],
+         "type": "Casual Dining", "table_booking": false, "online_order": true}
+      returns {"results": [{"name": ..., "cuisines": ..., "types": ..., "rating": ..., "price": ...}]}
+
+Invalid requests get a 400 response with {"error": <message>}, using the same rules as the
+user interface.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of students
+taking CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC111 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2024 UofT DCS Teaching Team """
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Optional
+
+from cache import QueryCache
+from functions import Tree, TreeBuilder, validate_preferences
+
+# largest request body accepted, in bytes
+MAX_BODY_SIZE = 1 << 16
+
+# most header lines accepted in a request
+MAX_HEADERS = 100
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 431: 'Request Header Fields Too Large', 500: 'Internal Server Error'}
+
+
+class RecommendationService:
+    """The recommendation queries answered by the HTTP service, independent of HTTP and of how the
+    restaurants are stored.
+
+    Subclasses answer the queries by overriding count_restaurants, get_all_cuisines, get_all_types
+    and query.
+    """
+
+    def handle(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        """Returns the HTTP status code and JSON response (as a dict) for the given request.
+        """
+        if path == '/health':
+            return 200, {'status': 'ok', 'restaurants': self.count_restaurants()}
+        elif path == '/cuisines':
+            return 200, {'cuisines': self.get_all_cuisines()}
+        elif path == '/types':
+            return 200, {'types': self.get_all_types()}
+        elif path == '/recommend':
+            if method != 'POST':
+                return 405, {'error': 'Use POST for /recommend'}
+            return self.recommend(body)
+        else:
+            return 404, {'error': f'Unknown path {path}'}
+
+    def recommend(self, body: bytes) -> tuple[int, dict]:
+        """Returns the HTTP status code and JSON response for a recommendation request with the given body.
+        """
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return 400, {'error': 'Request body must be JSON.'}
+
+        error = _check_request(request)
+        if error is not None:
+            return 400, {'error': error}
+
+        budget = str(request['budget'])
+        num_places = request['num_places']
+        cuisines = list(dict.fromkeys(request['cuisines']))
+        error = validate_preferences(budget, num_places, cuisines, request['type'])
+        if error is not None:
+            return 400, {'error': error}
+        try:
+            max_budget = int(budget)
+        except ValueError:
+            return 400, {'error': 'Budget must be an integer.'}
+
+        results = self.query(num_places, max_budget, [set(cuisines), request['type'],
+                                                       'Yes' if request.get('table_booking') else 'No',
+                                                       'Yes' if request.get('online_order') else 'No'])
+        keys = ('name', 'cuisines', 'types', 'rating', 'price')
+        return 200, {'results': [dict(zip(keys, result)) for result in results or []]}
+
+    def count_restaurants(self) -> int:
+        """Returns the number of restaurants that can be recommended.
+        """
+        raise NotImplementedError
+
+    def get_all_cuisines(self) -> list[str]:
+        """Returns every cuisine, in alphabetical order.
+        """
+        raise NotImplementedError
+
+    def get_all_types(self) -> list[str]:
+        """Returns every restaurant type, in alphabetical order.
+        """
+        raise NotImplementedError
+
+    def query(self, num_places: int, max_budget: int, user_input: list) -> Optional[list[tuple]]:
+        """Returns the information of the recommended restaurants (in the same format as
+        Tree.get_restaurant_info), or None if there are no matches.
+
+        Preconditions:
+            - the preconditions of Tree.filter_restaurants hold
+        """
+        raise NotImplementedError
+
+
+class TreeService(RecommendationService):
+    """A RecommendationService answering queries from a restaurant tree, through a cache of recent results.
+
+    Instance Attributes:
+        - tree: tree representing dataset of restaurants
+        - t: tree builder the tree was built by
+        - cache: cache of recent query results from the tree
+
+    >>> t = TreeBuilder('test_data.csv')
+    >>> service = TreeService(t.build_tree(), t)
+    >>> service.handle('POST', '/recommend', b'{"budget": "20", "num_places": 2, "cuisines": ["North Indian"], '
+    ...                b'"type": "Takeaway", "table_booking": false, "online_order": false}')
+    (200, {'results': [{'name': 'Xpress Kitchen', 'cuisines': 'North Indian, Chinese', \
+'types': 'Takeaway, Delivery', 'rating': '3.3', 'price': '8.0'}]})
+    >>> service.handle('POST', '/recommend', b'{"budget": "20", "num_places": 0, "cuisines": ["North Indian"], '
+    ...                b'"type": "Takeaway"}')
+    (400, {'error': 'Please choose 1-10 number of places to go.'})
+    >>> service.handle('POST', '/recommend', json.dumps({'budget': '\u00b2', 'num_places': 2,
+    ...                                                 'cuisines': ['North Indian'], 'type': 'Takeaway'}).encode())
+    (400, {'error': 'Budget must be an integer.'})
+    >>> service.handle('POST', '/recommend', b'{"budget": 1' + b'0' * 400 + b', "num_places": 2, '
+    ...                b'"cuisines": ["North Indian"], "type": "Takeaway"}')
+    (400, {'error': 'Budget must be at most 1000000000.'})
+    >>> service.handle('GET', '/recommend', b'')
+    (405, {'error': 'Use POST for /recommend'})
+    """
+    tree: Tree
+    t: TreeBuilder
+    cache: QueryCache
+
+    def __init__(self, tree: Tree, t: TreeBuilder) -> None:
+        """Initialize a new TreeService for the given tree and tree builder.
+        """
+        super().__init__()
+        self.tree = tree
+        self.t = t
+        self.cache = QueryCache(tree, t)
+
+    def count_restaurants(self) -> int:
+        """Returns the number of restaurants that can be recommended.
+        """
+        return len(self.t.get_indices())
+
+    def get_all_cuisines(self) -> list[str]:
+        """Returns every cuisine, in alphabetical order.
+        """
+        return self.tree.get_all_cuisines()
+
+    def get_all_types(self) -> list[str]:
+        """Returns every restaurant type, in alphabetical order.
+        """
+        return sorted(self.tree.get_all_types())
+
+    def query(self, num_places: int, max_budget: int, user_input: list) -> Optional[list[tuple]]:
+        """Returns the information of the recommended restaurants (in the same format as
+        Tree.get_restaurant_info), or None if there are no matches.
+
+        Preconditions:
+            - the preconditions of Tree.filter_restaurants hold
+        """
+        return self.cache.recommend(num_places, max_budget, user_input)
+
+
+def _check_request(request: Any) -> Optional[str]:
+    """Returns an error message if the decoded JSON request does not have the fields of a
+    recommendation request with the right types, or None if it does.
+    """
+    if not isinstance(request, dict):
+        return 'Request body must be a JSON object.'
+    elif not isinstance(request.get('budget', ''), (str, int)) or isinstance(request.get('budget'), bool):
+        return 'Budget must be an integer.'
+    elif not isinstance(request.get('num_places'), int) or isinstance(request.get('num_places'), bool) \
+            or not 0 <= request['num_places'] <= 10:
+        return 'Please choose 1-10 number of places to go.'
+    elif not isinstance(request.get('cuisines', []), list) \
+            or not all(isinstance(cuisine, str) for cuisine in request.get('cuisines', [])):
+        return 'Cuisines must be a list of strings.'
+    elif not isinstance(request.get('type', ''), str):
+        return 'Type must be a string.'
+    elif not all(isinstance(request.get(key, False), bool) for key in ('table_booking', 'online_order')):
+        return 'Table booking and online order must be true or false.'
+
+    request.setdefault('budget', '')
+    request.setdefault('cuisines', [])
+    request.setdefault('type', '')
+    return None
+
+
+async def handle_connection(service: RecommendationService, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+    """Answers the HTTP/1.1 requests sent on one connection, until the client closes it
+    (or asks for it to be closed).
+    """
+    try:
+        keep_alive = True
+        while keep_alive:
+            # a line longer than the reader's limit (64 KiB) raises ValueError (or LimitOverrunError)
+            try:
+                request_line = await reader.readline()
+            except (ValueError, asyncio.LimitOverrunError):
+                await _write_response(writer, 400, {'error': 'Request line is too long.'}, False)
+                break
+            if not request_line:
+                break
+
+            parts = request_line.decode('latin-1').split()
+            headers = {}
+            try:
+                for _ in range(MAX_HEADERS + 1):
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                else:
+                    await _write_response(writer, 431, {'error': 'Request has too many headers.'}, False)
+                    break
+            except (ValueError, asyncio.LimitOverrunError):
+                await _write_response(writer, 431, {'error': 'Request header is too long.'}, False)
+                break
+
+            # isdigit alone would accept characters such as '²', which int cannot convert
+            content_length = headers.get('content-length', '0')
+            if len(parts) != 3 or not (content_length.isascii() and content_length.isdecimal()):
+                await _write_response(writer, 400, {'error': 'Malformed request.'}, False)
+                break
+
+            length = int(content_length)
+            keep_alive = parts[2] == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            if length > MAX_BODY_SIZE:
+                await _write_response(writer, 413, {'error': 'Request body is too large.'}, False)
+                break
+
+            body = await reader.readexactly(length)
+            try:
+                status, response = service.handle(parts[0], parts[1].split('?')[0], body)
+            except Exception:  # a bug in one request should not take down the connection handler
+                status, response = 500, {'error': 'Internal server error.'}
+            await _write_response(writer, status, response, keep_alive)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _write_response(writer: asyncio.StreamWriter, status: int, response: dict, keep_alive: bool) -> None:
+    """Writes an HTTP response with the given status code and JSON body.
+    """
+    body = json.dumps(response).encode('utf-8')
+    head = (f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+
+async def start_server(service: RecommendationService, host: str = '127.0.0.1', port: int = 8000,
+                       **kwargs: Any) -> asyncio.AbstractServer:
+    """Starts serving the service over HTTP, and returns the server (e.g. to find the port it is
+    listening on when port is 0, or to close it). Extra keyword arguments are passed to
+    asyncio.start_server.
+    """
+    return await asyncio.start_server(lambda reader, writer: handle_connection(service, reader, writer),
+                                      host, port, **kwargs)
+
+
+async def serve(data: str, host: str, port: int) -> None:
+    """Loads the restaurant tree from data and serves it over HTTP until interrupted.
+    """
+    t = TreeBuilder(data)
+    service = TreeService(t.load_tree(), t)
+    server = await start_server(service, host, port)
+    print(f'Serving recommendations on http://{host}:{server.sockets[0].getsockname()[1]}')
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    import argparse
+    import doctest
+    doctest.testmod(verbose=True)
+
+    parser = argparse.ArgumentParser(description='Serve restaurant recommendations over HTTP.')
+    parser.add_argument('--data', default='data.csv', help='csv file of the restaurant dataset')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes, sharing one copy of the dataset (requires NumPy)')
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        from shared_index import serve_workers
+        serve_workers(args.data, args.host, args.port, args.workers)
+    else:
+        try:
+            asyncio.run(serve(args.data, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+
+    # import python_ta
+    # python_ta.check_all('server.py', config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['__future__', 'typing', 'asyncio', 'json', 'argparse', 'cache', 'functions',
+    #                       'shared_index'],
+    #     'allowed-io': ['serve']
+    # })
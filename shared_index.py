@@ -0,0 +1,251 @@
+""" CSC111 Project 2: Restaurant Recommendation System
+
+Module Description
+==================
+This module serves recommendations from several worker processes, which share one copy
+of the restaurant dataset.
+
+The parent process loads the dataset once, lays it out as the columns of a ColumnarIndex,
+and copies the columns into a single shared memory block. Each worker attaches to the block
+and uses the columns in place (without copying them), so adding workers does not add another
+copy of the dataset, and a worker does not need to build anything before it starts serving.
+Every worker listens on the same port (with SO_REUSEPORT), and the operating system spreads
+the connections between them.
+
+Run server.py with --workers to start the service this way, e.g. with 4 workers:
+    python server.py --port 8000 --data data.csv --workers 4
+
+This module requires NumPy, and SO_REUSEPORT (available on Linux and BSD/macOS).
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of students
+taking CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC111 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2024 UofT DCS Teaching Team """
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Any, Optional
+
+import numpy as np
+
+from columnar import COLUMNS, ColumnarIndex
+from functions import TreeBuilder
+from server import RecommendationService, start_server
+
+# alignment (in bytes) of each column in the shared memory block
+ALIGNMENT = 64
+
+
+class SharedIndex:
+    """A ColumnarIndex whose columns are stored in a shared memory block.
+
+    A SharedIndex is created by one process, which owns the block, and attached to by the
+    processes it starts (with multiprocessing), using its manifest.
+
+    Instance Attributes:
+        - index: the index, whose columns are views of the shared memory block
+          (None once the block is closed)
+        - manifest: everything a process needs to attach to the block: its name, the cuisine
+          and type names, and the dtype, shape and offset (in bytes) of each column
+
+    >>> shared = SharedIndex.create(ColumnarIndex.from_tree_builder(TreeBuilder('test_data.csv')))
+    >>> attached = SharedIndex.attach(shared.manifest)
+    >>> attached.index.filter_restaurants(2, 20, [{'North Indian'}, 'Takeaway', 'No', 'No'])
+    [7020]
+    >>> attached.close()
+    >>> shared.close()
+    """
+    index: Optional[ColumnarIndex]
+    manifest: dict[str, Any]
+    # Private Instance Attributes:
+    #   - _shm: the shared memory block
+    #   - _owner: whether this process created the block (and so must remove it once it is closed)
+    _shm: shared_memory.SharedMemory
+    _owner: bool
+
+    def __init__(self, shm: shared_memory.SharedMemory, manifest: dict[str, Any], owner: bool) -> None:
+        """Initialize a new SharedIndex for the given shared memory block and its manifest.
+
+        Use SharedIndex.create or SharedIndex.attach instead of calling this directly.
+        """
+        self._shm = shm
+        self._owner = owner
+        self.manifest = manifest
+
+        columns = {}
+        for name, (dtype, shape, offset) in manifest['columns'].items():
+            column = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            column.flags.writeable = False
+            columns[name] = column
+
+        self.index = ColumnarIndex(columns, manifest['cuisine_names'], manifest['type_names'])
+
+    @classmethod
+    def create(cls, index: ColumnarIndex) -> SharedIndex:
+        """Return a new SharedIndex holding a copy of the columns of index, in a new shared memory block.
+        """
+        layout = {}
+        size = 0
+        for name in COLUMNS:
+            column = index.columns[name]
+            size += -size % ALIGNMENT
+            layout[name] = (column.dtype.str, list(column.shape), size)
+            size += column.nbytes
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name in COLUMNS:
+            dtype, shape, offset = layout[name]
+            np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)[...] = index.columns[name]
+
+        manifest = {'name': shm.name, 'cuisine_names': list(index.cuisine_names),
+                    'type_names': list(index.type_names), 'columns': layout}
+        return cls(shm, manifest, True)
+
+    @classmethod
+    def attach(cls, manifest: dict[str, Any]) -> SharedIndex:
+        """Return a SharedIndex using the existing shared memory block described by manifest.
+
+        Preconditions:
+            - manifest is the manifest of a SharedIndex that was created (and not yet closed) by
+              this process or the process that started it
+        """
+        return cls(shared_memory.SharedMemory(name=manifest['name']), manifest, False)
+
+    def size(self) -> int:
+        """Return the size (in bytes) of the shared memory block.
+        """
+        return self._shm.size
+
+    def close(self) -> None:
+        """Stop using the shared memory block, and remove it if this process created it.
+
+        Preconditions:
+            - no other references to the columns of self.index remain
+        """
+        self.index = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+class SharedIndexService(RecommendationService):
+    """A RecommendationService answering queries from a ColumnarIndex instead of a tree.
+
+    Instance Attributes:
+        - index: the index queries are answered from
+
+    >>> service = SharedIndexService(ColumnarIndex.from_tree_builder(TreeBuilder('test_data.csv')))
+    >>> service.handle('GET', '/health', b'')
+    (200, {'status': 'ok', 'restaurants': 7})
+    >>> service.handle('POST', '/recommend', b'{"budget": "20", "num_places": 2, "cuisines": ["North Indian"], '
+    ...                b'"type": "Takeaway", "table_booking": false, "online_order": false}')
+    (200, {'results': [{'name': 'Xpress Kitchen', 'cuisines': 'North Indian, Chinese', \
+'types': 'Takeaway, Delivery', 'rating': '3.3', 'price': '8.0'}]})
+    """
+    index: ColumnarIndex
+
+    def __init__(self, index: ColumnarIndex) -> None:
+        """Initialize a new SharedIndexService for the given index.
+        """
+        super().__init__()
+        self.index = index
+
+    def count_restaurants(self) -> int:
+        """Returns the number of restaurants that can be recommended.
+        """
+        return len(self.index)
+
+    def get_all_cuisines(self) -> list[str]:
+        """Returns every cuisine, in alphabetical order.
+        """
+        return self.index.get_all_cuisines()
+
+    def get_all_types(self) -> list[str]:
+        """Returns every restaurant type, in alphabetical order.
+        """
+        return self.index.get_all_types()
+
+    def query(self, num_places: int, max_budget: int, user_input: list) -> Optional[list[tuple]]:
+        """Returns the information of the recommended restaurants (in the same format as
+        Tree.get_restaurant_info), or None if there are no matches.
+
+        Preconditions:
+            - the preconditions of Tree.filter_restaurants hold
+        """
+        indices = self.index.filter_restaurants(num_places, max_budget, user_input)
+        return None if indices is None else self.index.get_restaurant_info(indices)
+
+
+def serve_workers(data: str, host: str, port: int, workers: int) -> None:
+    """Loads the restaurant dataset from data into shared memory, and serves it over HTTP from
+    the given number of worker processes until interrupted.
+
+    Preconditions:
+        - workers >= 1
+        - port != 0
+    """
+    t = TreeBuilder(data)
+    t.load_tree()
+    shared = SharedIndex.create(ColumnarIndex.from_tree_builder(t))
+    del t  # the tree is not needed once the index is in shared memory
+
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_run_worker, args=(shared.manifest, host, port), daemon=True)
+                 for _ in range(workers)]
+    try:
+        for process in processes:
+            process.start()
+        print(f'Serving recommendations on http://{host}:{port} with {workers} workers '
+              f'({shared.size()} bytes of shared memory)')
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+        shared.close()
+
+
+def _run_worker(manifest: dict[str, Any], host: str, port: int) -> None:
+    """Attaches to the shared index described by manifest and serves it over HTTP until interrupted.
+    """
+    shared = SharedIndex.attach(manifest)
+    try:
+        asyncio.run(_serve(shared.index, host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shared.close()
+
+
+async def _serve(index: ColumnarIndex, host: str, port: int) -> None:
+    """Serves the given index over HTTP until interrupted, sharing the port with the other workers.
+    """
+    server = await start_server(SharedIndexService(index), host, port, reuse_port=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    # python_ta.check_all('shared_index.py', config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['__future__', 'typing', 'asyncio', 'multiprocessing', 'multiprocessing.shared_memory',
+    #                       'numpy', 'columnar', 'functions', 'server'],
+    #     'allowed-io': ['serve_workers']
+    # })
@@ -0,0 +1,412 @@
+""" CSC111 Project 2: Restaurant Recommendation System
+
+Module Description
+==================
+This module contains the SimilarityIndex class, which recommends places like a given restaurant:
+the restaurants most similar to it, from a list of neighbours found for every restaurant in advance.
+
+Restaurants are compared by their cuisines and types (the share of either that they have in common,
+or their Jaccard index), their prices (on a log scale, since a difference of 10 matters more between
+cheap places than expensive ones) and their ratings. The restaurants are laid out as NumPy arrays, so
+each restaurant is compared with every other one at once, and the neighbours of different blocks of
+restaurants can be found in separate processes.
+
+The neighbours are saved to a file next to the csv file (like the snapshot of the tree), so they are
+only found again when the csv file changes.
+
+This module requires NumPy, which is not needed by the rest of the program.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of students
+taking CSC111 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited. For more information on copyright for CSC111 materials,
+please consult our Course Syllabus.
+
+This file is Copyright (c) 2024 UofT DCS Teaching Team """
+
+from __future__ import annotations
+
+import os
+import zipfile
+from typing import Optional
+
+import numpy as np
+
+from functions import Restaurant, TreeBuilder, rank_key
+
+# how much each attribute counts towards the similarity of two restaurants (adding up to 1)
+CUISINE_WEIGHT = 0.5
+TYPE_WEIGHT = 0.2
+PRICE_WEIGHT = 0.2
+RATING_WEIGHT = 0.1
+
+# number of neighbours found for each restaurant, by default
+DEFAULT_NUM_NEIGHBOURS = 50
+
+# number of restaurants whose neighbours are found at a time (by one process)
+BLOCK_SIZE = 512
+
+# identifies the neighbours file, and is increased whenever its format changes
+NEIGHBOURS_VERSION = 1
+
+# the features of the restaurants, in each process finding neighbours (set by _init_worker)
+_FEATURES = None
+
+
+class Features:
+    """The attributes of a list of restaurants used to compare them, as NumPy arrays with one row per restaurant.
+
+    Representation Invariants:
+        - all(len(array) == len(self.cuisines) for array in
+              [self.cuisine_counts, self.types, self.type_counts, self.prices, self.ratings, self.names])
+
+    Instance Attributes:
+        - cuisines: whether each restaurant has each cuisine (by its code), as 0 or 1
+        - cuisine_counts: the number of cuisines of each restaurant
+        - types: whether each restaurant has each type (by its code), as 0 or 1
+        - type_counts: the number of types of each restaurant
+        - prices: the price of each restaurant, on a log scale between 0 and 1
+        - ratings: the rating of each restaurant, between 0 and 1
+        - names: a code for the name of each restaurant, the same for restaurants with the same name
+
+    >>> t = TreeBuilder('test_data.csv')
+    >>> features = Features(sorted(t.get_restaurants(), key=rank_key))
+    >>> len(features)
+    7
+    >>> float(features.similarity(0, 1)[0, 0])  # every restaurant is as similar as can be to itself
+    1.0
+    """
+    cuisines: np.ndarray
+    cuisine_counts: np.ndarray
+    types: np.ndarray
+    type_counts: np.ndarray
+    prices: np.ndarray
+    ratings: np.ndarray
+    names: np.ndarray
+
+    def __init__(self, restaurants: list[Restaurant]) -> None:
+        """Initialize the features of restaurants.
+
+        Preconditions:
+            - restaurants != []
+        """
+        self.cuisines = _multi_hot([restaurant.cuisines for restaurant in restaurants])
+        self.cuisine_counts = self.cuisines.sum(axis=1)
+        self.types = _multi_hot([restaurant.types for restaurant in restaurants])
+        self.type_counts = self.types.sum(axis=1)
+        self.prices = _scale(np.log1p(np.array([restaurant.price for restaurant in restaurants], dtype=np.float32)))
+        self.ratings = _scale(np.array([restaurant.rating for restaurant in restaurants], dtype=np.float32))
+        name_codes = {}
+        self.names = np.array([name_codes.setdefault(restaurant.name, len(name_codes))
+                               for restaurant in restaurants], dtype=np.int32)
+
+    def __len__(self) -> int:
+        """Return the number of restaurants.
+        """
+        return len(self.names)
+
+    def similarity(self, start: int, end: int) -> np.ndarray:
+        """Returns the similarity (between 0 and 1) of each restaurant from start to end with every restaurant,
+        with one row for each restaurant from start to end.
+        """
+        # every term is computed in place, in single precision, since these arrays are the largest
+        # ones the program makes (and most of the time is spent allocating and filling them)
+        scores = _jaccard(self.cuisines[start:end], self.cuisine_counts[start:end], self.cuisines, self.cuisine_counts)
+        scores *= CUISINE_WEIGHT
+        types = _jaccard(self.types[start:end], self.type_counts[start:end], self.types, self.type_counts)
+        types *= TYPE_WEIGHT
+        scores += types
+        scores += PRICE_WEIGHT + RATING_WEIGHT
+        for values, weight in ((self.prices, PRICE_WEIGHT), (self.ratings, RATING_WEIGHT)):
+            weighted = values * np.float32(weight)
+            np.subtract(weighted[start:end, None], weighted, out=types)
+            np.abs(types, out=types)
+            scores -= types
+        return scores
+
+    def neighbours(self, start: int, end: int, num_neighbours: int) -> np.ndarray:
+        """Returns the (at most) num_neighbours most similar restaurants to each restaurant from start to end,
+        most similar first, with ties going to the earlier restaurant. Restaurants are never neighbours of
+        themselves, or of restaurants with the same name (another branch of the same chain).
+
+        Each row holds the positions of the neighbours of one restaurant, followed by -1 if it has fewer than
+        num_neighbours of them.
+        """
+        scores = self.similarity(start, end)
+        scores[self.names[start:end, None] == self.names] = -np.inf
+
+        found = np.full((end - start, num_neighbours), -1, dtype=np.int32)
+        if num_neighbours >= len(self):
+            order = np.argsort(-scores, axis=1, kind='stable')
+            for row in range(end - start):
+                candidates = order[row][scores[row, order[row]] > -np.inf]
+                found[row, :len(candidates)] = candidates[:num_neighbours]
+            return found
+
+        # the score of the num_neighbours-th neighbour of each restaurant; every restaurant with a
+        # higher score is a neighbour, and the first ones with the same score fill the other places
+        kth = -np.partition(-scores, num_neighbours - 1, axis=1)[:, num_neighbours - 1]
+        for row in range(end - start):
+            candidates = np.nonzero(scores[row] >= kth[row])[0]
+            candidates = candidates[np.argsort(-scores[row, candidates], kind='stable')][:num_neighbours]
+            candidates = candidates[scores[row, candidates] > -np.inf]
+            found[row, :len(candidates)] = candidates
+        return found
+
+
+class SimilarityIndex:
+    """The neighbours of every restaurant of a tree builder (its most similar restaurants), for
+    recommending places like a given one.
+
+    Finding the neighbours compares every pair of restaurants, so it takes time quadratic in the number
+    of restaurants; with workers > 1, the restaurants are split into blocks, whose neighbours are found by
+    separate processes. Once found, the neighbours of a restaurant are looked up directly, so similar_to
+    only reads the num_neighbours neighbours of the restaurant.
+
+    The neighbours are found again whenever the tree builder's version changes (the tree was rebuilt, or
+    a restaurant was added, updated or deleted).
+
+    Representation Invariants:
+        - self.num_neighbours >= 1
+        - self.workers >= 1
+        - len(self._restaurants) == len(self._neighbours)
+
+    Instance Attributes:
+        - t: tree builder of the restaurants
+        - num_neighbours: the number of neighbours found for each restaurant
+        - workers: the number of processes finding the neighbours
+
+    >>> t = TreeBuilder('test_data.csv')
+    >>> index = SimilarityIndex(t)
+    >>> t.get_info(7020)[2], t.get_info(7020)[5], t.get_info(7020)[6]
+    ('Xpress Kitchen', 'Takeaway, Delivery', 'North Indian, Chinese')
+    >>> [t.get_info(i)[2] for i in index.similar_to(7020, 2)]
+    ['Sardar Tikka Singh', 'Behrouz Biryani']
+    >>> [(t.get_info(i)[2], t.get_info(i)[0]) for i in index.similar_to(7020, 2, budget=9)]
+    [('Sardar Tikka Singh', '8.0'), ('Krispy Kreme', '4.8')]
+    """
+    t: TreeBuilder
+    num_neighbours: int
+    workers: int
+    # Private Instance Attributes:
+    #   - _restaurants: every restaurant of the tree builder, best rated first (see rank_key), so that
+    #                   ties in similarity go to the better rated restaurant. A restaurant's position in
+    #                   this list identifies it in the index.
+    #   - _positions: maps the original index of each restaurant to its position
+    #   - _neighbours: the positions of the neighbours of each restaurant, most similar first
+    #   - _version: the version of the tree builder when the neighbours were last found
+    _restaurants: list[Restaurant]
+    _positions: dict[int, int]
+    _neighbours: list[list[int]]
+    _version: int
+
+    def __init__(self, t: TreeBuilder, num_neighbours: int = DEFAULT_NUM_NEIGHBOURS,
+                 workers: Optional[int] = None) -> None:
+        """Initialize a new SimilarityIndex of the restaurants of t (whose neighbours are only found by the
+        first query).
+
+        If workers is None, the neighbours are found by one process per CPU.
+
+        Preconditions:
+            - num_neighbours >= 1
+            - workers is None or workers >= 1
+        """
+        self.t = t
+        self.num_neighbours = num_neighbours
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self._restaurants = []
+        self._positions = {}
+        self._neighbours = []
+        self._version = -1
+
+    def build(self) -> None:
+        """Finds the neighbours of every restaurant of the tree builder.
+        """
+        self._set_restaurants()
+        if not self._restaurants:
+            self._neighbours = []
+            return
+
+        features = Features(self._restaurants)
+        starts = range(0, len(features), BLOCK_SIZE)
+        ends = [min(start + BLOCK_SIZE, len(features)) for start in starts]
+        if self.workers > 1 and len(starts) > 1:
+            # imported here, since only parallel builds need it and importing it slows down every startup
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(features,)) as executor:
+                blocks = list(executor.map(_find_neighbours, starts, ends, [self.num_neighbours] * len(ends)))
+        else:
+            blocks = [features.neighbours(start, end, self.num_neighbours) for start, end in zip(starts, ends)]
+
+        self._set_neighbours(np.concatenate(blocks))
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Saves the neighbours to the file path, along with the size, modification time and hash of the
+        csv file they were found from.
+
+        If path is None, the file is the csv file name followed by '.neighbours'.
+        """
+        if self._version != self.t.version:
+            self.build()
+        if path is None:
+            path = self.t.data + '.neighbours'
+
+        size, modified, sha = self.t.source_signature()
+        neighbours = np.full((len(self._neighbours), self.num_neighbours), -1, dtype=np.int32)
+        for position, found in enumerate(self._neighbours):
+            neighbours[position, :len(found)] = found
+
+        # write to a temporary file first, so a crash never leaves a partial file behind
+        temp = path + '.tmp'
+        with open(temp, 'wb') as file:
+            np.savez(file, version=np.array(NEIGHBOURS_VERSION), source=np.array([size, modified]),
+                     sha=np.array(sha), og_indices=np.array([r.og_index for r in self._restaurants], dtype=np.int64),
+                     neighbours=neighbours)
+        os.replace(temp, path)
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """Loads the neighbours from the file path, and returns whether they were loaded: they are not if the
+        file does not exist or cannot be read, was written by a different version of this program or with a
+        different number of neighbours, or the csv file has changed since.
+
+        If path is None, the file is the csv file name followed by '.neighbours'.
+        """
+        if path is None:
+            path = self.t.data + '.neighbours'
+        if not os.path.exists(path):
+            return False
+
+        # a truncated or garbled file is not loaded, so the neighbours are found again
+        try:
+            with np.load(path, allow_pickle=False) as contents:
+                neighbours = contents['neighbours']
+                if int(contents['version']) != NEIGHBOURS_VERSION or neighbours.ndim != 2 \
+                        or neighbours.shape[1] != self.num_neighbours:
+                    return False
+                size, modified, sha = self.t.source_signature()
+                if contents['source'].tolist() != [size, modified] or str(contents['sha']) != sha:
+                    return False
+                og_indices = contents['og_indices'].tolist()
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            return False
+
+        self._set_restaurants()
+        if og_indices != [restaurant.og_index for restaurant in self._restaurants] \
+                or len(neighbours) != len(og_indices) or neighbours.max(initial=-1) >= len(og_indices):
+            return False
+
+        self._set_neighbours(neighbours)
+        return True
+
+    def load_or_build(self, path: Optional[str] = None) -> None:
+        """Loads the neighbours from the file path if it is up to date with the csv file. Otherwise, the
+        neighbours are found and saved to the file for the next time.
+
+        If path is None, the file is the csv file name followed by '.neighbours'.
+        """
+        if not self.load(path):
+            self.build()
+            self.save(path)
+
+    def similar_to(self, og_index: int, k: int, budget: Optional[float] = None) -> list[int]:
+        """Returns the original indices of the (at most k) restaurants most similar to the restaurant with
+        original index og_index, most similar first, leaving out restaurants whose price is over budget
+        (if it is given).
+
+        Only the neighbours of the restaurant are read, so fewer than k restaurants are returned if fewer
+        than k of its neighbours are within budget.
+
+        Preconditions:
+            - og_index is the original index of a restaurant in the tree
+            - 0 <= k <= self.num_neighbours
+        """
+        if self._version != self.t.version:
+            self.build()
+
+        found = []
+        for position in self._neighbours[self._positions[og_index]]:
+            if len(found) == k:
+                break
+            restaurant = self._restaurants[position]
+            if budget is None or restaurant.price <= budget:
+                found.append(restaurant.og_index)
+
+        return found
+
+    def _set_restaurants(self) -> None:
+        """ Sets the restaurants of the index from the tree builder.
+        """
+        self._restaurants = sorted(self.t.get_restaurants(), key=rank_key)
+        self._positions = {restaurant.og_index: position for position, restaurant in enumerate(self._restaurants)}
+        self._version = self.t.version
+
+    def _set_neighbours(self, neighbours: np.ndarray) -> None:
+        """ Sets the neighbours of the index from an array with one row per restaurant, as returned by
+        Features.neighbours.
+        """
+        self._neighbours = [[position for position in row if position >= 0] for row in neighbours.tolist()]
+
+
+def _multi_hot(codes: list[tuple[int, ...]]) -> np.ndarray:
+    """ Returns an array with a row for each tuple of codes, holding 1 in the column of each of its codes
+    and 0 elsewhere.
+
+    >>> _multi_hot([(0, 2), (1,)])
+    array([[1., 0., 1.],
+           [0., 1., 0.]], dtype=float32)
+    """
+    array = np.zeros((len(codes), max(code for row in codes for code in row) + 1), dtype=np.float32)
+    for row, row_codes in enumerate(codes):
+        array[row, list(row_codes)] = 1
+    return array
+
+
+def _scale(values: np.ndarray) -> np.ndarray:
+    """ Returns values scaled linearly to be between 0 and 1 (or all 0 if they are all the same).
+    """
+    low, high = values.min(), values.max()
+    return (values - low) / (high - low) if high > low else np.zeros_like(values)
+
+
+def _jaccard(rows: np.ndarray, row_counts: np.ndarray, columns: np.ndarray, column_counts: np.ndarray) -> np.ndarray:
+    """ Returns the Jaccard index of each multi-hot row in rows with each in columns (the number of codes
+    they share, divided by the number of codes in either), given the number of codes of each.
+    """
+    shared = rows @ columns.T
+    union = np.add(row_counts[:, None], column_counts)
+    union -= shared
+    np.maximum(union, 1, out=union)
+    shared /= union
+    return shared
+
+
+def _init_worker(features: Features) -> None:
+    """ Sets the features used by _find_neighbours in this process, when it is started.
+    """
+    global _FEATURES
+    _FEATURES = features
+
+
+def _find_neighbours(start: int, end: int, num_neighbours: int) -> np.ndarray:
+    """ Returns the result of Features.neighbours for the features of this process.
+
+    This is a module-level function so that it can be run in a separate process.
+    """
+    return _FEATURES.neighbours(start, end, num_neighbours)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    # import python_ta
+    # python_ta.check_all('similarity.py', config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['__future__', 'typing', 'os', 'zipfile', 'numpy', 'concurrent.futures', 'functions'],
+    #     'allowed-io': ['SimilarityIndex.save'],
+    #     'disable': ['global-statement']
+    # })
@@ -5,6 +5,10 @@ Module Description
 This module contains RestaurantSelector class which uses tkinter to display
 the user interface to choose preferences for restaurants.
 
+Loading the dataset and searching it run on a background thread, so the window stays
+responsive. The background thread never touches tkinter: it hands each result back to the
+tkinter thread through a queue, which the tkinter thread checks every POLL_INTERVAL milliseconds.
+
 Copyright and Usage Information
 ===============================
 
@@ -16,9 +20,23 @@ please consult our Course Syllabus.
 
 This file is Copyright (c) 2024 UofT DCS Teaching Team """
 
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
-from functions import Tree, TreeBuilder
+from typing import Any, Callable, Optional
+from functions import Tree, TreeBuilder, ResultCursor, validate_preferences
+from cache import QueryCache
+from autocomplete import AutocompleteIndex
+
+# number of milliseconds between checks for results from the background thread
+POLL_INTERVAL = 50
+
+# largest number of cuisines shown in the list below the cuisine entry
+MAX_SUGGESTIONS = 100
+
+# number of restaurants shown on each page of the explore results
+PAGE_SIZE = 25
 
 
 class RestaurantSelector:
@@ -26,13 +44,16 @@ class RestaurantSelector:
     recommendations (using tkinter)
 
     Representation Invariants:
-        - self.tree._root == 'root'
+        - self.tree is None or self.tree._root == 'root'
+        - (self.tree is None) == (self.cache is None)
 
     Instance Attributes:
         - master: master for user interface display, using tkinter
-        - tree: tree representing dataset of restaurants
+        - tree: tree representing dataset of restaurants, or None until it has loaded
         - t: tree builder to access certain methods with the tree
+        - cache: cache of recent query results from the tree, or None until the tree has loaded
         - cuisine_list: list of all cuisines in dataset
+        - cuisine_index: index of cuisine_list, to find the cuisines matching what the user types
         - types_list: list of all restaurant types in dataset
         - budget: user input for total maximum budget
         - num_places: user input for number of places they want to go
@@ -42,9 +63,11 @@ class RestaurantSelector:
         - table_booking: user input for whether they want table booking
     """
     master: tk.Tk
-    tree: Tree
+    tree: Optional[Tree]
     t: TreeBuilder
+    cache: Optional[QueryCache]
     cuisine_list: list[str]
+    cuisine_index: AutocompleteIndex
     types_list: list[str]
     budget: tk.StringVar
     num_places: tk.IntVar
@@ -54,21 +77,41 @@ class RestaurantSelector:
     table_booking: tk.BooleanVar
     cuisine_listbox: tk.Listbox
     cuisines_label: tk.Label
-
-    def __init__(self, master: tk.Tk, tree: Tree, t: TreeBuilder) -> None:
-        """Initialize a new RestaurantSelector with the given master (tkinter),
-        tree dataset, and tree builder.
-
-        Calls display_input() to create the window for the initial user interface.
+    restaurant_combobox: ttk.Combobox
+    submit_button: ttk.Button
+    explore_button: ttk.Button
+    cancel_button: ttk.Button
+    progress_bar: ttk.Progressbar
+    status_label: ttk.Label
+    # Private Instance Attributes:
+    #   - _jobs: tasks waiting for the background thread, with the generation they were started in
+    #            and the function to call with their result
+    #   - _calls: functions (and their arguments) the background thread wants called on the tkinter thread
+    #   - _generation: increased whenever a task is cancelled, so results of older generations are ignored
+    #   - _shown_cuisines: the cuisines currently shown in cuisine_listbox, in order
+    _jobs: queue.Queue
+    _calls: queue.Queue
+    _generation: int
+    _shown_cuisines: list[str]
+
+    def __init__(self, master: tk.Tk, t: TreeBuilder, tree: Optional[Tree] = None) -> None:
+        """Initialize a new RestaurantSelector with the given master (tkinter), tree builder,
+        and tree dataset.
+
+        Calls display_input() to create the window for the initial user interface. If tree is None,
+        the tree is loaded by t in the background while the window is shown.
         """
         self.master = master
         self.master.title("Restaurant Selector")
-        self.master.geometry("500x500")
+        self.master.geometry("500x560")
 
-        self.tree = tree
+        self.tree = None
         self.t = t
-        self.cuisine_list = tree.get_all_cuisines()
-        self.types_list = tree.get_all_types()
+        self.cache = None
+        self.cuisine_list = []
+        self.cuisine_index = AutocompleteIndex([])
+        self.types_list = []
+        self._shown_cuisines = []
 
         # variables for user input
         self.budget = tk.StringVar()
@@ -78,7 +121,19 @@ class RestaurantSelector:
         self.online_order = tk.BooleanVar()
         self.table_booking = tk.BooleanVar()
 
+        self._jobs = queue.Queue()
+        self._calls = queue.Queue()
+        self._generation = 0
+        threading.Thread(target=self._work, daemon=True).start()
+
         self.display_input()
+        self._poll()
+
+        if tree is None:
+            self.set_status("Loading restaurants...", busy=True)
+            self.run_in_background(lambda: t.load_tree(progress=self._report_progress), self.finish_loading)
+        else:
+            self.finish_loading(tree)
 
     def display_input(self) -> None:
         """Uses the tkinter library to create and display a window showing all
@@ -126,9 +181,9 @@ class RestaurantSelector:
         restaurant_frame = ttk.Frame(self.master)
         restaurant_frame.pack(pady=10)
         ttk.Label(restaurant_frame, text="Select restaurant type:").grid(row=0, column=0)
-        restaurant_combobox = ttk.Combobox(restaurant_frame, textvariable=self.restaurant_type,
-                                           values=self.types_list, state="readonly")
-        restaurant_combobox.grid(row=0, column=1)
+        self.restaurant_combobox = ttk.Combobox(restaurant_frame, textvariable=self.restaurant_type,
+                                                values=self.types_list, state="readonly")
+        self.restaurant_combobox.grid(row=0, column=1)
 
         # online ordering selection
         online_order_frame = ttk.Frame(self.master)
@@ -140,28 +195,48 @@ class RestaurantSelector:
         table_booking_frame.pack(pady=10)
         ttk.Checkbutton(table_booking_frame, text="Table Booking", variable=self.table_booking).grid(row=0, column=0)
 
-        # submit
-        ttk.Button(self.master, text="Submit", command=self.submit).pack(pady=10)
+        # submit and cancel
+        button_frame = ttk.Frame(self.master)
+        button_frame.pack(pady=10)
+        self.submit_button = ttk.Button(button_frame, text="Submit", command=self.submit)
+        self.submit_button.grid(row=0, column=0)
+        self.explore_button = ttk.Button(button_frame, text="Explore All", command=self.explore)
+        self.explore_button.grid(row=0, column=1)
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel, state="disabled")
+        self.cancel_button.grid(row=0, column=2)
+
+        # progress of loading and searching
+        status_frame = ttk.Frame(self.master)
+        status_frame.pack(pady=10)
+        self.progress_bar = ttk.Progressbar(status_frame, length=300, maximum=1.0)
+        self.progress_bar.grid(row=0, column=0)
+        self.status_label = ttk.Label(status_frame, text="")
+        self.status_label.grid(row=1, column=0)
 
     def check_key(self, cuisine_entry: ttk.Entry) -> None:
-        """Adds cuisine_entry to the displayed list of cuisines chosen.
+        """Displays the cuisines matching cuisine_entry (at most MAX_SUGGESTIONS, best match first).
         """
-        value = cuisine_entry.get().strip()
-        data = []
-        if value:
-            for item in self.cuisine_list:
-                if value.lower() in item.lower():
-                    data.append(item)
-        else:
-            data = self.cuisine_list
-        self.update(data)
+        self.update(self.cuisine_index.search(cuisine_entry.get(), MAX_SUGGESTIONS))
 
     def update(self, data: list[str]) -> None:
         """Updates the displayed list of cuisines with the provided data
+
+        Only the rows that changed are deleted and inserted: the rows at the start and the end
+        that are the same as before are kept.
         """
-        self.cuisine_listbox.delete(0, 'end')
-        for item in data:
-            self.cuisine_listbox.insert('end', item)
+        old = self._shown_cuisines
+        start = 0
+        while start < len(old) and start < len(data) and old[start] == data[start]:
+            start += 1
+        end = 0
+        while end < len(old) - start and end < len(data) - start and old[-1 - end] == data[-1 - end]:
+            end += 1
+
+        if start < len(old) - end:
+            self.cuisine_listbox.delete(start, len(old) - end - 1)
+        if start < len(data) - end:
+            self.cuisine_listbox.insert(start, *data[start:len(data) - end])
+        self._shown_cuisines = list(data)
 
     def add_cuisine(self) -> None:
         """Add the selected cuisine from the listbox to the list of selected cuisines.
@@ -193,22 +268,10 @@ class RestaurantSelector:
 
         Displays error message showing error if there is any.
         """
-        # required fields are empty
-        if self.budget.get().strip() == '' or not self.cuisines or self.restaurant_type.get().strip() == '':
-            messagebox.showerror("Error", "Please fill out all the required fields.", parent=self.master)
-            return False
-        # budget is not an integer
-        elif not self.budget.get().isdigit():
-            messagebox.showerror("Error", "Budget must be an integer.", parent=self.master)
-            return False
-        # 0 number of places chosen to go
-        elif self.num_places.get() == 0:
-            messagebox.showerror("Error", "Please choose 1-10 number of places to go.", parent=self.master)
-            return False
-        # too many cuisines chosen
-        elif len(self.cuisines) > self.num_places.get():
-            messagebox.showerror("Error", f"Too many cuisines chosen, please only choose up to "
-                                          f"{self.num_places.get()} cuisine(s)", parent=self.master)
+        error = validate_preferences(self.budget.get(), self.num_places.get(), self.cuisines,
+                                     self.restaurant_type.get())
+        if error is not None:
+            messagebox.showerror("Error", error, parent=self.master)
             return False
 
         return True
@@ -243,28 +306,217 @@ class RestaurantSelector:
         treeview.pack(expand=True, fill="both")
 
     def submit(self) -> None:
-        """Checks if user input is valid, then calls the filter_restaurants() function to find
-        matching restaurant recommendations based on the user input.
+        """Checks if user input is valid, then calls the filter_restaurants() function (in the
+        background) to find matching restaurant recommendations based on the user input.
+
+        The results are shown by show_results() once the search is done.
+        """
+        if self.cache is not None and self.validate_input():
+            cache = self.cache
+            budget, num_places, user_input = self.get_query()
+            self.set_status("Searching...", busy=True)
+            self.cancel_button.config(state="normal")
+            self.run_in_background(lambda: cache.recommend(num_places, budget, user_input), self.show_results)
+
+    def explore(self) -> None:
+        """Checks if user input is valid, then finds (in the background) every restaurant within the
+        budget for each place that has any of the chosen cuisines.
+
+        The results are shown a page at a time by a ResultsView once the search is done.
+        """
+        if self.tree is not None and self.validate_input():
+            tree = self.tree
+            budget, num_places, user_input = self.get_query()
+            self.set_status("Searching...", busy=True)
+            self.cancel_button.config(state="normal")
+            self.run_in_background(lambda: tree.explore_restaurants(num_places, budget, user_input),
+                                   self.show_cursor)
+
+    def get_query(self) -> tuple[int, int, list]:
+        """Returns the budget, number of places and the rest of the user input, in the form taken
+        by Tree.filter_restaurants.
 
-        If there are matching results, it displays it using display_results() to the user. If not,
+        Preconditions:
+            - self.validate_input()
+        """
+        return int(self.budget.get()), self.num_places.get(), [set(self.cuisines), self.restaurant_type.get(),
+                                                               'Yes' if self.table_booking.get() else 'No',
+                                                               'Yes' if self.online_order.get() else 'No']
+
+    def show_cursor(self, cursor: ResultCursor) -> None:
+        """Shows the restaurants of cursor a page at a time, or a message box if there are none.
+        """
+        self.set_status(f"Found {len(cursor)} restaurants.")
+        if len(cursor) > 0:
+            ResultsView(tk.Toplevel(), cursor, self.t)
+        else:
+            messagebox.showinfo("Restaurants", 'Sorry, there were no matching restaurants')
+
+    def show_results(self, results: Optional[list[tuple]]) -> None:
+        """If there are matching results, it displays it using display_results() to the user. If not,
         it shows a message box telling the user that there are no matches.
         """
-        if self.validate_input():
-            # retrieve and process user input
-            budget = int(self.budget.get())
-            num_places = self.num_places.get()
-            restaurant_type = self.restaurant_type.get()
-            online_order = self.online_order.get()
-            table_booking = self.table_booking.get()
-
-            results = self.tree.filter_restaurants(num_places, budget, [set(self.cuisines), restaurant_type,
-                                                                        'Yes' if table_booking else 'No',
-                                                                        'Yes' if online_order else 'No'])
-
-            if results:
-                self.display_results(self.tree.get_restaurant_info(results, self.t))
+        self.set_status("")
+        if results:
+            self.display_results(results)
+        else:
+            messagebox.showinfo("Restaurants", 'Sorry, there were no matching restaurants')
+
+    def cancel(self) -> None:
+        """Cancels the search in progress: its results will not be shown.
+        """
+        self._generation += 1
+        self.set_status("Search cancelled.")
+
+    def finish_loading(self, tree: Tree) -> None:
+        """Starts using the given (newly loaded) tree, and lets the user search it.
+        """
+        self.tree = tree
+        self.cache = QueryCache(tree, self.t)
+        self.cuisine_list = tree.get_all_cuisines()
+        self.cuisine_index = AutocompleteIndex(self.cuisine_list)
+        self.types_list = tree.get_all_types()
+        self.restaurant_combobox.config(values=self.types_list)
+        self.set_status(f"Loaded {len(self.t.get_indices())} restaurants.")
+
+    def set_status(self, text: str, busy: bool = False) -> None:
+        """Shows text below the progress bar. While busy, the user cannot submit another search.
+        """
+        self.status_label.config(text=text)
+        self.progress_bar.config(value=0.0 if busy else self.progress_bar.cget('maximum'))
+        self.submit_button.config(state="disabled" if busy else "normal")
+        self.explore_button.config(state="disabled" if busy else "normal")
+        if not busy:
+            self.cancel_button.config(state="disabled")
+
+    def run_in_background(self, task: Callable[[], Any], on_done: Callable[[Any], Any]) -> None:
+        """Runs task on the background thread (after any tasks already waiting), then calls on_done with its
+        result on the tkinter thread, unless the task is cancelled first.
+
+        If task raises an error, the error is shown to the user instead.
+        """
+        self._jobs.put((self._generation, task, on_done))
+
+    def _work(self) -> None:
+        """Runs the tasks given to run_in_background, one at a time, forever. This runs on the
+        background thread, so it must not use tkinter.
+        """
+        while True:
+            generation, task, on_done = self._jobs.get()
+            if generation != self._generation:
+                continue  # cancelled before it started
+
+            try:
+                result = task()
+            except Exception as error:  # shown to the user, instead of stopping the background thread
+                self._calls.put((self._finish_task, (generation, self._show_error, error)))
             else:
-                messagebox.showinfo("Restaurants", 'Sorry, there were no matching restaurants')
+                self._calls.put((self._finish_task, (generation, on_done, result)))
+
+    def _report_progress(self, fraction: float) -> None:
+        """Shows the fraction of the dataset loaded so far. This is called on the background thread.
+        """
+        self._calls.put((self.progress_bar.config, ({'value': fraction},)))
+
+    def _finish_task(self, generation: int, on_done: Callable[[Any], Any], result: Any) -> None:
+        """Calls on_done with result, unless the task it came from was cancelled.
+        """
+        if generation == self._generation:
+            on_done(result)
+
+    def _show_error(self, error: Exception) -> None:
+        """Tells the user that a background task failed with the given error.
+        """
+        self.set_status("")
+        messagebox.showerror("Error", str(error), parent=self.master)
+
+    def _poll(self) -> None:
+        """Makes the calls requested by the background thread, then checks again after POLL_INTERVAL
+        milliseconds.
+        """
+        try:
+            while True:
+                function, args = self._calls.get_nowait()
+                function(*args)
+        except queue.Empty:
+            pass
+
+        self.master.after(POLL_INTERVAL, self._poll)
+
+
+class ResultsView:
+    """A window showing the restaurants of a ResultCursor one page at a time.
+
+    Only the restaurants on the current page are looked up and added to the table. Clicking the
+    Rating or Average Price heading sorts every restaurant by it (clicking again reverses the order),
+    without repeating the query.
+
+    Instance Attributes:
+        - master: window the results are shown in
+        - cursor: the restaurants to show
+        - t: tree builder of the tree the cursor came from, to look up the restaurants
+        - page: the page currently shown (counting from 0)
+        - treeview: table of the restaurants on the current page
+        - page_label: label showing the current page and the number of pages
+    """
+    master: tk.Toplevel
+    cursor: ResultCursor
+    t: TreeBuilder
+    page: int
+    treeview: ttk.Treeview
+    page_label: ttk.Label
+
+    def __init__(self, master: tk.Toplevel, cursor: ResultCursor, t: TreeBuilder) -> None:
+        """Initialize a new ResultsView in master, and show the first page of cursor.
+        """
+        self.master = master
+        self.master.title(f"Results ({len(cursor)} restaurants)")
+        self.cursor = cursor
+        self.t = t
+        self.page = 0
+
+        # create treeview widget, the same as RestaurantSelector.display_results
+        self.treeview = ttk.Treeview(master, height=PAGE_SIZE)
+        self.treeview["columns"] = ("Cuisine", "Type", "Rating", "Average Price")
+        self.treeview.heading("#0", text="Restaurant Name")
+        self.treeview.heading("Cuisine", text="Cuisine")
+        self.treeview.heading("Type", text="Type")
+        self.treeview.heading("Rating", text="Rating", command=lambda: self.sort('rating'))
+        self.treeview.heading("Average Price", text="Average Price", command=lambda: self.sort('price'))
+        self.treeview.column("Rating", anchor="w", width=75)
+        self.treeview.column("Average Price", anchor="w", width=75)
+        self.treeview.pack(expand=True, fill="both")
+
+        # page controls
+        page_frame = ttk.Frame(master)
+        page_frame.pack(pady=5)
+        ttk.Button(page_frame, text="< Previous", command=lambda: self.show_page(self.page - 1)).grid(row=0, column=0)
+        self.page_label = ttk.Label(page_frame, text="")
+        self.page_label.grid(row=0, column=1, padx=10)
+        ttk.Button(page_frame, text="Next >", command=lambda: self.show_page(self.page + 1)).grid(row=0, column=2)
+
+        self.show_page(0)
+
+    def show_page(self, page: int) -> None:
+        """Replaces the rows of the table with the restaurants on the given page, if it exists.
+        """
+        num_pages = self.cursor.num_pages(PAGE_SIZE)
+        if not 0 <= page < num_pages:
+            return
+
+        self.page = page
+        self.treeview.delete(*self.treeview.get_children())
+        for data in self.cursor.get_page(page, PAGE_SIZE, self.t):
+            self.treeview.insert("", "end", text=data[0], values=data[1:])
+        self.page_label.config(text=f"Page {page + 1} of {num_pages}")
+
+    def sort(self, sorted_by: str) -> None:
+        """Sorts the restaurants by rating or price (reversing the order if they already are),
+        and shows the first page.
+        """
+        reverse = self.cursor.sorted_by == sorted_by and not self.cursor.reverse
+        self.cursor.sort(sorted_by, reverse)
+        self.show_page(0)
 
 
 if __name__ == '__main__':
@@ -275,6 +527,6 @@ if __name__ == '__main__':
 
     # python_ta.check_all('user_interface.py', config={
     #     'max-line-length': 120,
-    #     'extra-imports': ['tkinter', 'functions'],
+    #     'extra-imports': ['queue', 'threading', 'tkinter', 'typing', 'functions', 'cache', 'autocomplete'],
     #     'allowed-io': []
     # })